@@ -1,10 +1,92 @@
 from django.contrib import admin
-from api.models import Individual, Family, PasswordResetRequest
-
-models = [
-    Individual,
-    Family,
-    PasswordResetRequest,
-]
-for model in models:
-    admin.site.register(model)
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils.functional import cached_property
+
+import string
+
+from api.models import (
+    Individual, Family, PasswordResetRequest, FamilyNameList, Statistic, search_terms
+)
+
+# Admin pages which stay fast with large trees: foreign keys and partners are
+# edited by id or with autocomplete rather than <select>s of every row,
+# searches match the start of indexed names rather than scanning with
+# LIKE '%...%', and changelists show an estimate from the statistics table
+# instead of counting every row.
+
+# SQLite's lower() only folds ASCII letters; fold search words the same way.
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+def prefix_range(field, word):
+    """ Matches values of field starting with word, as an index range scan. """
+    return Q(**{field + '__gte': word, field + '__lt': word + '\U0010ffff'})
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Takes the count of an unfiltered changelist of individuals or families
+    from the statistics table; other counts are made as usual.
+    """
+    TOTALS = {
+        Individual: Statistic.INDIVIDUALS,
+        Family: Statistic.FAMILIES,
+    }
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        key = self.TOTALS.get(getattr(self.object_list, 'model', None))
+        if key is not None and query is not None and not query.where:
+            total = Statistic.objects.filter(
+                kind=Statistic.TOTAL, key=key).values_list('value', flat=True).first()
+            if total is not None:
+                return total
+        return super().count
+
+class LargeTableAdmin(admin.ModelAdmin):
+    list_per_page = 50
+    # Don't count the whole table for "N total" next to search results.
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    # Also orders autocomplete results, which are paginated.
+    ordering = ('-pk',)
+    raw_id_fields = ('owner',)
+
+@admin.register(Individual)
+class IndividualAdmin(LargeTableAdmin):
+    list_display = ('id', 'first_names', 'last_name', 'birth_date', 'death_date', 'child_in_family')
+    list_select_related = ('child_in_family',)
+    autocomplete_fields = ('child_in_family',)
+    search_fields = ('last_name', 'first_names')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Each word must start the first or last names; uses the indexes on
+        # lower(last_name) and lower(first_names).
+        queryset = queryset.alias(
+            last_name_lower=Lower('last_name'), first_names_lower=Lower('first_names'))
+        for word in search_term.translate(ASCII_LOWER).split():
+            queryset = queryset.filter(
+                prefix_range('last_name_lower', word) | prefix_range('first_names_lower', word))
+        return queryset, False
+
+@admin.register(Family)
+class FamilyAdmin(LargeTableAdmin):
+    list_display = ('id', 'name', 'married_date', 'married_location')
+    autocomplete_fields = ('partners',)
+    search_fields = ('name',)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Each word must start a partner's name, found in FamilyNameList.
+        Through = FamilyNameList.matching_families.through
+        for word in search_terms(search_term):
+            matches = Through.objects.filter(
+                familynamelist__in=FamilyNameList.objects.filter(prefix_range('name', word)))
+            queryset = queryset.filter(pk__in=matches.values('family_id'))
+        return queryset, False
+
+@admin.register(PasswordResetRequest)
+class PasswordResetRequestAdmin(admin.ModelAdmin):
+    list_display = ('user', 'expires')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
@@ -0,0 +1,16 @@
+from django.urls import path
+
+from api import async_views
+
+# The endpoints with async versions; used in front of api.urls when serving
+# under ASGI. See familyapi/asgi_urls.py.
+
+urlpatterns = [
+    path('account/', async_views.account_details),
+    path('ping/', async_views.ping),
+    path('individuals/<int:pk>/verbose', async_views.verbose_individual_detail),
+    path('individuals/<int:pk>/ancestors', async_views.individual_ancestors),
+    path('individuals/<int:pk>/descendants', async_views.individual_desendants),
+    path('individuals/<int:pk>/tree', async_views.individual_tree),
+    path('search-individuals/<str:pattern>', async_views.search_individuals),
+]
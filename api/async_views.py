@@ -0,0 +1,146 @@
+from rest_framework.authtoken.models import Token
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_vary_headers
+
+import functools
+
+from api.models import Individual
+from api.renderers import MIN_COMPRESS_SIZE, compress, encode_json
+from api.serializers import afast_individuals
+from api import views, warmup
+
+# Async versions of the read-only endpoints, served under ASGI (see
+# familyapi/asgi.py) so that a worker can serve other requests while these
+# wait on the database. They return exactly the same JSON as the DRF views
+# in api.views.
+#
+# DRF views are sync only, so these are plain Django async views which do
+# token authentication themselves. Simple queries use the async ORM; the
+# tree endpoints run many queries in a row, so they run the same code as the
+# sync views in a thread via sync_to_async, which costs one thread hop per
+# request rather than one per query.
+
+class AuthenticationFailed(Exception):
+    pass
+
+async def authenticate(request):
+    """
+    The user for the request's token, like DRF's TokenAuthentication. Returns
+    None if there's no token; raises AuthenticationFailed if it's invalid.
+    """
+    auth = request.headers.get('Authorization', '').split()
+    if not auth or auth[0].lower() != 'token':
+        return None
+    if len(auth) != 2:
+        raise AuthenticationFailed('Invalid token header.')
+    try:
+        token = await Token.objects.select_related('user').aget(key=auth[1])
+    except Token.DoesNotExist:
+        raise AuthenticationFailed('Invalid token.')
+    if not token.user.is_active:
+        raise AuthenticationFailed('User inactive or deleted.')
+    return token.user
+
+def json_response(request, data, status=200):
+    """ Renders data as FastJSONRenderer does, compressing large responses. """
+    content = encode_json(data)
+    response = HttpResponse(status=status, content_type='application/json')
+    if len(content) >= MIN_COMPRESS_SIZE:
+        patch_vary_headers(response, ['Accept-Encoding'])
+        content, coding = compress(content, request)
+        if coding:
+            response['Content-Encoding'] = coding
+    response.content = content
+    return response
+
+def async_api_view(authenticated=True):
+    """
+    Wraps an async view taking (request, user, ...) and returning data to
+    render as JSON. Handles authentication, allowed methods and 404s with
+    the same status codes and messages as DRF.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return json_response(request, {
+                    'detail': 'Method "{}" not allowed.'.format(request.method),
+                }, status=405)
+            try:
+                user = await authenticate(request)
+            except AuthenticationFailed as e:
+                response = json_response(request, {'detail': str(e)}, status=401)
+                response['WWW-Authenticate'] = 'Token'
+                return response
+            if authenticated and user is None:
+                response = json_response(request, {
+                    'detail': 'Authentication credentials were not provided.',
+                }, status=401)
+                response['WWW-Authenticate'] = 'Token'
+                return response
+            if user is not None:
+                # As DRF does; e.g. api.replica reads it.
+                request.user = user
+            try:
+                result = await view(request, user, *args, **kwargs)
+            except Http404 as e:
+                return json_response(request, {
+                    'detail': str(e) or 'Not found.',
+                }, status=404)
+            if isinstance(result, HttpResponse):
+                return result
+            return json_response(request, result)
+        return wrapper
+    return decorator
+
+@async_api_view(authenticated=False)
+async def ping(request, user):
+    if getattr(settings, 'WARM_UP_ON_PING', False):
+        warmup.worker.start()
+    return {
+        'pong': True
+    }
+
+@async_api_view()
+async def account_details(request, user):
+    return {
+        'username': user.username,
+        'is_staff': user.is_staff,
+        'is_editor': await user.groups.filter(name='editors').aexists(),
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'email': user.email,
+    }
+
+@async_api_view()
+async def search_individuals(request, user, pattern):
+    if request.GET.get('mode') == 'phonetic':
+        return views.rank_by_distance(
+            pattern, await afast_individuals(Individual.phonetic_matches(pattern)))
+    return views.sort_by_name(await afast_individuals(views.individuals_matching(pattern)))
+
+@async_api_view()
+async def verbose_individual_detail(request, user, pk):
+    return await sync_to_async(views.verbose_individual)(pk)
+
+@async_api_view()
+async def individual_ancestors(request, user, pk):
+    normalized = request.GET.get('layout') == 'normalized'
+    return await sync_to_async(views.ancestors)(pk, normalized)
+
+@async_api_view()
+async def individual_desendants(request, user, pk):
+    normalized = request.GET.get('layout') == 'normalized'
+    return await sync_to_async(views.descendants)(pk, normalized)
+
+@async_api_view()
+async def individual_tree(request, user, pk):
+    generations, errors = views.parse_generations(request.GET.get('generations', 3))
+    if errors:
+        return json_response(request, {
+            'errors': errors,
+        }, status=400)
+    return await sync_to_async(views.tree)(pk, generations)
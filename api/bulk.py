@@ -0,0 +1,374 @@
+from rest_framework import serializers
+
+from django.db import transaction
+
+from api.models import Individual, Family, AncestryClosure, Change, PlaceEvent, Statistic, chunked
+
+# Creating or editing many individuals and families in one request. Entries
+# either have an `id` (update an existing object) or a `temp_id` (create a new
+# object). Relations (`child_in_family`, `partners`, `children`) may refer to
+# existing objects by their integer id, or to objects created in the same
+# request by their string temp_id.
+
+class ReferenceField(serializers.Field):
+    """ Either an existing object's integer id, or a string temp_id. """
+    def to_internal_value(self, data):
+        if isinstance(data, bool) or not isinstance(data, (int, str)) or data == '':
+            raise serializers.ValidationError('Expected an id or a temp_id.')
+        return data
+
+    def to_representation(self, value):
+        return value
+
+class BulkIndividualSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+    temp_id = serializers.CharField(required=False, max_length=100)
+    child_in_family = ReferenceField(required=False, allow_null=True)
+
+    class Meta:
+        fields = (
+            'id',
+            'temp_id',
+            'first_names',
+            'last_name',
+            'sex',
+            'birth_date',
+            'birth_location',
+            'death_date',
+            'death_location',
+            'buried_date',
+            'buried_location',
+            'baptism_date',
+            'baptism_location',
+            'occupation',
+            'child_in_family',
+            'note',
+        )
+        model = Individual
+
+class BulkFamilySerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+    temp_id = serializers.CharField(required=False, max_length=100)
+    partners = serializers.ListField(child=ReferenceField(), required=False)
+    children = serializers.ListField(child=ReferenceField(), required=False)
+
+    class Meta:
+        fields = (
+            'id',
+            'temp_id',
+            'married_date',
+            'married_location',
+            'partners',
+            'children',
+            'note',
+        )
+        model = Family
+
+RELATION_FIELDS = {'id', 'temp_id', 'child_in_family', 'partners', 'children'}
+
+def model_fields(entry):
+    return {k: v for k, v in entry.items() if k not in RELATION_FIELDS}
+
+class BulkChanges:
+    """
+    Validates and then applies a batch of individual and family changes, in
+    the style of a serializer: call is_valid(), check `errors`, then save().
+    """
+    def __init__(self, data):
+        self.data = data if isinstance(data, dict) else {}
+        self.errors = {}
+        self.individual_entries = []
+        self.family_entries = []
+        self.individuals = {}
+        self.families = {}
+
+    def validate_entries(self, key, serializer_class):
+        raw_entries = self.data.get(key, [])
+        if not isinstance(raw_entries, list):
+            self.errors[key] = ['Expected a list.']
+            return [], []
+        entries = []
+        errors = []
+        for raw_entry in raw_entries:
+            serializer = serializer_class(data=raw_entry, partial=True)
+            if serializer.is_valid():
+                entry = dict(serializer.validated_data)
+                entry_errors = {}
+                if ('id' in entry) == ('temp_id' in entry):
+                    entry_errors['non_field_errors'] = ['Specify exactly one of id or temp_id.']
+            else:
+                entry = {}
+                entry_errors = dict(serializer.errors)
+            entries.append(entry)
+            errors.append(entry_errors)
+
+        seen = set()
+        for entry, entry_errors in zip(entries, errors):
+            temp_id = entry.get('temp_id')
+            if temp_id is None:
+                continue
+            if temp_id in seen:
+                entry_errors.setdefault('temp_id', []).append('Duplicate temp_id.')
+            seen.add(temp_id)
+        return entries, errors
+
+    def check_reference(self, ref, existing, temp_ids, entry_errors, field):
+        if isinstance(ref, int):
+            ok = ref in existing
+        else:
+            ok = ref in temp_ids
+        if not ok:
+            entry_errors.setdefault(field, []).append(
+                'Invalid reference {!r}.'.format(ref))
+
+    def is_valid(self):
+        if not isinstance(self.data, dict):
+            self.errors['non_field_errors'] = ['Expected an object.']
+            return False
+
+        individual_entries, individual_errors = self.validate_entries(
+            'individuals', BulkIndividualSerializer)
+        family_entries, family_errors = self.validate_entries(
+            'families', BulkFamilySerializer)
+
+        # Load every existing object mentioned by the request, in bulk.
+        individual_ids = set()
+        family_ids = set()
+        for entry in individual_entries:
+            if 'id' in entry:
+                individual_ids.add(entry['id'])
+            if isinstance(entry.get('child_in_family'), int):
+                family_ids.add(entry['child_in_family'])
+        for entry in family_entries:
+            if 'id' in entry:
+                family_ids.add(entry['id'])
+            for ref in entry.get('partners', []) + entry.get('children', []):
+                if isinstance(ref, int):
+                    individual_ids.add(ref)
+        for ids in chunked(individual_ids):
+            self.individuals.update(Individual.objects.in_bulk(ids))
+        for ids in chunked(family_ids):
+            self.families.update(Family.objects.in_bulk(ids))
+
+        individual_temp_ids = {e['temp_id'] for e in individual_entries if 'temp_id' in e}
+        family_temp_ids = {e['temp_id'] for e in family_entries if 'temp_id' in e}
+
+        for entry, entry_errors in zip(individual_entries, individual_errors):
+            if 'id' in entry and entry['id'] not in self.individuals:
+                entry_errors.setdefault('id', []).append('Individual does not exist.')
+            if entry.get('child_in_family') is not None:
+                self.check_reference(entry['child_in_family'], self.families,
+                    family_temp_ids, entry_errors, 'child_in_family')
+
+        for entry, entry_errors in zip(family_entries, family_errors):
+            if 'id' in entry and entry['id'] not in self.families:
+                entry_errors.setdefault('id', []).append('Family does not exist.')
+            for field in ['partners', 'children']:
+                for ref in entry.get(field, []):
+                    self.check_reference(ref, self.individuals,
+                        individual_temp_ids, entry_errors, field)
+
+        if any(individual_errors):
+            self.errors['individuals'] = individual_errors
+        if any(family_errors):
+            self.errors['families'] = family_errors
+
+        self.individual_entries = individual_entries
+        self.family_entries = family_entries
+        return not self.errors
+
+    def existing_objects(self):
+        """
+        The existing objects which save() will modify: those updated, and
+        those whose links are added or removed, i.e. partners and children of
+        families and the families of children, including the children and
+        partners which edited families' lists replace.
+        """
+        individual_ids = set()
+        family_ids = set()
+        replaced_children = []
+        replaced_partners = []
+        for entry in self.individual_entries:
+            if 'id' in entry:
+                individual_ids.add(entry['id'])
+            if isinstance(entry.get('child_in_family'), int):
+                family_ids.add(entry['child_in_family'])
+        for entry in self.family_entries:
+            if 'id' in entry:
+                family_ids.add(entry['id'])
+                if 'children' in entry:
+                    replaced_children.append(entry['id'])
+                if 'partners' in entry:
+                    replaced_partners.append(entry['id'])
+            for ref in entry.get('partners', []) + entry.get('children', []):
+                if isinstance(ref, int):
+                    individual_ids.add(ref)
+
+        individuals = {pk: self.individuals[pk] for pk in individual_ids}
+        for ids in chunked(replaced_children):
+            for individual in Individual.objects.filter(child_in_family_id__in=ids):
+                individuals.setdefault(individual.pk, individual)
+        Through = Family.partners.through
+        for ids in chunked(replaced_partners):
+            for individual in Individual.objects.filter(
+                    pk__in=Through.objects.filter(family_id__in=ids).values('individual_id')):
+                individuals.setdefault(individual.pk, individual)
+        return [individuals[pk] for pk in sorted(individuals)] + \
+            [self.families[pk] for pk in sorted(family_ids)]
+
+    def save(self, owner):
+        """
+        Applies the changes in a single transaction. Returns the mapping from
+        temp_id to the id of the created object.
+        """
+        with transaction.atomic():
+            return self.apply(owner)
+
+    def apply(self, owner):
+        created_individuals = {}
+        created_families = {}
+
+        def resolve_individual(ref):
+            if isinstance(ref, int):
+                return self.individuals[ref]
+            return created_individuals[ref]
+
+        def resolve_family(ref):
+            if ref is None:
+                return None
+            if isinstance(ref, int):
+                return self.families[ref]
+            return created_families[ref]
+
+        # Write individuals and families, without relations.
+        new_individuals = []
+        for entry in self.individual_entries:
+            if 'temp_id' in entry:
+                individual = Individual(owner=owner, **model_fields(entry))
+                individual.update_phonetic_keys()
+                individual.update_years()
+                created_individuals[entry['temp_id']] = individual
+                new_individuals.append(individual)
+        Individual.objects.bulk_create(new_individuals, batch_size=500)
+
+        updated_individuals = []
+        updated_fields = set()
+        for entry in self.individual_entries:
+            if 'id' in entry:
+                individual = self.individuals[entry['id']]
+                for field, value in model_fields(entry).items():
+                    setattr(individual, field, value)
+                    updated_fields.add(field)
+                individual.update_phonetic_keys()
+                individual.update_years()
+                updated_individuals.append(individual)
+        if {'first_names', 'last_name'} & updated_fields:
+            updated_fields.update(Individual.PHONETIC_FIELDS)
+        if {'birth_date', 'death_date'} & updated_fields:
+            updated_fields.update(Individual.YEAR_FIELDS)
+        if updated_fields:
+            Individual.objects.bulk_update(updated_individuals, updated_fields, batch_size=500)
+
+        new_families = []
+        for entry in self.family_entries:
+            if 'temp_id' in entry:
+                family = Family(owner=owner, **model_fields(entry))
+                created_families[entry['temp_id']] = family
+                new_families.append(family)
+        Family.objects.bulk_create(new_families, batch_size=500)
+
+        updated_families = []
+        updated_fields = set()
+        for entry in self.family_entries:
+            if 'id' in entry:
+                family = self.families[entry['id']]
+                for field, value in model_fields(entry).items():
+                    setattr(family, field, value)
+                    updated_fields.add(field)
+                updated_families.append(family)
+        if updated_fields:
+            Family.objects.bulk_update(updated_families, updated_fields, batch_size=500)
+
+        # Child links; either from an individual's child_in_family, or from a
+        # family's list of children, which replaces its existing children.
+        linked_children = {}
+        unlinked_children = []
+        # Families whose lists of children changed.
+        relinked_child_families = set()
+        for entry in self.family_entries:
+            if 'children' not in entry:
+                continue
+            family = resolve_family(entry.get('id', entry.get('temp_id')))
+            children = [resolve_individual(ref) for ref in entry['children']]
+            if 'id' in entry:
+                unlinked = Individual.objects.filter(child_in_family=family).exclude(
+                    pk__in=[child.pk for child in children])
+                unlinked_children += unlinked.values_list('id', flat=True)
+                unlinked.update(child_in_family=None)
+            relinked_child_families.add(family.pk)
+            for child in children:
+                relinked_child_families.add(child.child_in_family_id)
+                child.child_in_family = family
+                linked_children[child.pk] = child
+        for entry in self.individual_entries:
+            if 'child_in_family' in entry:
+                individual = resolve_individual(entry.get('id', entry.get('temp_id')))
+                relinked_child_families.add(individual.child_in_family_id)
+                individual.child_in_family = resolve_family(entry['child_in_family'])
+                relinked_child_families.add(individual.child_in_family_id)
+                linked_children[individual.pk] = individual
+        Individual.objects.bulk_update(
+            linked_children.values(), ['child_in_family'], batch_size=500)
+
+        # Partner links; a family's list of partners replaces its existing ones.
+        Through = Family.partners.through
+        partner_rows = []
+        replaced_partners = []
+        for entry in self.family_entries:
+            if 'partners' not in entry:
+                continue
+            family = resolve_family(entry.get('id', entry.get('temp_id')))
+            if 'id' in entry:
+                replaced_partners.append(family.pk)
+            for ref in entry['partners']:
+                partner_rows.append(
+                    Through(family_id=family.pk, individual_id=resolve_individual(ref).pk))
+        replaced_rows = Through.objects.filter(family_id__in=replaced_partners)
+        unlinked_partners = list(replaced_rows.values_list('individual_id', flat=True))
+        replaced_rows.delete()
+        Through.objects.bulk_create(partner_rows, ignore_conflicts=True, batch_size=500)
+
+        # Bulk writes don't send signals, so update the ancestry of everyone
+        # whose parents may have changed here.
+        relinked_families = [f.pk for f in new_families] + replaced_partners
+        AncestryClosure.rebuild(
+            {i.pk for i in new_individuals} | linked_children.keys() |
+            set(Individual.objects.filter(
+                child_in_family_id__in=relinked_families).values_list('id', flat=True)))
+
+        # Family names depend on the partners' names and lifetimes, so
+        # recompute them once for every family which may have changed.
+        affected_families = {f.pk for f in new_families + updated_families}
+        for ids in chunked([i.pk for i in updated_individuals]):
+            affected_families.update(Through.objects.filter(
+                individual_id__in=ids).values_list('family_id', flat=True))
+        Family.update_family_names(affected_families)
+
+        PlaceEvent.update_individuals(i.pk for i in new_individuals + updated_individuals)
+        PlaceEvent.update_families(f.pk for f in new_families + updated_families)
+        Statistic.individuals_changed(new_individuals + updated_individuals)
+        Statistic.families_added(len(new_families))
+
+        # Likewise, log everything which changed for clients syncing changes.
+        Change.record(Change.INDIVIDUAL,
+            [i.pk for i in new_individuals + updated_individuals] +
+            list(linked_children.keys()) + unlinked_children + unlinked_partners +
+            [row.individual_id for row in partner_rows])
+        Change.record(Change.FAMILY,
+            affected_families | relinked_child_families |
+            {row.family_id for row in partner_rows} | set(replaced_partners))
+
+        return {
+            'individuals': {k: v.pk for k, v in created_individuals.items()},
+            'families': {k: v.pk for k, v in created_families.items()},
+        }
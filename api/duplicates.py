@@ -0,0 +1,76 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import defaultdict
+import itertools
+
+from api.models import Individual
+from api.phonetic import score_block
+
+# Finding individuals who are probably duplicates of each other, e.g. after
+# importing overlapping GEDCOM files. Comparing every pair is quadratic, so
+# individuals are first grouped into blocks by a key duplicates are very
+# likely to share (the Soundex code of their last name, their birth decade and
+# their sex), and only pairs within a block are scored.
+
+# Pairs scoring less than this aren't reported.
+MIN_SCORE = 0.8
+
+# Blocks larger than this are split further by first name.
+MAX_BLOCK_SIZE = 200
+
+FIELDS = (
+    'id',
+    'first_names',
+    'last_name',
+    'sex',
+    'birth_date',
+    'birth_location',
+    'death_date',
+    'death_location',
+    'first_name_soundex',
+    'last_name_soundex',
+    'birth_year',
+    'death_year',
+)
+
+def load_rows():
+    return [
+        dict(zip(FIELDS, values))
+        for values in Individual.objects.values_list(*FIELDS).iterator(chunk_size=2000)
+    ]
+
+def blocking_key(row):
+    decade = row['birth_year'] // 10 if row['birth_year'] else None
+    return (row['last_name_soundex'], decade, row['sex'])
+
+def blocks(rows):
+    """ Groups rows into blocks of possible duplicates, leaving out singletons. """
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[blocking_key(row)].append(row)
+    for block in grouped.values():
+        if len(block) <= MAX_BLOCK_SIZE:
+            subblocks = [block]
+        else:
+            by_first_name = defaultdict(list)
+            for row in block:
+                by_first_name[row['first_name_soundex']].append(row)
+            subblocks = by_first_name.values()
+        for subblock in subblocks:
+            if len(subblock) > 1:
+                yield subblock
+
+def find_duplicates(min_score=MIN_SCORE, jobs=1, limit=None):
+    """
+    Returns likely duplicates as a list of (score, id, id), best first. With
+    jobs > 1, blocks are scored in that many worker processes.
+    """
+    all_blocks = sorted(blocks(load_rows()), key=len, reverse=True)
+    if jobs > 1 and len(all_blocks) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(score_block, all_blocks,
+                itertools.repeat(min_score), chunksize=16))
+    else:
+        results = [score_block(block, min_score) for block in all_blocks]
+    matches = sorted(itertools.chain.from_iterable(results),
+        key=lambda match: (-match[0], match[1], match[2]))
+    return matches[:limit] if limit is not None else matches
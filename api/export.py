@@ -0,0 +1,189 @@
+from django.db.models import Prefetch
+
+from api.models import Individual, Family, AncestryClosure, chunked
+
+# Exporting the database as GEDCOM 5.5.1, with the same tags that
+# `./manage.py importgedcom` reads, so exports can be re-imported here or into
+# other genealogy software. Records are generated a few at a time from
+# chunked queries, so an export can be streamed without holding the whole
+# tree in memory.
+
+# Maximum length of a line value; longer notes are split with CONC.
+MAX_VALUE_LENGTH = 248
+
+# Rows fetched per query.
+CHUNK_SIZE = 500
+
+HEADER = (
+    '0 HEAD\n'
+    '1 SOUR familyapi\n'
+    '1 GEDC\n'
+    '2 VERS 5.5.1\n'
+    '2 FORM LINEAGE-LINKED\n'
+    '1 CHAR UTF-8\n'
+)
+
+TRAILER = '0 TRLR\n'
+
+def individual_xref(individual_id):
+    return '@I{}@'.format(individual_id)
+
+def family_xref(family_id):
+    return '@F{}@'.format(family_id)
+
+def single_line(value):
+    return ' '.join(value.split()) if value else ''
+
+def split_value(value):
+    """
+    Splits value into pieces at most MAX_VALUE_LENGTH long. Pieces don't
+    start or end with a space, as some readers strip those.
+    """
+    pieces = []
+    while len(value) > MAX_VALUE_LENGTH:
+        split = MAX_VALUE_LENGTH
+        while split > 1 and (value[split - 1] == ' ' or value[split] == ' '):
+            split -= 1
+        pieces.append(value[:split])
+        value = value[split:]
+    pieces.append(value)
+    return pieces
+
+def note_lines(level, note):
+    """ A NOTE, split into CONT lines at newlines and CONC within lines. """
+    lines = []
+    for i, line in enumerate(note.split('\n')):
+        for j, piece in enumerate(split_value(line)):
+            if i == 0 and j == 0:
+                tag = 'NOTE'
+                line_level = level
+            else:
+                tag = 'CONC' if j > 0 else 'CONT'
+                line_level = level + 1
+            lines.append('{} {} {}'.format(line_level, tag, piece).rstrip())
+    return lines
+
+def event_lines(tag, date, place):
+    if not date and not place:
+        return []
+    lines = ['1 {}'.format(tag)]
+    if date:
+        lines.append('2 DATE {}'.format(single_line(date)))
+    if place:
+        lines.append('2 PLAC {}'.format(single_line(place)))
+    return lines
+
+def individual_record(individual, families):
+    """ The GEDCOM INDI record, linking only to families in `families`. """
+    name = ' '.join(filter(None, [
+        single_line(individual.first_names),
+        '/{}/'.format(single_line(individual.last_name)),
+    ]))
+    lines = [
+        '0 {} INDI'.format(individual_xref(individual.id)),
+        '1 NAME {}'.format(name),
+    ]
+    if individual.sex:
+        lines.append('1 SEX {}'.format(individual.sex if individual.sex in 'MF' else 'U'))
+    lines += event_lines('BIRT', individual.birth_date, individual.birth_location)
+    lines += event_lines('DEAT', individual.death_date, individual.death_location)
+    lines += event_lines('BURI', individual.buried_date, individual.buried_location)
+    lines += event_lines('BAPM', individual.baptism_date, individual.baptism_location)
+    if individual.occupation:
+        lines.append('1 OCCU {}'.format(single_line(individual.occupation)))
+    if individual.note:
+        lines += note_lines(1, individual.note)
+    for family in individual.partner_in_families.all():
+        if families is None or family.id in families:
+            lines.append('1 FAMS {}'.format(family_xref(family.id)))
+    if individual.child_in_family_id and (
+            families is None or individual.child_in_family_id in families):
+        lines.append('1 FAMC {}'.format(family_xref(individual.child_in_family_id)))
+    return '\n'.join(lines) + '\n'
+
+def spouse_tags(partners):
+    """
+    Assigns partners to HUSB and WIFE, by sex where known. GEDCOM has no
+    place for a third partner, so any are left out.
+    """
+    husband = next((p for p in partners if p.sex == 'M'), None)
+    wife = next((p for p in partners if p.sex == 'F'), None)
+    for partner in partners:
+        if partner in (husband, wife):
+            continue
+        if husband is None:
+            husband = partner
+        elif wife is None:
+            wife = partner
+    return [('HUSB', p) for p in [husband] if p] + [('WIFE', p) for p in [wife] if p]
+
+def family_record(family, individuals):
+    """ The GEDCOM FAM record, linking only to individuals in `individuals`. """
+    lines = ['0 {} FAM'.format(family_xref(family.id))]
+    partners = [p for p in family.partners.all()
+        if individuals is None or p.id in individuals]
+    for tag, partner in spouse_tags(partners):
+        lines.append('1 {} {}'.format(tag, individual_xref(partner.id)))
+    for child in family.children.all():
+        if individuals is None or child.id in individuals:
+            lines.append('1 CHIL {}'.format(individual_xref(child.id)))
+    # The importer reads a family's note from inside its MARR event.
+    if family.married_date or family.married_location or family.note:
+        lines.append('1 MARR')
+        if family.married_date:
+            lines.append('2 DATE {}'.format(single_line(family.married_date)))
+        if family.married_location:
+            lines.append('2 PLAC {}'.format(single_line(family.married_location)))
+        if family.note:
+            lines += note_lines(2, family.note)
+    return '\n'.join(lines) + '\n'
+
+def subtree(root_id):
+    """
+    The ids of the individuals and families in the subtree under root_id;
+    root_id, their descendants and the descendants' spouses, and the families
+    the descendants are partners in.
+    """
+    descendants = {root_id} | set(AncestryClosure.descendant_ids(root_id))
+    Through = Family.partners.through
+    families = set()
+    for ids in chunked(descendants):
+        families.update(Through.objects.filter(
+            individual_id__in=ids).values_list('family_id', flat=True))
+    individuals = set(descendants)
+    for ids in chunked(families):
+        individuals.update(Through.objects.filter(
+            family_id__in=ids).values_list('individual_id', flat=True))
+    return individuals, families
+
+def iterate(queryset, ids):
+    """ The objects in queryset, or only those in ids, fetched in chunks. """
+    if ids is None:
+        yield from queryset.order_by('id').iterator(chunk_size=CHUNK_SIZE)
+        return
+    for chunk in chunked(sorted(ids), CHUNK_SIZE):
+        yield from queryset.filter(id__in=chunk).order_by('id')
+
+def gedcom_export(root_id=None):
+    """
+    Generates the database, or the subtree under root_id, as GEDCOM 5.5.1
+    text, a record at a time.
+    """
+    individuals = families = None
+    if root_id is not None:
+        individuals, families = subtree(root_id)
+
+    yield HEADER
+    for individual in iterate(Individual.objects.prefetch_related(
+            Prefetch('partner_in_families',
+                queryset=Family.objects.only('id').order_by('id'))),
+            individuals):
+        yield individual_record(individual, families)
+    for family in iterate(Family.objects.prefetch_related(
+            Prefetch('partners',
+                queryset=Individual.objects.only('id', 'sex').order_by('id')),
+            Prefetch('children',
+                queryset=Individual.objects.only('id', 'child_in_family').order_by('id'))),
+            families):
+        yield family_record(family, individuals)
+    yield TRAILER
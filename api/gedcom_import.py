@@ -0,0 +1,188 @@
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import os
+import tempfile
+
+from gedcom.element.individual import IndividualElement
+from gedcom.element.family import FamilyElement
+from gedcom.parser import Parser
+import gedcom
+
+# Reading GEDCOM files into plain values, for the importgedcom command. Parsing
+# a large file is CPU bound, so it can be split at level 0 record boundaries
+# into chunks which are parsed in worker processes; see parse_file(). This
+# module doesn't touch the database.
+
+def parse_family(family_element):
+    """
+    Parses a GEDCOM family tag, returns a tuple of:
+    (id_str, id_str, str, str, List[id_str], str)
+    which corresponds to:
+    (husband, wife, date, place, children, note)
+    """
+    husband = ""
+    wife = ""
+    date = ""
+    place = ""
+    children = []
+    note = ""
+    for element in family_element.get_child_elements():
+        if element.get_tag() == gedcom.tags.GEDCOM_TAG_HUSBAND:
+            husband = element.get_value()
+        elif element.get_tag() == gedcom.tags.GEDCOM_TAG_WIFE:
+            wife = element.get_value()
+        elif element.get_tag() == gedcom.tags.GEDCOM_TAG_CHILD:
+            children.append(element.get_value())
+        elif element.get_tag() == gedcom.tags.GEDCOM_TAG_MARRIAGE:
+            for marriage_data in element.get_child_elements():
+                if marriage_data.get_tag() == gedcom.tags.GEDCOM_TAG_DATE:
+                    date = marriage_data.get_value()
+                if marriage_data.get_tag() == gedcom.tags.GEDCOM_TAG_PLACE:
+                    place = marriage_data.get_value()
+                if marriage_data.get_tag() == "NOTE":
+                    note = marriage_data.get_value()
+    return (husband, wife, date, place, children, note)
+
+def parse_indi(indi_element):
+    """ Parses a GEDCOM individual tag, returns a dict of Individual fields. """
+    (first, last) = indi_element.get_name()
+    (birth_date, birth_place, _) = indi_element.get_birth_data()
+    (death_date, death_place, _) = indi_element.get_death_data()
+    (burial_date, burial_place, _) = indi_element.get_burial_data()
+
+    note = ""
+    baptism_date = ""
+    baptism_place = ""
+    for child in indi_element.get_child_elements():
+        if child.get_tag() == "NOTE":
+            note += child.get_value()
+            for grand_child in child.get_child_elements():
+                if grand_child.get_tag() == "CONC":
+                    note += grand_child.get_value()
+                elif grand_child.get_tag() == "CONT":
+                    note += grand_child.get_value()
+                else:
+                    raise Exception(
+                        "Can't handle tag {} in NOTE".format(grand_child.get_tag())
+                    )
+        if child.get_tag() == "BAPM":
+            for grand_child in child.get_child_elements():
+                if grand_child.get_tag() == "DATE":
+                    baptism_date = grand_child.get_value()
+                elif grand_child.get_tag() == "PLAC":
+                    baptism_place = grand_child.get_value()
+                elif grand_child.get_tag() == "NOTE":
+                    note += grand_child.get_value()
+                # elif grand_child.get_tag() == "CONT":
+                #     note += grand_child.get_value()
+                else:
+                    raise Exception(
+                        "Can't handle tag {} in BAPM".format(grand_child.get_tag())
+                    )
+
+    return dict(
+        first_names=first,
+        last_name=last,
+        sex=indi_element.get_gender(),
+        birth_date=birth_date,
+        birth_location=birth_place,
+        death_date=death_date,
+        death_location=death_place,
+        buried_date=burial_date,
+        buried_location=burial_place,
+        baptism_date=baptism_date,
+        baptism_location=baptism_place,
+        occupation=indi_element.get_occupation(),
+        note=note,
+    )
+
+def parse_path(path):
+    """
+    Parses a GEDCOM file; returns its individuals as a list of (pointer,
+    fields) and its families as a list of (pointer, family tuple), in file
+    order.
+    """
+    parser = Parser()
+    parser.parse_file(path)
+    individuals = []
+    families = []
+    for element in parser.get_root_child_elements():
+        if isinstance(element, IndividualElement):
+            individuals.append((element.get_pointer(), parse_indi(element)))
+        elif isinstance(element, FamilyElement):
+            families.append((element.get_pointer(), parse_family(element)))
+    return individuals, families
+
+def parse_chunk(data):
+    """ Parses the bytes of a whole number of GEDCOM records. """
+    # The parser only reads files.
+    with tempfile.NamedTemporaryFile(suffix='.ged', delete=False) as f:
+        f.write(data)
+    try:
+        return parse_path(f.name)
+    finally:
+        os.remove(f.name)
+
+def split_records(path, chunk_size):
+    """
+    Reads a GEDCOM file in chunks of about chunk_size bytes, each ending at
+    the end of a level 0 record.
+    """
+    chunk = []
+    size = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if size >= chunk_size and line.lstrip()[:2] == b'0 ':
+                yield b''.join(chunk)
+                chunk = []
+                size = 0
+            chunk.append(line)
+            size += len(line)
+    if chunk:
+        yield b''.join(chunk)
+
+def parse_file(path, jobs=1):
+    """
+    Parses a GEDCOM file as parse_path() does; with jobs > 1, in that many
+    worker processes.
+    """
+    if jobs <= 1:
+        return parse_path(path)
+    # A few chunks per worker, so they finish at about the same time.
+    chunk_size = max(os.path.getsize(path) // (jobs * 4), 1)
+    individuals = []
+    families = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for chunk_individuals, chunk_families in pool.map(
+                parse_chunk, split_records(path, chunk_size)):
+            individuals += chunk_individuals
+            families += chunk_families
+    return individuals, families
+
+def family_children(families):
+    """
+    Maps each child's pointer to the pointer of the first family listing
+    them as a child; an individual has one set of parents, so later families
+    are ignored.
+    """
+    parents = {}
+    for pointer, (_, _, _, _, children, _) in families:
+        for child in children:
+            parents.setdefault(child, pointer)
+    return parents
+
+def record_hash(values):
+    """ A hash of a parsed record, to tell whether it changed between imports. """
+    return hashlib.sha1(json.dumps(values, sort_keys=True).encode('utf-8')).hexdigest()
+
+def family_values(family, children):
+    """ A family's fields and links, with only the given children. """
+    husband, wife, date, place, _, note = family
+    return {
+        'married_date': date,
+        'married_location': place,
+        'note': note,
+        'partners': [p for p in [husband, wife] if p],
+        'children': children,
+    }
@@ -0,0 +1,140 @@
+from django.db import transaction
+
+from api.bulk import BulkChanges
+from api.gedcom_import import family_children, family_values, record_hash
+from api.models import Individual, Family, chunked
+
+# Re-importing a GEDCOM file which was imported before, e.g. a nightly export
+# from desktop software, by updating the records imported from it in place.
+# Records are matched by their GEDCOM pointer, and compared by the hash of
+# what was imported last time, so only new and changed records are written;
+# in bulk, via api.bulk, which also keeps the derived tables up to date.
+# Records no longer in the file are deleted.
+
+class SyncError(Exception):
+    pass
+
+def existing_records(model, source):
+    """ Maps pointers to the (id, hash) of records imported from source. """
+    return {
+        xref: (pk, gedcom_hash) for pk, xref, gedcom_hash in model.objects.filter(
+            gedcom_source=source).exclude(gedcom_xref='').order_by('id').values_list(
+                'id', 'gedcom_xref', 'gedcom_hash')
+    }
+
+def individual_fields(fields):
+    # The API only accepts the sexes it knows.
+    if fields['sex'] not in dict(Individual.SEX_CHOICES):
+        fields = dict(fields, sex='?' if fields['sex'] else '')
+    return fields
+
+def sync_gedcom(individuals, families, source):
+    """
+    Updates the records imported from source to match the individuals and
+    families parsed from a GEDCOM file, in one transaction. Returns the
+    number of individuals and families created, updated, deleted and
+    unchanged. Raises SyncError if the file can't be imported.
+    """
+    with transaction.atomic():
+        return apply(individuals, families, source)
+
+def apply(individuals, families, source):
+    existing_individuals = existing_records(Individual, source)
+    existing_families = existing_records(Family, source)
+    parents = family_children(families)
+
+    def individual_ref(pointer):
+        if pointer in existing_individuals:
+            return existing_individuals[pointer][0]
+        return pointer
+
+    individual_entries = {}
+    hashes = {}
+    for pointer, fields in individuals:
+        hashes[pointer] = record_hash(fields)
+        if pointer in existing_individuals:
+            pk, saved_hash = existing_individuals[pointer]
+            if saved_hash == hashes[pointer]:
+                continue
+            entry = {'id': pk}
+        else:
+            entry = {'temp_id': pointer}
+        entry.update(individual_fields(fields))
+        individual_entries[pointer] = entry
+
+    family_entries = []
+    family_hashes = {}
+    written_families = []
+    for pointer, family in families:
+        values = family_values(family, [c for c in family[4] if parents[c] == pointer])
+        family_hashes[pointer] = record_hash(values)
+        if pointer in existing_families:
+            pk, saved_hash = existing_families[pointer]
+            if saved_hash == family_hashes[pointer]:
+                continue
+            entry = {'id': pk}
+        else:
+            entry = {'temp_id': pointer}
+        entry.update(values)
+        entry['partners'] = [individual_ref(p) for p in values['partners']]
+        entry['children'] = [individual_ref(c) for c in values['children']]
+        family_entries.append(entry)
+        written_families.append(pointer)
+
+    # Families no longer in the file are deleted, which would delete their
+    # children too; unlink them first, including children added since the
+    # import, e.g. through the API, which aren't in the file.
+    deleted_families = [pk for pointer, (pk, _) in existing_families.items()
+        if pointer not in family_hashes]
+    individual_ids = {pk: pointer for pointer, (pk, _) in existing_individuals.items()}
+    unlinked_entries = []
+    for ids in chunked(deleted_families):
+        for pk in Individual.objects.filter(child_in_family_id__in=ids).values_list('id', flat=True):
+            pointer = individual_ids.get(pk)
+            if pointer is None:
+                unlinked_entries.append({'id': pk, 'child_in_family': None})
+            elif pointer in hashes and pointer not in parents:
+                entry = individual_entries.setdefault(pointer, {'id': pk})
+                entry['child_in_family'] = None
+
+    changes = BulkChanges({
+        'individuals': list(individual_entries.values()) + unlinked_entries,
+        'families': family_entries,
+    })
+    if not changes.is_valid():
+        raise SyncError(changes.errors)
+    created = changes.save(owner=None)
+
+    for ids in chunked(deleted_families):
+        Family.objects.filter(pk__in=ids).delete()
+    deleted_individuals = [pk for pointer, (pk, _) in existing_individuals.items()
+        if pointer not in hashes]
+    for ids in chunked(deleted_individuals):
+        Individual.objects.filter(pk__in=ids).delete()
+
+    # Remember what was imported, for next time.
+    Individual.objects.bulk_update([
+        Individual(pk=created['individuals'].get(pointer) or existing_individuals[pointer][0],
+            gedcom_source=source, gedcom_xref=pointer, gedcom_hash=hashes[pointer])
+        for pointer in individual_entries
+    ], ['gedcom_source', 'gedcom_xref', 'gedcom_hash'], batch_size=500)
+    Family.objects.bulk_update([
+        Family(pk=created['families'].get(pointer) or existing_families[pointer][0],
+            gedcom_source=source, gedcom_xref=pointer, gedcom_hash=family_hashes[pointer])
+        for pointer in written_families
+    ], ['gedcom_source', 'gedcom_xref', 'gedcom_hash'], batch_size=500)
+
+    return {
+        'individuals': {
+            'created': len(created['individuals']),
+            'updated': len(individual_entries) - len(created['individuals']),
+            'deleted': len(deleted_individuals),
+            'unchanged': len(hashes) - len(individual_entries),
+        },
+        'families': {
+            'created': len(created['families']),
+            'updated': len(family_entries) - len(created['families']),
+            'deleted': len(deleted_families),
+            'unchanged': len(family_hashes) - len(family_entries),
+        },
+    }
@@ -0,0 +1,209 @@
+from api.models import Individual, Family, chunked
+from api import snapshot
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fields of each entity included in graph payloads. Relations are included as
+# ids; `partner_in_families` for individuals, `partners` and `children` for
+# families. The graph snapshot (api.snapshot) stores the same fields.
+INDIVIDUAL_FIELDS = (
+    'id',
+    'first_names',
+    'last_name',
+    'sex',
+    'birth_date',
+    'death_date',
+    'child_in_family',
+)
+FAMILY_FIELDS = (
+    'id',
+    'name',
+    'married_date',
+    'married_location',
+)
+
+class FamilyGraph:
+    """
+    The part of the family tree needed to answer a request, loaded from the DB
+    a batch at a time. Each load_*() call costs a fixed number of queries,
+    regardless of how many ids are passed, and never re-loads an entity, so
+    traversals are cheap and naturally stop at pedigree collapse and cycles.
+    """
+    def __init__(self):
+        self.individuals = {}
+        self.families = {}
+
+    def load_individuals(self, ids):
+        """ Loads individuals by id; returns those which weren't already loaded. """
+        ids = {i for i in ids if i is not None and i not in self.individuals}
+        loaded = []
+        for chunk in chunked(ids):
+            for row in Individual.objects.filter(pk__in=chunk).values(*INDIVIDUAL_FIELDS):
+                row['partner_in_families'] = []
+                self.individuals[row['id']] = row
+                loaded.append(row)
+            partner_rows = Family.partners.through.objects.filter(
+                individual_id__in=chunk).order_by('family_id').values_list(
+                'individual_id', 'family_id')
+            for individual_id, family_id in partner_rows:
+                self.individuals[individual_id]['partner_in_families'].append(family_id)
+        return loaded
+
+    def load_families(self, ids):
+        """ Loads families by id; returns those which weren't already loaded. """
+        ids = {i for i in ids if i is not None and i not in self.families}
+        loaded = []
+        for chunk in chunked(ids):
+            for row in Family.objects.filter(pk__in=chunk).values(*FAMILY_FIELDS):
+                row['partners'] = []
+                row['children'] = []
+                self.families[row['id']] = row
+                loaded.append(row)
+            partner_rows = Family.partners.through.objects.filter(
+                family_id__in=chunk).order_by('individual_id').values_list(
+                'family_id', 'individual_id')
+            for family_id, individual_id in partner_rows:
+                self.families[family_id]['partners'].append(individual_id)
+            child_rows = Individual.objects.filter(
+                child_in_family_id__in=chunk).order_by('id').values_list(
+                'child_in_family_id', 'id')
+            for family_id, individual_id in child_rows:
+                self.families[family_id]['children'].append(individual_id)
+        return loaded
+
+    def load_ancestors(self, individuals, generations=None):
+        """
+        Loads the ancestors of the given (loaded) individuals, and the families
+        linking them, up to `generations` generations (None for unlimited).
+        """
+        expanded = set()
+        frontier = individuals
+        generation = 0
+        while frontier and (generations is None or generation < generations):
+            expanded.update(i['id'] for i in frontier)
+            self.load_families(i['child_in_family'] for i in frontier)
+            parents = {p for i in frontier for p in self.parents(i)}
+            self.load_individuals(parents)
+            frontier = [self.individuals[p] for p in parents if p not in expanded]
+            generation += 1
+
+    def load_descendants(self, individuals, generations=None):
+        """
+        Loads the descendants of the given (loaded) individuals, their spouses
+        and the families linking them, up to `generations` generations (None
+        for unlimited).
+        """
+        expanded = set()
+        frontier = individuals
+        generation = 0
+        while frontier and (generations is None or generation < generations):
+            expanded.update(i['id'] for i in frontier)
+            family_ids = {f for i in frontier for f in i['partner_in_families']}
+            self.load_families(family_ids)
+            families = [self.families[f] for f in family_ids]
+            children = {c for f in families for c in f['children']}
+            spouses = {p for f in families for p in f['partners']}
+            self.load_individuals(children | spouses)
+            frontier = [self.individuals[c] for c in children if c not in expanded]
+            generation += 1
+
+    def parents(self, individual):
+        """ The ids of a (loaded) individual's parents, if they're loaded. """
+        family = self.families.get(individual['child_in_family'])
+        return family['partners'] if family else []
+
+    def payload(self, root_id):
+        """ A normalized representation; each entity appears once, keyed by id. """
+        return {
+            'root': root_id,
+            'individuals': self.individuals,
+            'families': self.families,
+        }
+
+class SnapshotGraph(FamilyGraph):
+    """ A FamilyGraph which loads entities from a graph snapshot, not the DB. """
+    def __init__(self, snapshot):
+        super().__init__()
+        self.snapshot = snapshot
+
+    def load_individuals(self, ids):
+        loaded = []
+        for i in {i for i in ids if i is not None and i not in self.individuals}:
+            row = self.snapshot.individual(i)
+            if row is not None:
+                self.individuals[i] = row
+                loaded.append(row)
+        return loaded
+
+    def load_families(self, ids):
+        loaded = []
+        for i in {i for i in ids if i is not None and i not in self.families}:
+            row = self.snapshot.family(i)
+            if row is not None:
+                self.families[i] = row
+                loaded.append(row)
+        return loaded
+
+def new_graph():
+    """ A graph to load entities into; from the snapshot, if it's up to date. """
+    current = snapshot.current()
+    return SnapshotGraph(current) if current is not None else FamilyGraph()
+
+def hourglass(root_id, generations):
+    """
+    Returns the graph of an individual's ancestors and descendants up to
+    `generations` generations away, plus their spouses and siblings. Returns
+    None if the individual doesn't exist.
+    """
+    graph = new_graph()
+    root = graph.load_individuals([root_id])
+    if not root:
+        return None
+    # Siblings and spouses; the children of the family the individual is a
+    # child in and the partners of their own families, loaded together so
+    # they're in the graph even with no generations either way.
+    parents_id = root[0]['child_in_family']
+    families = graph.load_families([parents_id] + root[0]['partner_in_families'])
+    graph.load_individuals(
+        i for f in families for i in f['children' if f['id'] == parents_id else 'partners'])
+    graph.load_ancestors(root, generations)
+    graph.load_descendants(root, generations)
+    return graph
+
+def depth_first(root_id, neighbours, entry):
+    """
+    Walks the tree depth first from root_id without recursion, returning
+    entry(id) for each individual reached, in pre-order. Each individual is
+    expanded once. Entries of individuals reached by more than one path
+    (pedigree collapse) are marked `collapsed`, and those reached from
+    themselves (bad data) are marked `cycle`.
+    """
+    entries = {}
+    result = []
+    path = []
+    stack = []
+
+    def enter(i):
+        entries[i] = entry(i)
+        result.append(entries[i])
+        path.append(i)
+        stack.append(iter(neighbours(i)))
+
+    enter(root_id)
+    on_path = {root_id}
+    while stack:
+        i = next(stack[-1], None)
+        if i is None:
+            stack.pop()
+            on_path.discard(path.pop())
+        elif i in on_path:
+            logger.warning("Individual %s is their own ancestor", i)
+            entries[i]['cycle'] = True
+        elif i in entries:
+            entries[i]['collapsed'] = True
+        else:
+            enter(i)
+            on_path.add(i)
+    return result
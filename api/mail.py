@@ -0,0 +1,165 @@
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.signals import request_started
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from datetime import timedelta
+from smtplib import SMTPException
+import logging
+import threading
+
+from api.models import OutgoingEmail
+
+# A DB-backed outbox for email. Views call queue_mail() rather than sending
+# mail themselves, so the email is only sent if the request's transaction
+# commits, and a slow or unreachable mail server doesn't hold up the
+# request. The queue is drained by send_queued_mail(), either from a worker
+# thread in the web process (settings.EMAIL_OUTBOX_WORKER) woken whenever
+# mail is queued and when the process serves its first request, or from
+# `./manage.py send-queued-mail`.
+
+logger = logging.getLogger(__name__)
+
+# Give up on an email after this many failed attempts.
+MAX_ATTEMPTS = 6
+
+# Wait this long before the first retry, doubling for each retry after.
+RETRY_DELAY = timedelta(minutes=1)
+
+# A sender claims emails by pushing their next attempt this far into the
+# future, so that other senders skip them while they're being sent.
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+# Send at most this many emails over one SMTP connection.
+BATCH_SIZE = 50
+
+def queue_mail(subject, message, recipient_list, from_email=None):
+    """ Queues an email to be sent once the current transaction commits. """
+    email = OutgoingEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.EMAIL_FROM_ADDRESS,
+        recipients='\n'.join(recipient_list),
+        next_attempt=timezone.now(),
+    )
+    if getattr(settings, 'EMAIL_OUTBOX_WORKER', False):
+        transaction.on_commit(worker.wake)
+    return email
+
+def claim(email, now):
+    """ Marks an email as being sent by us; False if another sender has it. """
+    claimed = OutgoingEmail.objects.filter(
+        pk=email.pk, sent__isnull=True, next_attempt=email.next_attempt,
+    ).update(next_attempt=now + CLAIM_TIMEOUT)
+    return claimed == 1
+
+def retry_delay(attempts):
+    return RETRY_DELAY * 2 ** (attempts - 1)
+
+def send_queued_mail(batch_size=BATCH_SIZE):
+    """
+    Sends the emails which are due, over a single connection. Failed emails
+    are retried later with exponential backoff. Returns a tuple of the number
+    of emails (sent, failed).
+    """
+    now = timezone.now()
+    due = OutgoingEmail.objects.filter(
+        sent__isnull=True, next_attempt__lte=now).order_by('next_attempt', 'id')
+    batch = [email for email in due[:batch_size] if claim(email, now)]
+    if not batch:
+        return 0, 0
+
+    sent = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+        for email in batch:
+            try:
+                connection.send_messages([EmailMessage(
+                    email.subject,
+                    email.body,
+                    email.from_email,
+                    email.recipient_list(),
+                    connection=connection,
+                )])
+            except (SMTPException, OSError) as e:
+                record_failure(email, e)
+            else:
+                email.sent = timezone.now()
+                email.next_attempt = None
+                sent += 1
+    except (SMTPException, OSError) as e:
+        # Couldn't connect; the whole batch failed.
+        for email in batch:
+            if email.sent is None:
+                record_failure(email, e)
+    finally:
+        try:
+            connection.close()
+        except (SMTPException, OSError):
+            pass
+
+    OutgoingEmail.objects.bulk_update(
+        batch, ['sent', 'next_attempt', 'attempts', 'last_error'])
+    return sent, len(batch) - sent
+
+def record_failure(email, error):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= MAX_ATTEMPTS:
+        logger.error("Giving up sending email %s to %s: %s",
+            email.id, email.recipients, error)
+        email.next_attempt = None
+    else:
+        email.next_attempt = timezone.now() + retry_delay(email.attempts)
+
+class OutboxWorker:
+    """
+    Sends queued mail from a daemon thread in the web process. The thread is
+    started the first time it's woken, and otherwise checks for retries due
+    every `interval` seconds.
+    """
+    def __init__(self, interval=60):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.thread = None
+
+    def wake(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name='outbox-worker', daemon=True)
+                self.thread.start()
+        self.event.set()
+
+    def run(self):
+        while True:
+            self.event.wait(self.interval)
+            self.event.clear()
+            try:
+                while True:
+                    sent, failed = send_queued_mail()
+                    if not sent and not failed:
+                        break
+            except Exception:
+                logger.exception("Error sending queued mail")
+            finally:
+                close_old_connections()
+
+worker = OutboxWorker()
+
+def start_worker_on_first_request():
+    """
+    Wakes the worker when the web process serves its first request, so that
+    retries due after a restart are sent without waiting for new mail to be
+    queued. Called from familyapi/wsgi.py and asgi.py, so that management
+    commands and tests don't start the thread.
+    """
+    if getattr(settings, 'EMAIL_OUTBOX_WORKER', False):
+        request_started.connect(first_request, dispatch_uid='outbox-first-request')
+
+def first_request(sender, **kwargs):
+    request_started.disconnect(dispatch_uid='outbox-first-request')
+    worker.wake()
@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand
+from api.gedcom_import import parse_file
+
+import os
+import tempfile
+import time
+
+
+def write_synthetic_gedcom(f, families):
+    """
+    Writes a GEDCOM file of `families` families, each with two partners and
+    two children.
+    """
+    f.write(b"0 HEAD\n1 CHAR UTF-8\n")
+    for n in range(families):
+        ids = ["@I{}@".format(n * 4 + i) for i in range(4)]
+        for i, pointer in enumerate(ids):
+            f.write(
+                (
+                    "0 {} INDI\n"
+                    "1 NAME Person{} /Surname{}/\n"
+                    "1 SEX {}\n"
+                    "1 BIRT\n2 DATE {} JAN {}\n2 PLAC Town{}, Region, Country\n"
+                    "1 DEAT\n2 DATE {}\n2 PLAC Town{}\n"
+                    "1 OCCU Farmer\n"
+                    "1 NOTE A note about this person, long enough to need\n"
+                    "2 CONC some continuation lines.\n"
+                ).format(
+                    pointer, i, n % 500, "MF"[i % 2], i + 1, 1800 + n % 200,
+                    n % 50, 1870 + n % 200, n % 70,
+                ).encode()
+            )
+        f.write(
+            (
+                "0 @F{}@ FAM\n1 HUSB {}\n1 WIFE {}\n1 CHIL {}\n1 CHIL {}\n"
+                "1 MARR\n2 DATE {}\n2 PLAC Church{}\n"
+            ).format(n, ids[0], ids[1], ids[2], ids[3], 1820 + n % 200, n % 30).encode()
+        )
+    f.write(b"0 TRLR\n")
+
+
+class Command(BaseCommand):
+    help = "Compares the speed of parsing a large synthetic GEDCOM file with different numbers of processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--families", type=int, default=25000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        cpus = os.cpu_count() or 1
+        jobs_counts = sorted({1, 2, cpus} | {2 ** i for i in range(cpus.bit_length())})
+        with tempfile.NamedTemporaryFile(suffix=".ged", delete=False) as f:
+            write_synthetic_gedcom(f, options["families"])
+        try:
+            self.stdout.write(
+                "{} bytes, {} CPUs".format(os.path.getsize(f.name), cpus)
+            )
+            self.stdout.write("{:>5} {:>10} {:>14} {:>8}".format("jobs", "seconds", "records/s", "speedup"))
+            expected = None
+            serial = None
+            for jobs in jobs_counts:
+                best = None
+                for _ in range(options["repeat"]):
+                    start = time.perf_counter()
+                    result = parse_file(f.name, jobs)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                if expected is None:
+                    expected = result
+                    serial = best
+                assert result == expected, "parallel parse differs from serial parse"
+                records = len(result[0]) + len(result[1])
+                self.stdout.write(
+                    "{:>5} {:>10.2f} {:>14.0f} {:>7.1f}x".format(
+                        jobs, best, records / best, serial / best
+                    )
+                )
+        finally:
+            os.remove(f.name)
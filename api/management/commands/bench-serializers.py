@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.models import Individual
+from api.graph import FamilyGraph
+from api.serializers import IndividualSerializer, BasicIndividualSerializer
+from api.serializers import BasicIndividualWithParents, BasicIndividualWithParentsSerializer
+from api.serializers import fast_individuals, fast_basic_individual, fast_individual_with_parents
+
+import time
+
+
+def rows_per_second(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(fn())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return rows / best if best else float("inf")
+
+
+class Command(BaseCommand):
+    help = "Compares the speed of the DRF serializers with the fast-path serializers, on the current DB"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        repeat = options["repeat"]
+        if not Individual.objects.exists():
+            raise CommandError("No individuals in DB to benchmark with")
+
+        # Pre-load everything for the serialization-only comparisons.
+        individuals = list(Individual.objects.select_related("child_in_family"))
+        with_parents = [BasicIndividualWithParents(i) for i in individuals]
+        graph = FamilyGraph()
+        graph.load_individuals(i.id for i in individuals)
+        graph.load_families(i.child_in_family_id for i in individuals)
+        rows = [graph.individuals[i.id] for i in individuals]
+
+        benchmarks = [
+            (
+                "IndividualSerializer (incl. queries)",
+                lambda: IndividualSerializer(
+                    IndividualSerializer.init_queryset(Individual.objects.all()), many=True
+                ).data,
+                lambda: fast_individuals(Individual.objects.all()),
+            ),
+            (
+                "BasicIndividualSerializer",
+                lambda: BasicIndividualSerializer(individuals, many=True).data,
+                lambda: [fast_basic_individual(row) for row in rows],
+            ),
+            (
+                "BasicIndividualWithParentsSerializer",
+                lambda: BasicIndividualWithParentsSerializer(with_parents, many=True).data,
+                lambda: [
+                    fast_individual_with_parents(row, graph.parents(row)) for row in rows
+                ],
+            ),
+        ]
+
+        self.stdout.write(
+            "{:<40} {:>14} {:>14} {:>8}".format("serializer", "DRF rows/s", "fast rows/s", "speedup")
+        )
+        for name, drf, fast in benchmarks:
+            drf_rate = rows_per_second(drf, repeat)
+            fast_rate = rows_per_second(fast, repeat)
+            self.stdout.write(
+                "{:<40} {:>14.0f} {:>14.0f} {:>7.1f}x".format(
+                    name, drf_rate, fast_rate, fast_rate / drf_rate
+                )
+            )
@@ -14,7 +14,7 @@ def serialize_individual(individual):
             "location": str_or_none(individual.birth_location),
         },
         "death": {
-            "date": str_or_none(individual.death_location),
+            "date": str_or_none(individual.death_date),
             "location": str_or_none(individual.death_location),
         },
         "buried": {
@@ -31,6 +31,7 @@ def serialize_individual(individual):
         else None,
         "note": str_or_none(individual.note),
         "spouse_in_family": [str(f.id) for f in individual.partner_in_families.all()],
+        "owner": individual.owner_id,
     }
 
 
@@ -44,10 +45,29 @@ def serialize_family(f):
             "date": str_or_none(f.married_date),
             "location": str_or_none(f.married_location),
             "note": str_or_none(f.note),
-        }
+        },
+        "owner": f.owner_id,
     }
 
 
+def dump_ndjson(output_file_path):
+    """
+    Writes one JSON object per line, with its "type" and "id", so that large
+    databases can be dumped and loaded a record at a time.
+    """
+    with open(output_file_path, "w") as f:
+        for i in (
+            Individual.objects.prefetch_related("partner_in_families")
+            .order_by("id")
+            .iterator(chunk_size=2000)
+        ):
+            record = {"type": "individual", "id": i.id, **serialize_individual(i)}
+            f.write(json.dumps(record) + "\n")
+        for family in Family.objects.order_by("id").iterator(chunk_size=2000):
+            record = {"type": "family", "id": family.id, **serialize_family(family)}
+            f.write(json.dumps(record) + "\n")
+
+
 def dump_data(output_file_path):
     individuals = {
         i.id: serialize_individual(i)
@@ -66,7 +86,13 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("output_file_path")
+        parser.add_argument(
+            "--ndjson", action="store_true", help="Write one record per line"
+        )
 
     def handle(self, *args, **options):
         output_file_path = options["output_file_path"]
-        dump_data(output_file_path)
+        if options["ndjson"]:
+            dump_ndjson(output_file_path)
+        else:
+            dump_data(output_file_path)
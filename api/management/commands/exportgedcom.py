@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.models import Individual
+from api.export import gedcom_export
+
+
+class Command(BaseCommand):
+    help = "Exports database in GEDCOM format"
+
+    def add_arguments(self, parser):
+        parser.add_argument("gedcom_file_path")
+        parser.add_argument(
+            "--root",
+            type=int,
+            help="Only export this individual's descendants and their spouses",
+        )
+
+    def handle(self, *args, **options):
+        root = options["root"]
+        if root is not None and not Individual.objects.filter(pk=root).exists():
+            raise CommandError("Individual {} does not exist".format(root))
+        with open(options["gedcom_file_path"], "w", encoding="utf-8") as f:
+            for piece in gedcom_export(root):
+                f.write(piece)
+        self.stdout.write(
+            self.style.SUCCESS("Exported to {}".format(options["gedcom_file_path"]))
+        )
@@ -0,0 +1,41 @@
+import os
+
+from django.core.management.base import BaseCommand
+from api.duplicates import MIN_SCORE, find_duplicates
+from api.models import Individual, chunked
+
+
+class Command(BaseCommand):
+    help = "Lists pairs of individuals who are probably the same person, most alike first"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-score",
+            type=float,
+            default=MIN_SCORE,
+            help="Only list pairs scoring at least this, from 0 to 1",
+        )
+        parser.add_argument("--limit", type=int, help="List at most this many pairs")
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of processes to compare individuals in",
+        )
+
+    def handle(self, *args, **options):
+        matches = find_duplicates(
+            options["min_score"], jobs=max(options["jobs"], 1), limit=options["limit"]
+        )
+        ids = sorted({pk for _, a, b in matches for pk in (a, b)})
+        names = {}
+        for chunk in chunked(ids):
+            for pk, first_names, last_name in Individual.objects.filter(
+                pk__in=chunk
+            ).values_list("id", "first_names", "last_name"):
+                names[pk] = "{} {}".format(first_names, last_name).strip()
+        for score, a, b in matches:
+            self.stdout.write(
+                "{:.3f}  {} ({})  {} ({})".format(score, names[a], a, names[b], b)
+            )
+        self.stdout.write(self.style.SUCCESS("Found {} likely duplicates".format(len(matches))))
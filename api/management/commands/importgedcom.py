@@ -1,11 +1,9 @@
 from django.core.management.base import BaseCommand, CommandError
 from api.models import Individual, Family
+from api.gedcom_import import family_children, family_values, parse_file, record_hash
+from api.gedcom_sync import SyncError, sync_gedcom
 
-from gedcom.element.individual import IndividualElement
-from gedcom.element.family import FamilyElement
-from gedcom.parser import Parser
-import gedcom
-from collections import defaultdict
+import os
 
 
 class Command(BaseCommand):
@@ -13,119 +11,82 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("gedcom_file_path")
-
-    def handle(self, *args, **options):
-        self.import_gedcom_file(options["gedcom_file_path"])
-
-    def parse_family(self, family_element):
-        """
-        Parses a GEDCOM family tag, returns a list of:
-        (id_str, id_str, datetime, str, List[id_str], str)
-        which corresponds to:
-        (husband, wife, date, place, children, note)
-        """
-        husband = ""
-        wife = ""
-        date = ""
-        place = ""
-        children = []
-        note = ""
-        for element in family_element.get_child_elements():
-            if element.get_tag() == gedcom.tags.GEDCOM_TAG_HUSBAND:
-                husband = element.get_value()
-            elif element.get_tag() == gedcom.tags.GEDCOM_TAG_WIFE:
-                wife = element.get_value()
-            elif element.get_tag() == gedcom.tags.GEDCOM_TAG_CHILD:
-                children.append(element.get_value())
-            elif element.get_tag() == gedcom.tags.GEDCOM_TAG_MARRIAGE:
-                for marriage_data in element.get_child_elements():
-                    if marriage_data.get_tag() == gedcom.tags.GEDCOM_TAG_DATE:
-                        date = marriage_data.get_value()
-                    if marriage_data.get_tag() == gedcom.tags.GEDCOM_TAG_PLACE:
-                        place = marriage_data.get_value()
-                    if marriage_data.get_tag() == "NOTE":
-                        note = marriage_data.get_value()
-        return (husband, wife, date, place, children, note)
-
-    def parse_indi(self, indi_element):
-        (first, last) = indi_element.get_name()
-        (birth_date, birth_place, _) = indi_element.get_birth_data()
-        (death_date, death_place, _) = indi_element.get_death_data()
-        (burial_date, burial_place, _) = indi_element.get_burial_data()
-
-        note = ""
-        baptism_date = ""
-        baptism_place = ""
-        for child in indi_element.get_child_elements():
-            if child.get_tag() == "NOTE":
-                note += child.get_value()
-                for grand_child in child.get_child_elements():
-                    if grand_child.get_tag() == "CONC":
-                        note += grand_child.get_value()
-                    elif grand_child.get_tag() == "CONT":
-                        note += grand_child.get_value()
-                    else:
-                        raise Exception(
-                            "Can't handle tag {} in NOTE".format(grand_child.get_tag())
-                        )
-            if child.get_tag() == "BAPM":
-                for grand_child in child.get_child_elements():
-                    if grand_child.get_tag() == "DATE":
-                        baptism_date = grand_child.get_value()
-                    elif grand_child.get_tag() == "PLAC":
-                        baptism_place = grand_child.get_value()
-                    elif grand_child.get_tag() == "NOTE":
-                        note += grand_child.get_value()
-                    # elif grand_child.get_tag() == "CONT":
-                    #     note += grand_child.get_value()
-                    else:
-                        raise Exception(
-                            "Can't handle tag {} in BAPM".format(grand_child.get_tag())
-                        )
-
-        return Individual(
-            first_names=first,
-            last_name=last,
-            sex=indi_element.get_gender(),
-            birth_date=birth_date,
-            birth_location=birth_place,
-            death_date=death_date,
-            death_location=death_place,
-            buried_date=burial_date,
-            buried_location=burial_place,
-            baptism_date=baptism_date,
-            baptism_location=baptism_place,
-            occupation=indi_element.get_occupation(),
-            note=note,
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=1,
+            help="Number of processes to parse the file in",
+        )
+        parser.add_argument(
+            "--update",
+            action="store_true",
+            help="Update the records previously imported from the same source, "
+            "rather than creating new ones",
+        )
+        parser.add_argument(
+            "--source",
+            help="Name of the file's source, to match records on --update; "
+            "defaults to the file's name",
         )
 
-    def import_gedcom_file(self, gedcom_file_path):
-        gedcom_parser = Parser()
-        gedcom_parser.parse_file(gedcom_file_path)
-        root_child_elements = gedcom_parser.get_root_child_elements()
+    def handle(self, *args, **options):
+        path = options["gedcom_file_path"]
+        source = options["source"] or os.path.basename(path)
+        if options["update"]:
+            self.update_from_gedcom_file(path, source, options["jobs"])
+        else:
+            self.import_gedcom_file(path, options["jobs"], source)
+
+    def update_from_gedcom_file(self, gedcom_file_path, source, jobs=1):
+        individuals, families = parse_file(gedcom_file_path, jobs)
+        try:
+            counts = sync_gedcom(individuals, families, source)
+        except SyncError as e:
+            raise CommandError("Can't update from {}: {}".format(gedcom_file_path, e))
+        for kind in ["individuals", "families"]:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    "{}: {created} created, {updated} updated, {deleted} deleted, "
+                    "{unchanged} unchanged".format(kind.capitalize(), **counts[kind])
+                )
+            )
 
+    def import_gedcom_file(self, gedcom_file_path, jobs=1, source=""):
         # Parse all elements in the GEDCOM file, recording details from
         # individual and family elements.
+        parsed_individuals, families = parse_file(gedcom_file_path, jobs)
 
-        families = []
         # Lookup from gedcom individual pointer (e.g. "@I219") to api.Individual.
-        individuals = dict()
-        for element in root_child_elements:
-            if isinstance(element, IndividualElement):
-                individuals[element.get_pointer()] = self.parse_indi(element)
-            elif isinstance(element, FamilyElement):
-                families.append(self.parse_family(element))
+        # Each records where it came from, so the file can be re-imported
+        # with --update.
+        individuals = {
+            pointer: Individual(
+                gedcom_source=source,
+                gedcom_xref=pointer,
+                gedcom_hash=record_hash(fields),
+                **fields
+            )
+            for pointer, fields in parsed_individuals
+        }
+        parents = family_children(families)
 
         # Note: in order to relations in the DB, we need to commit the
         # Individuals to the DB so they have valid PK's.
         for individual in individuals.values():
             individual.save()
 
-        for husband, wife, married_date, place, children, note in families:
+        for pointer, parsed_family in families:
+            husband, wife, married_date, place, children, note = parsed_family
+            values = family_values(
+                parsed_family, [c for c in children if parents[c] == pointer]
+            )
             family = Family(
                 married_date=married_date,
                 married_location=place,
                 note=note,
+                gedcom_source=source,
+                gedcom_xref=pointer,
+                gedcom_hash=record_hash(values),
             )
             family.save()
             for partner in filter(lambda k: k != "", [husband, wife]):
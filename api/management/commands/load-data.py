@@ -0,0 +1,251 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from api.models import Individual, Family, AncestryClosure, Change, PlaceEvent, Statistic
+
+import json
+
+BATCH_SIZE = 1000
+
+DECODER = json.JSONDecoder()
+
+
+class JSONReader:
+    """
+    Reads a JSON document from a file a piece at a time, so that the objects
+    in a large dump needn't all be in memory at once.
+    """
+
+    def __init__(self, f, chunk_size=1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        data = self.f.read(self.chunk_size)
+        if not data:
+            self.eof = True
+        self.buffer = self.buffer[self.pos :] + data
+        self.pos = 0
+
+    def peek(self):
+        """ The next character after any whitespace; '' at the end of the file. """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos : self.pos + 1]
+            self.fill()
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise CommandError("Expected {!r} in JSON".format(char))
+        self.pos += 1
+
+    def value(self):
+        """ Reads the next value whole. """
+        self.peek()
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self.buffer, self.pos)
+                # A number at the end of the buffer may continue in the file.
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise CommandError("Invalid JSON: {}".format(e))
+            self.fill()
+
+    def members(self):
+        """
+        Yields the keys of the next object; the caller reads each key's value
+        before asking for the next key.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            separator = self.peek()
+            self.pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise CommandError("Expected ',' or '}' in JSON")
+
+
+def json_records(f):
+    """ Yields (type, id, record) for the records of a dump-data file. """
+    reader = JSONReader(f)
+    for section in reader.members():
+        if section == "individuals":
+            for key in reader.members():
+                yield "individual", int(key), reader.value()
+        elif section == "families":
+            for key in reader.members():
+                yield "family", int(key), reader.value()
+        else:
+            reader.value()
+
+
+def ndjson_records(f):
+    """ Yields (type, id, record) for the records of a dump-data --ndjson file. """
+    for line in f:
+        if line.strip():
+            record = json.loads(line)
+            yield record["type"], record["id"], record
+
+
+def records(f):
+    # NDJSON files are a complete object on each line; a JSON dump starts
+    # with its outer object's opening brace.
+    first_line = f.readline()
+    f.seek(0)
+    try:
+        ndjson = "type" in json.loads(first_line)
+    except (ValueError, TypeError):
+        ndjson = False
+    return ndjson_records(f) if ndjson else json_records(f)
+
+
+def text(value):
+    return value or ""
+
+
+def event(record, name, part):
+    return text((record.get(name) or {}).get(part))
+
+
+def individual_from_record(pk, record, owner_id=None):
+    child_in_family = record.get("child_in_family")
+    individual = Individual(
+        id=pk,
+        owner_id=owner_id,
+        first_names=text(record.get("first_names")),
+        last_name=text(record.get("last_name")),
+        sex=text(record.get("sex")),
+        birth_date=event(record, "birth", "date"),
+        birth_location=event(record, "birth", "location"),
+        death_date=event(record, "death", "date"),
+        death_location=event(record, "death", "location"),
+        buried_date=event(record, "buried", "date"),
+        buried_location=event(record, "buried", "location"),
+        baptism_date=event(record, "baptism", "date"),
+        baptism_location=event(record, "baptism", "location"),
+        occupation=text(record.get("occupation")),
+        child_in_family_id=int(child_in_family) if child_in_family else None,
+        note=record.get("note"),
+    )
+    individual.update_phonetic_keys()
+    individual.update_years()
+    return individual
+
+
+def family_from_record(pk, record, owner_id=None):
+    return Family(
+        id=pk,
+        owner_id=owner_id,
+        married_date=event(record, "married", "date"),
+        married_location=event(record, "married", "location"),
+        note=(record.get("married") or {}).get("note"),
+    )
+
+
+class Loader:
+    """ Creates records in batches, keeping their ids. """
+
+    def __init__(self, user_ids=()):
+        # Owners are kept if they're users of this database; others are
+        # dropped and counted.
+        self.user_ids = set(user_ids)
+        self.unknown_owners = 0
+        self.individuals = []
+        self.families = []
+        self.partners = []
+        self.individual_ids = []
+        self.family_ids = []
+
+    def owner_id(self, record):
+        owner_id = record.get("owner")
+        if owner_id is not None and owner_id not in self.user_ids:
+            self.unknown_owners += 1
+            return None
+        return owner_id
+
+    def add(self, kind, pk, record):
+        if kind == "individual":
+            self.individuals.append(individual_from_record(pk, record, self.owner_id(record)))
+            self.individual_ids.append(pk)
+            Through = Family.partners.through
+            for family_id in record.get("spouse_in_family") or []:
+                self.partners.append(Through(family_id=int(family_id), individual_id=pk))
+        elif kind == "family":
+            self.families.append(family_from_record(pk, record, self.owner_id(record)))
+            self.family_ids.append(pk)
+        if len(self.individuals) + len(self.families) + len(self.partners) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        # Foreign keys are checked at the end of the transaction, so records
+        # may refer to ones which come later in the file.
+        Family.objects.bulk_create(self.families, batch_size=500)
+        Individual.objects.bulk_create(self.individuals, batch_size=500)
+        Family.partners.through.objects.bulk_create(self.partners, batch_size=500)
+        self.individuals = []
+        self.families = []
+        self.partners = []
+
+
+class Command(BaseCommand):
+    help = "Loads a database exported by dump-data into an empty database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("input_file_path")
+
+    def handle(self, *args, **options):
+        if Individual.objects.exists() or Family.objects.exists():
+            raise CommandError("The database already has individuals or families")
+
+        loader = Loader(User.objects.values_list("id", flat=True))
+        with transaction.atomic():
+            with open(options["input_file_path"]) as f:
+                for kind, pk, record in records(f):
+                    loader.add(kind, pk, record)
+            loader.flush()
+
+            # New rows will be given ids after the loaded ones.
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), [Individual, Family]):
+                    cursor.execute(sql)
+
+            # Bulk creation doesn't send signals, so build the derived tables
+            # once at the end.
+            Family.update_family_names(loader.family_ids)
+            AncestryClosure.rebuild()
+            PlaceEvent.rebuild()
+            Statistic.rebuild()
+            Change.record(Change.INDIVIDUAL, loader.individual_ids)
+            Change.record(Change.FAMILY, loader.family_ids)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Loaded {} individuals {} families".format(
+                    len(loader.individual_ids), len(loader.family_ids)
+                )
+            )
+        )
+        if loader.unknown_owners:
+            self.stdout.write(
+                self.style.WARNING(
+                    "Dropped {} owners who aren't users of this database".format(
+                        loader.unknown_owners
+                    )
+                )
+            )
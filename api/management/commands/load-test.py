@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from concurrent.futures import ThreadPoolExecutor
+import statistics
+import time
+import urllib.error
+import urllib.request
+
+
+def fetch(url, token):
+    request = urllib.request.Request(url)
+    if token:
+        request.add_header("Authorization", "Token " + token)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request) as response:
+            response.read()
+            ok = response.status == 200
+    except (urllib.error.URLError, OSError):
+        ok = False
+    return ok, time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends concurrent requests to a running server and reports throughput and latency; "
+        "use to compare the WSGI and ASGI deployments"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", nargs="+", help="URLs to request, in turn")
+        parser.add_argument("--token", help="Auth token to send")
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument("--requests", type=int, default=500)
+
+    def handle(self, *args, **options):
+        urls = options["url"]
+        total = options["requests"]
+        if total < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests and --concurrency must be positive")
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            results = list(
+                pool.map(lambda i: fetch(urls[i % len(urls)], options["token"]), range(total))
+            )
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(latency for ok, latency in results)
+        failures = sum(1 for ok, latency in results if not ok)
+        self.stdout.write(
+            "{} requests, {} concurrent, in {:.2f}s: {:.1f} requests/s".format(
+                total, options["concurrency"], elapsed, total / elapsed
+            )
+        )
+        self.stdout.write(
+            "latency ms: median {:.1f}, p90 {:.1f}, p99 {:.1f}, max {:.1f}".format(
+                statistics.median(latencies) * 1000,
+                percentile(latencies, 0.9) * 1000,
+                percentile(latencies, 0.99) * 1000,
+                latencies[-1] * 1000,
+            )
+        )
+        if failures:
+            self.stdout.write(self.style.ERROR("{} requests failed".format(failures)))
+        else:
+            self.stdout.write(self.style.SUCCESS("All requests succeeded"))
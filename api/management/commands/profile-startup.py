@@ -0,0 +1,143 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from collections import defaultdict
+import json
+import subprocess
+import sys
+
+# Run in a fresh interpreter, so that nothing is imported or cached yet, as
+# when a sleeping dyno wakes up. Prints the time of each phase as JSON; the
+# interpreter's -X importtime report goes to stderr.
+PROFILE_SCRIPT = """
+import json, os, sys, time
+
+timings = []
+start = time.perf_counter()
+
+def phase(name):
+    global start
+    now = time.perf_counter()
+    timings.append((name, now - start))
+    start = now
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "familyapi.settings")
+import django
+from django.conf import settings
+settings.INSTALLED_APPS
+phase("settings")
+
+django.setup()
+phase("django.setup()")
+
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+application = get_wsgi_application()
+get_resolver().url_patterns
+phase("WSGI application and URLconf")
+
+options = json.loads(sys.argv[1])
+from django.db import connection
+connection.ensure_connection()
+phase("DB connection")
+
+# Not part of a real process's startup.
+from django.test import Client
+headers = {}
+if options["token"]:
+    headers["HTTP_AUTHORIZATION"] = "Token " + options["token"]
+client = Client(HTTP_HOST=(settings.ALLOWED_HOSTS or ["localhost"])[0], **headers)
+phase("test client")
+
+if options["warm_up"]:
+    # As when the frontend pings a process with settings.WARM_UP_ON_PING.
+    from api.warmup import warm_up
+    client.get("/api/v1/ping/")
+    warm_up()
+    phase("ping and warm-up")
+
+for name in ["first request", "second request"]:
+    response = client.get(options["path"])
+    if response.status_code != 200:
+        sys.exit("GET {} returned {}".format(options["path"], response.status_code))
+    phase(name)
+
+print(json.dumps(timings))
+"""
+
+
+def import_times(report):
+    """
+    Parses a -X importtime report; returns a list of (module, self,
+    cumulative) times in seconds.
+    """
+    times = []
+    for line in report.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        times.append(
+            (fields[2].strip(), int(fields[0]) / 1e6, int(fields[1]) / 1e6)
+        )
+    return times
+
+
+class Command(BaseCommand):
+    help = "Reports where the time goes when a new web process starts and serves its first requests"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top", type=int, default=15, help="Number of slowest imports to list"
+        )
+        parser.add_argument(
+            "--path", default="/api/v1/ping/", help="Path of the requests to time"
+        )
+        parser.add_argument("--token", help="Auth token to make the requests with")
+        parser.add_argument(
+            "--warm-up",
+            action="store_true",
+            help="Ping and warm up before the first request",
+        )
+
+    def handle(self, *args, **options):
+        script_options = {
+            "path": options["path"],
+            "token": options["token"],
+            "warm_up": options["warm_up"],
+        }
+        command = [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            PROFILE_SCRIPT,
+            json.dumps(script_options),
+        ]
+        result = subprocess.run(
+            command, cwd=settings.BASE_DIR, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise CommandError("Profiling failed:\n{}".format(result.stderr[-2000:]))
+        timings = json.loads(result.stdout.splitlines()[-1])
+        imports = import_times(result.stderr)
+
+        self.stdout.write("Startup phases:")
+        for name, seconds in timings:
+            self.stdout.write("  {:<32} {:8.1f} ms".format(name, seconds * 1000))
+        self.stdout.write(
+            "  {:<32} {:8.1f} ms".format("total", sum(s for _, s in timings) * 1000)
+        )
+
+        by_package = defaultdict(float)
+        for module, own, _ in imports:
+            by_package[module.split(".")[0]] += own
+        self.stdout.write("Import time by top-level package:")
+        for package, seconds in sorted(by_package.items(), key=lambda p: -p[1])[: options["top"]]:
+            self.stdout.write("  {:<32} {:8.1f} ms".format(package, seconds * 1000))
+
+        self.stdout.write("Slowest imports (including their own imports):")
+        slowest = sorted(imports, key=lambda i: -i[2])[: options["top"]]
+        for module, _, cumulative in slowest:
+            self.stdout.write("  {:<48} {:8.1f} ms".format(module, cumulative * 1000))
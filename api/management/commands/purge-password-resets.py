@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from api.models import PasswordResetRequest
+
+
+class Command(BaseCommand):
+    help = "Deletes expired password reset and account confirmation requests"
+
+    def handle(self, *args, **options):
+        deleted = PasswordResetRequest.purge_expired()
+        self.stdout.write(self.style.SUCCESS("Deleted {} expired requests".format(deleted)))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from api.models import AncestryClosure
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the ancestry closure table from scratch"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            AncestryClosure.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Rebuilt {} ancestry rows".format(AncestryClosure.objects.count())
+            )
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.models import Place, PlaceEvent
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the place and place event tables from individuals' and families' locations"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            PlaceEvent.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Rebuilt {} events at {} places".format(
+                    PlaceEvent.objects.count(), Place.objects.count()
+                )
+            )
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.models import Statistic
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the statistics table from scratch"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            Statistic.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Rebuilt {} statistics".format(Statistic.objects.count())
+            )
+        )
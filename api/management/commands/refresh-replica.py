@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.replica import REPLICA, refresh_replica
+
+import time
+
+
+class Command(BaseCommand):
+    help = "Copies the database to the read replica"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true", help="Keep running, refreshing the replica"
+        )
+        parser.add_argument(
+            "--interval", type=float, default=30, help="Seconds between refreshes with --loop"
+        )
+
+    def handle(self, *args, **options):
+        if options["interval"] <= 0:
+            raise CommandError("--interval must be positive")
+        primary = settings.DATABASES["default"]["NAME"]
+        replica = settings.DATABASES[REPLICA]["NAME"]
+        while True:
+            start = time.perf_counter()
+            refresh_replica(primary, replica)
+            if not options["loop"]:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        "Copied {} to {} in {:.2f}s".format(
+                            primary, replica, time.perf_counter() - start
+                        )
+                    )
+                )
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from api.mail import send_queued_mail
+
+import time
+
+
+class Command(BaseCommand):
+    help = "Sends the emails queued in the outbox which are due"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true", help="Keep running, checking for mail to send"
+        )
+        parser.add_argument(
+            "--interval", type=float, default=10, help="Seconds between checks with --loop"
+        )
+
+    def handle(self, *args, **options):
+        if options["interval"] <= 0:
+            raise CommandError("--interval must be positive")
+        while True:
+            total_sent = total_failed = 0
+            while True:
+                sent, failed = send_queued_mail()
+                total_sent += sent
+                total_failed += failed
+                if not sent and not failed:
+                    break
+            if total_sent or total_failed or not options["loop"]:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        "Sent {} emails, {} failed".format(total_sent, total_failed)
+                    )
+                )
+            if not options["loop"]:
+                return
+            close_old_connections()
+            time.sleep(options["interval"])
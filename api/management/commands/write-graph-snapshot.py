@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.snapshot import GraphSnapshot, write_snapshot
+
+import os
+
+
+class Command(BaseCommand):
+    help = "Writes the graph snapshot which the tree endpoints read instead of the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            help="Where to write it; by default settings.GRAPH_SNAPSHOT_FILE",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"] or settings.GRAPH_SNAPSHOT_FILE
+        if not path:
+            raise CommandError("No path given and GRAPH_SNAPSHOT_FILE isn't set")
+        change_id = write_snapshot(path)
+        snapshot = GraphSnapshot.open(path)
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Wrote {} individuals {} families ({} bytes) as of change {}".format(
+                    len(snapshot.sections["individual_ids"]),
+                    len(snapshot.sections["family_ids"]),
+                    os.path.getsize(path),
+                    change_id,
+                )
+            )
+        )
@@ -0,0 +1,178 @@
+from django.db import transaction
+from django.db.models import Case, Q, Value, When
+
+from api.models import Individual, Family, AncestryClosure, Change, PlaceEvent, Statistic, chunked
+from api.signals import deletes_handled
+
+# Merging duplicate individuals, e.g. those found by api.duplicates. Each
+# merge names the individual to `keep` and the `duplicate` to merge into it;
+# the duplicate's families become the kept individual's, fields the kept
+# individual doesn't have are filled in from the duplicate, and the
+# duplicate is deleted. Many merges are applied together, with a fixed
+# number of queries per chunk of merges rather than per merge.
+
+# Fields copied from the duplicate where the kept individual's are blank.
+MERGED_FIELDS = [
+    'first_names',
+    'last_name',
+    'sex',
+    'birth_date',
+    'birth_location',
+    'death_date',
+    'death_location',
+    'buried_date',
+    'buried_location',
+    'baptism_date',
+    'baptism_location',
+    'occupation',
+    'child_in_family',
+    'note',
+    'owner',
+]
+
+def is_blank(field, value):
+    return value in ('', None) or (field == 'sex' and value == '?')
+
+class Merges:
+    """
+    Validates and then applies a list of merges, in the style of BulkChanges:
+    call is_valid(), check `errors`, then save().
+    """
+    def __init__(self, data):
+        self.data = data
+        self.errors = []
+        # Duplicate id to the id of the individual it's merged into.
+        self.merges = {}
+        self.individuals = {}
+
+    def is_valid(self):
+        entries = self.data.get('merges') if isinstance(self.data, dict) else None
+        if not isinstance(entries, list) or not entries:
+            self.errors.append('Expected a list of merges.')
+            return False
+
+        merges = {}
+        for entry in entries:
+            keep = entry.get('keep') if isinstance(entry, dict) else None
+            duplicate = entry.get('duplicate') if isinstance(entry, dict) else None
+            if not all(isinstance(i, int) and not isinstance(i, bool) for i in [keep, duplicate]):
+                self.errors.append('Each merge needs integer keep and duplicate ids.')
+            elif keep == duplicate:
+                self.errors.append("Can't merge individual {} with itself.".format(keep))
+            elif duplicate in merges:
+                self.errors.append('Individual {} is merged more than once.'.format(duplicate))
+            else:
+                merges[duplicate] = keep
+        if self.errors:
+            return False
+        for duplicate, keep in merges.items():
+            if keep in merges:
+                self.errors.append(
+                    "Individual {} is kept, so can't be merged into {}.".format(keep, merges[keep]))
+        if self.errors:
+            return False
+
+        ids = set(merges) | set(merges.values())
+        for chunk in chunked(ids):
+            self.individuals.update(Individual.objects.in_bulk(chunk))
+        for i in sorted(ids - self.individuals.keys()):
+            self.errors.append('Individual {} does not exist.'.format(i))
+        if self.errors:
+            return False
+
+        # Merging someone into their own ancestor or descendant would make
+        # them their own ancestor.
+        pairs = list(merges.items())
+        for chunk in chunked(pairs, size=100):
+            related = Q()
+            for duplicate, keep in chunk:
+                related |= Q(ancestor_id=keep, descendant_id=duplicate)
+                related |= Q(ancestor_id=duplicate, descendant_id=keep)
+            for ancestor, descendant in AncestryClosure.objects.filter(
+                    related, depth__gt=0).values_list('ancestor_id', 'descendant_id'):
+                self.errors.append(
+                    "Individual {} is an ancestor of {}, so they can't be merged.".format(
+                        ancestor, descendant))
+        self.merges = merges
+        return not self.errors
+
+    def existing_objects(self):
+        """ The individuals which save() will modify or delete. """
+        return [self.individuals[i] for i in sorted(self.individuals)]
+
+    def save(self):
+        """ Applies the merges in a single transaction. """
+        with transaction.atomic():
+            self.apply()
+
+    def apply(self):
+        merges = self.merges
+        duplicate_ids = sorted(merges)
+        keeps = {}
+        for duplicate_id, keep_id in merges.items():
+            keep = self.individuals[keep_id]
+            duplicate = self.individuals[duplicate_id]
+            for field in MERGED_FIELDS:
+                attname = Individual._meta.get_field(field).attname
+                if is_blank(field, getattr(keep, attname)) and \
+                        not is_blank(field, getattr(duplicate, attname)):
+                    setattr(keep, attname, getattr(duplicate, attname))
+            keeps[keep_id] = keep
+        for keep in keeps.values():
+            keep.update_phonetic_keys()
+            keep.update_years()
+        Individual.objects.bulk_update(keeps.values(),
+            MERGED_FIELDS + Individual.PHONETIC_FIELDS + Individual.YEAR_FIELDS, batch_size=500)
+
+        # Move the duplicates' partnerships to the kept individuals. Where
+        # both were partners in the same family, drop the duplicate's row
+        # rather than repeating the kept individual.
+        Through = Family.partners.through
+        partnerships = set()
+        rows = []
+        for ids in chunked(duplicate_ids + list(keeps)):
+            rows += Through.objects.filter(individual_id__in=ids).values_list(
+                'id', 'family_id', 'individual_id')
+        for _, family_id, individual_id in rows:
+            if individual_id in keeps:
+                partnerships.add((family_id, individual_id))
+        dropped_rows = []
+        for row_id, family_id, individual_id in rows:
+            if individual_id in merges:
+                partnership = (family_id, merges[individual_id])
+                if partnership in partnerships:
+                    dropped_rows.append(row_id)
+                partnerships.add(partnership)
+        for ids in chunked(dropped_rows):
+            Through.objects.filter(pk__in=ids).delete()
+        for ids in chunked(duplicate_ids):
+            Through.objects.filter(individual_id__in=ids).update(individual_id=Case(
+                *[When(individual_id=i, then=Value(merges[i])) for i in ids]))
+        affected_families = {family_id for family_id, _ in partnerships}
+
+        # Delete the duplicates, and with them their ancestry rows and place
+        # events. The derived tables are updated below for all of them at
+        # once, so skip the per-object delete signals, which would find
+        # nothing to do.
+        with deletes_handled():
+            for ids in chunked(duplicate_ids):
+                Individual.objects.filter(pk__in=ids).delete()
+
+        # Bulk writes don't send signals, so update the ancestry of the kept
+        # individuals, whose parents may have changed, and of the children of
+        # the families they've joined.
+        children = []
+        for ids in chunked(affected_families):
+            children += Individual.objects.filter(
+                child_in_family_id__in=ids).values_list('id', flat=True)
+        AncestryClosure.rebuild(set(keeps) | set(children))
+
+        Family.update_family_names(affected_families)
+        PlaceEvent.update_individuals(keeps)
+        Statistic.individuals_changed(keeps.values())
+        Statistic.individuals_deleted(self.individuals[i] for i in duplicate_ids)
+
+        Change.record(Change.INDIVIDUAL, keeps)
+        Change.record(Change.INDIVIDUAL, duplicate_ids, Change.DELETE)
+        Change.record(Change.FAMILY, affected_families |
+            {self.individuals[i].child_in_family_id for i in duplicate_ids})
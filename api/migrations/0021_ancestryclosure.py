@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:16
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from api.models import closure_ancestries
+
+
+def build_closure(apps, schema_editor):
+    Individual = apps.get_model('api', 'Individual')
+    Family = apps.get_model('api', 'Family')
+    AncestryClosure = apps.get_model('api', 'AncestryClosure')
+    partners = defaultdict(list)
+    for family_id, individual_id in Family.partners.through.objects.values_list(
+            'family_id', 'individual_id').iterator(chunk_size=2000):
+        partners[family_id].append(individual_id)
+    parents = {
+        i: partners.get(f, [])
+        for i, f in Individual.objects.values_list('id', 'child_in_family_id').iterator(chunk_size=2000)
+    }
+    ancestries = closure_ancestries(parents, {})
+    AncestryClosure.objects.bulk_create([
+        AncestryClosure(ancestor_id=ancestor_id, descendant_id=i, depth=depth)
+        for i, ancestry in ancestries.items()
+            for ancestor_id, depth in ancestry.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_auto_20191215_0010'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AncestryClosure',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='api.individual')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='api.individual')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ancestor', 'depth'], name='api_ancestr_ancesto_94100f_idx'), models.Index(fields=['descendant', 'depth'], name='api_ancestr_descend_b80bb1_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(build_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='passwordresetrequest',
+            name='expires',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_passwordresetrequest_expires_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('individual', 'Individual'), ('family', 'Family')], max_length=10)),
+                ('entity_id', models.IntegerField()),
+                ('op', models.CharField(choices=[('save', 'Save'), ('delete', 'Delete')], max_length=6)),
+            ],
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:33
+
+from django.db import migrations, models
+
+from api.phonetic import first_word, soundex
+
+
+def backfill_soundex(apps, schema_editor):
+    Individual = apps.get_model('api', 'Individual')
+    batch = []
+    for individual in Individual.objects.only('id', 'first_names', 'last_name').iterator(chunk_size=2000):
+        individual.first_name_soundex = soundex(first_word(individual.first_names))
+        individual.last_name_soundex = soundex(individual.last_name)
+        batch.append(individual)
+        if len(batch) == 2000:
+            Individual.objects.bulk_update(batch, ['first_name_soundex', 'last_name_soundex'])
+            batch = []
+    Individual.objects.bulk_update(batch, ['first_name_soundex', 'last_name_soundex'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_change'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='individual',
+            name='first_name_soundex',
+            field=models.CharField(blank=True, db_index=True, max_length=4),
+        ),
+        migrations.AddField(
+            model_name='individual',
+            name='last_name_soundex',
+            field=models.CharField(blank=True, db_index=True, max_length=4),
+        ),
+        migrations.RunPython(backfill_soundex, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from api.models import normalize_location, place_fields
+
+# The location field of each kind of event.
+INDIVIDUAL_FIELDS = {
+    'birth': 'birth_location',
+    'death': 'death_location',
+    'buried': 'buried_location',
+    'baptism': 'baptism_location',
+}
+FAMILY_FIELDS = {
+    'married': 'married_location',
+}
+
+
+def build_places(apps, schema_editor):
+    Individual = apps.get_model('api', 'Individual')
+    Family = apps.get_model('api', 'Family')
+    Place = apps.get_model('api', 'Place')
+    PlaceEvent = apps.get_model('api', 'PlaceEvent')
+    events = []
+    for model, link, fields in [
+            (Individual, 'individual_id', INDIVIDUAL_FIELDS), (Family, 'family_id', FAMILY_FIELDS)]:
+        for row in model.objects.values_list('id', *fields.values()).iterator(chunk_size=2000):
+            for event, location in zip(fields, row[1:]):
+                name = normalize_location(location)
+                if name:
+                    events.append((event, name, link, row[0]))
+    names = {}
+    for _, name, _, _ in events:
+        names.setdefault(name.lower(), name)
+    Place.objects.bulk_create(
+        [Place(**place_fields(name)) for name in names.values()], batch_size=500)
+    place_ids = dict(Place.objects.values_list('key', 'id'))
+    PlaceEvent.objects.bulk_create([
+        PlaceEvent(place_id=place_ids[name.lower()], event=event, **{link: pk})
+        for event, name, link, pk in events
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_individual_soundex'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Place',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('town', models.CharField(blank=True, max_length=100)),
+                ('region', models.CharField(blank=True, max_length=100)),
+                ('country', models.CharField(blank=True, db_index=True, max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PlaceEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(choices=[('birth', 'Birth'), ('death', 'Death'), ('buried', 'Buried'), ('baptism', 'Baptism'), ('married', 'Married')], max_length=7)),
+                ('family', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='place_events', to='api.family')),
+                ('individual', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='place_events', to='api.individual')),
+                ('place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='api.place')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['place', 'event'], name='api_placeev_place_i_dc22d4_idx')],
+            },
+        ),
+        migrations.RunPython(build_places, migrations.RunPython.noop),
+    ]
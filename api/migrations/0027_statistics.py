@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:43
+
+from django.db import migrations, models
+
+from api.models import fuzzy_date_year, statistic_rows
+
+
+def backfill_years(apps, schema_editor):
+    Individual = apps.get_model('api', 'Individual')
+    batch = []
+    for individual in Individual.objects.only('id', 'birth_date', 'death_date').iterator(chunk_size=2000):
+        individual.birth_year = fuzzy_date_year(individual.birth_date)
+        individual.death_year = fuzzy_date_year(individual.death_date)
+        batch.append(individual)
+        if len(batch) == 2000:
+            Individual.objects.bulk_update(batch, ['birth_year', 'death_year'])
+            batch = []
+    Individual.objects.bulk_update(batch, ['birth_year', 'death_year'])
+
+
+def build_statistics(apps, schema_editor):
+    Individual = apps.get_model('api', 'Individual')
+    Family = apps.get_model('api', 'Family')
+    Statistic = apps.get_model('api', 'Statistic')
+    Statistic.objects.bulk_create([
+        Statistic(kind=kind, key=key, value=value)
+        for kind, key, value in statistic_rows(Individual.objects, Family.objects)
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_place'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='individual',
+            name='birth_year',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='individual',
+            name='death_year',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='Statistic',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=10)),
+                ('key', models.CharField(max_length=50)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'value'], name='api_statist_kind_fe7801_idx')],
+                'unique_together': {('kind', 'key')},
+            },
+        ),
+        migrations.RunPython(backfill_years, migrations.RunPython.noop),
+        migrations.RunPython(build_statistics, migrations.RunPython.noop),
+    ]
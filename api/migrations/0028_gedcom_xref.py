@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_statistics'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='family',
+            name='gedcom_hash',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='family',
+            name='gedcom_source',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='family',
+            name='gedcom_xref',
+            field=models.CharField(blank=True, max_length=30),
+        ),
+        migrations.AddField(
+            model_name='individual',
+            name='gedcom_hash',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='individual',
+            name='gedcom_source',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='individual',
+            name='gedcom_xref',
+            field=models.CharField(blank=True, max_length=30),
+        ),
+        migrations.AddIndex(
+            model_name='family',
+            index=models.Index(fields=['gedcom_source', 'gedcom_xref'], name='api_family_gedcom__eb12f0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='individual',
+            index=models.Index(fields=['gedcom_source', 'gedcom_xref'], name='api_individ_gedcom__04bb0a_idx'),
+        ),
+    ]
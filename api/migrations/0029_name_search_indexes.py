@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:11
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_gedcom_xref'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='individual',
+            index=models.Index(django.db.models.functions.text.Lower('last_name'), name='individual_last_name_lower'),
+        ),
+        migrations.AddIndex(
+            model_name='individual',
+            index=models.Index(django.db.models.functions.text.Lower('first_names'), name='individual_first_names_lower'),
+        ),
+    ]
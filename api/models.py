@@ -1,13 +1,16 @@
 from django.db import models
+from django.db.models.functions import Lower
 from datetime import date, datetime, timedelta
 from django.contrib.auth.models import User
-from collections import Counter
+from collections import Counter, defaultdict
 from functools import reduce
 
 import re
 
 import pytz
 
+from api.phonetic import first_word, soundex
+
 import string
 import random
 
@@ -37,6 +40,21 @@ def married_date_or_min_year(partnership):
         return year
     return 0
 
+def chunked(values, size=500):
+    """
+    Splits values into lists of at most size elements; keeps `__in` queries
+    under SQLite's limit on the number of query parameters.
+    """
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+def family_name(partners):
+    # Sort list first by last name, second by sex with males first.
+    partners_list = sorted(partners, key=lambda i: i.last_name)
+    partners_list.sort(key=lambda i: i.sex, reverse=True)
+    return " & ".join(map(str, partners_list))
+
 class Individual(models.Model):
     first_names = models.CharField(max_length=50, blank=True)
     last_name = models.CharField(max_length=50, blank=True)
@@ -68,6 +86,61 @@ class Individual(models.Model):
 
     owner = models.ForeignKey('auth.User', related_name='individuals', null=True, on_delete=models.SET_NULL)
 
+    # Computed fields; Soundex codes of the first given name and the last
+    # name, for phonetic search. Kept up to date by save(); bulk writes must
+    # call update_phonetic_keys() themselves.
+    first_name_soundex = models.CharField(max_length=4, blank=True, db_index=True)
+    last_name_soundex = models.CharField(max_length=4, blank=True, db_index=True)
+
+    PHONETIC_FIELDS = ['first_name_soundex', 'last_name_soundex']
+
+    def update_phonetic_keys(self):
+        self.first_name_soundex = soundex(first_word(self.first_names))
+        self.last_name_soundex = soundex(self.last_name)
+
+    # Computed fields; the years of birth and death, for statistics. Kept up
+    # to date by save(); bulk writes must call update_years() themselves.
+    birth_year = models.IntegerField(null=True, blank=True, db_index=True)
+    death_year = models.IntegerField(null=True, blank=True)
+
+    YEAR_FIELDS = ['birth_year', 'death_year']
+
+    def update_years(self):
+        self.birth_year = fuzzy_date_year(self.birth_date)
+        self.death_year = fuzzy_date_year(self.death_date)
+
+    # Where this individual was imported from; the GEDCOM file (a name given
+    # on import), its pointer in that file (e.g. "@I219@"), and a hash of
+    # what was imported, so that re-imports can update it in place. See
+    # api.gedcom_sync.
+    gedcom_source = models.CharField(max_length=100, blank=True)
+    gedcom_xref = models.CharField(max_length=30, blank=True)
+    gedcom_hash = models.CharField(max_length=40, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['gedcom_source', 'gedcom_xref']),
+            # For searching by the start of a name; see api.admin.
+            models.Index(Lower('last_name'), name='individual_last_name_lower'),
+            models.Index(Lower('first_names'), name='individual_first_names_lower'),
+        ]
+
+    @classmethod
+    def phonetic_matches(cls, pattern):
+        """
+        Individuals with a first or last name which sounds like each word of
+        the pattern.
+        """
+        codes = [soundex(word) for word in pattern.split()]
+        codes = [code for code in codes if code]
+        if not codes:
+            return cls.objects.none()
+        queryset = cls.objects.all()
+        for code in codes:
+            queryset = queryset.filter(
+                models.Q(first_name_soundex=code) | models.Q(last_name_soundex=code))
+        return queryset
+
     def reversed_str(self):
         s = self.last_name
         if len(s) > 0:
@@ -135,7 +208,38 @@ class Individual(models.Model):
                     if p != self
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the parents as loaded, so api.signals can tell whether they
+        # changed on save.
+        if 'child_in_family_id' in field_names:
+            instance._saved_child_in_family_id = instance.child_in_family_id
+        # Likewise the locations, for the place events, and what's counted in
+        # the statistics.
+        if set(PlaceEvent.INDIVIDUAL_FIELDS.values()) <= set(field_names):
+            instance._saved_locations = instance.locations()
+        if set(Statistic.INDIVIDUAL_FIELDS) <= set(field_names):
+            instance._saved_statistics = instance.statistics()
+        return instance
+
+    def statistics(self):
+        return [getattr(self, field) for field in Statistic.INDIVIDUAL_FIELDS]
+
+    def locations(self):
+        return [getattr(self, field) for field in PlaceEvent.INDIVIDUAL_FIELDS.values()]
+
     def save(self, *args, **kwargs):
+        self.update_phonetic_keys()
+        self.update_years()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if {'first_names', 'last_name'} & update_fields:
+                update_fields |= set(self.PHONETIC_FIELDS)
+            if {'birth_date', 'death_date'} & update_fields:
+                update_fields |= set(self.YEAR_FIELDS)
+            kwargs['update_fields'] = update_fields
         # Update names of family's, in case this person's name
         # changed, which changes the family name.
         super(Individual, self).save(*args, **kwargs)
@@ -158,18 +262,55 @@ class Family(models.Model):
 
     owner = models.ForeignKey('auth.User', related_name='families', null=True, on_delete=models.SET_NULL)
 
+    # Where this family was imported from; see Individual.
+    gedcom_source = models.CharField(max_length=100, blank=True)
+    gedcom_xref = models.CharField(max_length=30, blank=True)
+    gedcom_hash = models.CharField(max_length=40, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['gedcom_source', 'gedcom_xref']),
+        ]
+
+    def __str__(self):
+        # The stored name, so listing families doesn't query their partners.
+        return self.name or 'Family {}'.format(self.pk)
+
     def update_family_name(self):
-        # Sort list first by last name, second by sex with males first.
-        partners_list = list(self.partners.all());
-        partners_list.sort(key=lambda i: i.last_name)
-        partners_list.sort(key=lambda i: i.sex, reverse=True)
-        partners_list = map(str, partners_list)
-        self.name = " & ".join(partners_list)
+        self.name = family_name(self.partners.all())
         # Note: Don't pass args/kwargs here, else we'll try to re-create a new
         # instance, which will fail!
         super().save()
         FamilyNameList.ensure_indexed(self)
 
+    @classmethod
+    def update_family_names(cls, family_ids):
+        """
+        Recomputes the names and search index of many families at once. Use
+        this after bulk writes, rather than calling update_family_name() on
+        every family.
+        """
+        families = []
+        for ids in chunked(set(family_ids)):
+            families += cls.objects.filter(pk__in=ids).prefetch_related('partners')
+        for family in families:
+            family.name = family_name(family.partners.all())
+        cls.objects.bulk_update(families, ['name'], batch_size=500)
+        FamilyNameList.ensure_indexed_many(families)
+        return families
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the locations as loaded, so api.signals can tell whether
+        # they changed on save.
+        if set(PlaceEvent.FAMILY_FIELDS.values()) <= set(field_names):
+            instance._saved_locations = instance.locations()
+        return instance
+
+    def locations(self):
+        return [getattr(self, field) for field in PlaceEvent.FAMILY_FIELDS.values()]
+
     def save(self, *args, **kwargs):
         if not self.id:
             # We need to have a valid ID before calling the `partners()` function
@@ -177,17 +318,444 @@ class Family(models.Model):
             super(Family, self).save(*args, **kwargs)
         self.update_family_name()
 
+def closure_ancestries(parents, ancestries):
+    """
+    Computes the ancestry ({ancestor id: depth}, including themselves at
+    depth 0) of each individual in parents, which maps their ids to their
+    parents' ids, into ancestries, which holds those of any other parents.
+    """
+    # Visit parents before their children. Anyone left over is part of a
+    # cycle, and just gets whatever ancestry has been computed so far.
+    pending = {i: sum(1 for p in ps if p in parents) for i, ps in parents.items()}
+    children = defaultdict(list)
+    for i, ps in parents.items():
+        for p in ps:
+            if p in parents:
+                children[p].append(i)
+    order = [i for i, count in pending.items() if count == 0]
+    for i in order:
+        for child in children[i]:
+            pending[child] -= 1
+            if pending[child] == 0:
+                order.append(child)
+    visited = set(order)
+    order += [i for i in parents if i not in visited]
+
+    for i in order:
+        ancestry = {i: 0}
+        for p in parents[i]:
+            for ancestor_id, depth in ancestries.get(p, {}).items():
+                if ancestor_id != i and depth + 1 < ancestry.get(ancestor_id, depth + 2):
+                    ancestry[ancestor_id] = depth + 1
+        ancestries[i] = ancestry
+    return ancestries
+
+class AncestryClosure(models.Model):
+    """
+    Closure table of the ancestry graph; a row for every (ancestor,
+    descendant) pair, with every individual their own ancestor at depth 0.
+    Where there are several lines of descent, depth is the shortest. Kept up
+    to date by api.signals; rebuild with `./manage.py rebuild-ancestry`.
+    """
+    ancestor = models.ForeignKey(
+        Individual, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(
+        Individual, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = [('ancestor', 'descendant')]
+        indexes = [
+            models.Index(fields=['ancestor', 'depth']),
+            models.Index(fields=['descendant', 'depth']),
+        ]
+
+    @classmethod
+    def is_ancestor(cls, ancestor_id, descendant_id):
+        return cls.objects.filter(
+            ancestor_id=ancestor_id, descendant_id=descendant_id, depth__gt=0).exists()
+
+    @classmethod
+    def descendant_ids(cls, individual_id, max_depth=None):
+        queryset = cls.objects.filter(ancestor_id=individual_id, depth__gt=0)
+        if max_depth is not None:
+            queryset = queryset.filter(depth__lte=max_depth)
+        return queryset.values_list('descendant_id', flat=True)
+
+    @classmethod
+    def ancestor_ids(cls, individual_id, max_depth=None):
+        queryset = cls.objects.filter(descendant_id=individual_id, depth__gt=0)
+        if max_depth is not None:
+            queryset = queryset.filter(depth__lte=max_depth)
+        return queryset.values_list('ancestor_id', flat=True)
+
+    @classmethod
+    def rebuild(cls, individual_ids=None):
+        """
+        Recomputes the rows of the given individuals and all their
+        descendants, or of everyone if individual_ids is None. Call this with
+        the individuals whose parents changed.
+        """
+        Through = Family.partners.through
+        if individual_ids is None:
+            child_in_family = dict(Individual.objects.values_list('id', 'child_in_family_id'))
+        else:
+            # Everyone whose ancestry may have changed; the individuals and
+            # their descendants.
+            child_in_family = {}
+            frontier = set(individual_ids)
+            while frontier:
+                for ids in chunked(frontier):
+                    child_in_family.update(Individual.objects.filter(
+                        pk__in=ids).values_list('id', 'child_in_family_id'))
+                families = set()
+                for ids in chunked(frontier):
+                    families.update(Through.objects.filter(
+                        individual_id__in=ids).values_list('family_id', flat=True))
+                children = set()
+                for ids in chunked(families):
+                    children.update(Individual.objects.filter(
+                        child_in_family_id__in=ids).values_list('id', flat=True))
+                frontier = children - child_in_family.keys()
+        affected = child_in_family.keys()
+
+        partners = defaultdict(list)
+        for ids in chunked({f for f in child_in_family.values() if f is not None}):
+            for family_id, individual_id in Through.objects.filter(
+                    family_id__in=ids).values_list('family_id', 'individual_id'):
+                partners[family_id].append(individual_id)
+        parents = {i: partners.get(f, []) for i, f in child_in_family.items()}
+
+        # Ancestries of parents outside the affected set are unchanged.
+        ancestries = defaultdict(dict)
+        external = {p for ps in parents.values() for p in ps if p not in affected}
+        for ids in chunked(external):
+            for ancestor_id, descendant_id, depth in cls.objects.filter(
+                    descendant_id__in=ids).values_list('ancestor_id', 'descendant_id', 'depth'):
+                ancestries[descendant_id][ancestor_id] = depth
+
+        closure_ancestries(parents, ancestries)
+
+        if individual_ids is None:
+            cls.objects.all().delete()
+        else:
+            for ids in chunked(affected):
+                cls.objects.filter(descendant_id__in=ids).delete()
+        cls.objects.bulk_create([
+            cls(ancestor_id=ancestor_id, descendant_id=i, depth=depth)
+            for i in affected
+                for ancestor_id, depth in ancestries[i].items()
+        ], batch_size=500)
+
+class Change(models.Model):
+    """
+    Log of changes to individuals and families, so clients can fetch just
+    what changed since they last synced; see the changes/ endpoint. The id is
+    the sequence number. Written by api.signals; bulk writes must call
+    record() themselves.
+    """
+    INDIVIDUAL = 'individual'
+    FAMILY = 'family'
+    ENTITY_CHOICES = [(INDIVIDUAL, 'Individual'), (FAMILY, 'Family')]
+
+    SAVE = 'save'
+    DELETE = 'delete'
+    OP_CHOICES = [(SAVE, 'Save'), (DELETE, 'Delete')]
+
+    entity = models.CharField(max_length=10, choices=ENTITY_CHOICES)
+    entity_id = models.IntegerField()
+    op = models.CharField(max_length=6, choices=OP_CHOICES)
+
+    @classmethod
+    def record(cls, entity, ids, op=SAVE):
+        cls.objects.bulk_create([
+            cls(entity=entity, entity_id=i, op=op) for i in sorted(set(ids) - {None})
+        ], batch_size=500)
+
+def normalize_location(location):
+    """ A location with its comma separated parts' whitespace tidied. """
+    parts = (' '.join(part.split()) for part in (location or '').split(','))
+    return ', '.join(part for part in parts if part)
+
+def place_fields(name):
+    """ The fields of the Place of a normalized location. """
+    parts = name.split(', ')
+    return {
+        'name': name,
+        'key': name.lower(),
+        'town': parts[0],
+        'region': parts[-2] if len(parts) > 2 else '',
+        'country': parts[-1] if len(parts) > 1 else '',
+    }
+
+class Place(models.Model):
+    """
+    A distinct location, as written in individuals' and families' location
+    fields, so events can be found by place with an index rather than by
+    scanning every location column. The parts of the name are read as
+    "town, region, country"; with two parts, "town, country", and with one,
+    just the town.
+    """
+    name = models.CharField(max_length=100)
+    # The normalized name in lower case; places differing only by case or
+    # spacing are the same place.
+    key = models.CharField(max_length=100, unique=True)
+    town = models.CharField(max_length=100, blank=True)
+    region = models.CharField(max_length=100, blank=True)
+    country = models.CharField(max_length=100, blank=True, db_index=True)
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def from_name(cls, name):
+        return cls(**place_fields(name))
+
+    @classmethod
+    def ids_for(cls, locations):
+        """
+        Maps each normalized location to the id of its place, creating places
+        which don't exist yet.
+        """
+        names = {}
+        for location in locations:
+            name = normalize_location(location)
+            if name:
+                names.setdefault(name.lower(), name)
+        ids = {}
+        for keys in chunked(names):
+            ids.update(cls.objects.filter(key__in=keys).values_list('key', 'id'))
+        missing = [cls.from_name(names[key]) for key in names if key not in ids]
+        if missing:
+            cls.objects.bulk_create(missing, ignore_conflicts=True, batch_size=500)
+            for keys in chunked(place.key for place in missing):
+                ids.update(cls.objects.filter(key__in=keys).values_list('key', 'id'))
+        return {name: ids[key] for key, name in names.items()}
+
+    @classmethod
+    def search(cls, pattern):
+        """ Places with a part of their name starting with pattern. """
+        key = normalize_location(pattern).lower()
+        if not key:
+            return cls.objects.none()
+        return cls.objects.filter(
+            models.Q(key__startswith=key) | models.Q(key__contains=', ' + key))
+
+    def within(self):
+        """ This place and the places within it, e.g. towns in a region. """
+        return Place.objects.filter(
+            models.Q(pk=self.pk) | models.Q(key__endswith=', ' + self.key))
+
+class PlaceEvent(models.Model):
+    """
+    An event at a place; a row for each non-blank location of an individual
+    or family. Kept up to date by api.signals; bulk writes must call
+    update_individuals() or update_families() themselves. Rebuild with
+    `./manage.py rebuild-places`.
+    """
+    BIRTH = 'birth'
+    DEATH = 'death'
+    BURIED = 'buried'
+    BAPTISM = 'baptism'
+    MARRIED = 'married'
+    EVENT_CHOICES = [(BIRTH, 'Birth'), (DEATH, 'Death'), (BURIED, 'Buried'),
+        (BAPTISM, 'Baptism'), (MARRIED, 'Married')]
+
+    # The location field of each kind of event.
+    INDIVIDUAL_FIELDS = {
+        BIRTH: 'birth_location',
+        DEATH: 'death_location',
+        BURIED: 'buried_location',
+        BAPTISM: 'baptism_location',
+    }
+    FAMILY_FIELDS = {
+        MARRIED: 'married_location',
+    }
+
+    place = models.ForeignKey(Place, on_delete=models.CASCADE, related_name='events')
+    event = models.CharField(max_length=7, choices=EVENT_CHOICES)
+    individual = models.ForeignKey(
+        Individual, on_delete=models.CASCADE, null=True, related_name='place_events')
+    family = models.ForeignKey(
+        Family, on_delete=models.CASCADE, null=True, related_name='place_events')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['place', 'event']),
+        ]
+
+    @classmethod
+    def update(cls, model, fields, ids):
+        link = 'individual_id' if model is Individual else 'family_id'
+        rows = []
+        for chunk in chunked(set(ids) - {None}):
+            rows += model.objects.filter(pk__in=chunk).values_list('id', *fields.values())
+            cls.objects.filter(**{link + '__in': chunk}).delete()
+        place_ids = Place.ids_for(location for row in rows for location in row[1:])
+        cls.objects.bulk_create([
+            cls(place_id=place_ids[name], event=event, **{link: row[0]})
+            for row in rows
+                for event, location in zip(fields, row[1:])
+                    for name in [normalize_location(location)] if name
+        ], batch_size=500)
+
+    @classmethod
+    def update_individuals(cls, ids):
+        """ Recomputes the events of the given individuals. """
+        cls.update(Individual, cls.INDIVIDUAL_FIELDS, ids)
+
+    @classmethod
+    def update_families(cls, ids):
+        """ Recomputes the events of the given families. """
+        cls.update(Family, cls.FAMILY_FIELDS, ids)
+
+    @classmethod
+    def rebuild(cls):
+        """ Recomputes every event, and deletes places with none. """
+        cls.objects.all().delete()
+        cls.update_individuals(Individual.objects.values_list('id', flat=True))
+        cls.update_families(Family.objects.values_list('id', flat=True))
+        Place.objects.filter(events__isnull=True).delete()
+
+class Statistic(models.Model):
+    """
+    Materialized counts for the statistics endpoints, so they don't scan the
+    individual table; a row per (kind, key), e.g. ('surname', 'Smith') or
+    ('total', 'individuals'). Kept up to date incrementally by api.signals;
+    bulk writes must call individuals_changed() etc themselves. Rebuild with
+    `./manage.py rebuild-statistics`.
+    """
+    TOTAL = 'total'
+    SURNAME = 'surname'
+    BIRTH_DECADE = 'decade'
+
+    INDIVIDUALS = 'individuals'
+    FAMILIES = 'families'
+    # Sum and number of lifespans of individuals with known years of birth
+    # and death.
+    LIFESPAN_YEARS = 'lifespan_years'
+    LIFESPANS = 'lifespans'
+
+    # Individual fields which the statistics are computed from.
+    INDIVIDUAL_FIELDS = ['last_name', 'birth_year', 'death_year']
+
+    kind = models.CharField(max_length=10)
+    key = models.CharField(max_length=50)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = [('kind', 'key')]
+        indexes = [
+            models.Index(fields=['kind', 'value']),
+        ]
+
+    @classmethod
+    def counts(cls, statistics):
+        """ What an individual with the given statistics() counts towards. """
+        counts = Counter()
+        if statistics is None:
+            return counts
+        last_name, birth_year, death_year = statistics
+        counts[(cls.TOTAL, cls.INDIVIDUALS)] += 1
+        if last_name:
+            counts[(cls.SURNAME, last_name)] += 1
+        if birth_year is not None:
+            counts[(cls.BIRTH_DECADE, str(birth_year // 10 * 10))] += 1
+            if death_year is not None and death_year >= birth_year:
+                counts[(cls.TOTAL, cls.LIFESPAN_YEARS)] += death_year - birth_year
+                counts[(cls.TOTAL, cls.LIFESPANS)] += 1
+        return counts
+
+    @classmethod
+    def add(cls, deltas):
+        """ Adds each delta to the value of its (kind, key). """
+        deltas = {k: v for k, v in deltas.items() if v}
+        if not deltas:
+            return
+        cls.objects.bulk_create([cls(kind=kind, key=key) for kind, key in deltas],
+            ignore_conflicts=True, batch_size=500)
+        for (kind, key), delta in sorted(deltas.items()):
+            cls.objects.filter(kind=kind, key=key).update(value=models.F('value') + delta)
+
+    @classmethod
+    def individuals_changed(cls, individuals):
+        """
+        Updates the counts for saved individuals; those loaded from the
+        database are counted again as they are now, others as new.
+        """
+        deltas = Counter()
+        for individual in individuals:
+            deltas.update(cls.counts(individual.statistics()))
+            deltas.subtract(cls.counts(getattr(individual, '_saved_statistics', None)))
+            individual._saved_statistics = individual.statistics()
+        cls.add(deltas)
+
+    @classmethod
+    def individuals_deleted(cls, individuals):
+        deltas = Counter()
+        for individual in individuals:
+            deltas.subtract(cls.counts(
+                getattr(individual, '_saved_statistics', individual.statistics())))
+        cls.add(deltas)
+
+    @classmethod
+    def families_added(cls, count):
+        cls.add({(cls.TOTAL, cls.FAMILIES): count})
+
+    @classmethod
+    def rebuild(cls):
+        """ Recomputes every count from scratch, aggregating in the database. """
+        rows = [
+            cls(kind=kind, key=key, value=value)
+            for kind, key, value in statistic_rows(Individual.objects, Family.objects)
+        ]
+        cls.objects.all().delete()
+        cls.objects.bulk_create(rows, batch_size=500)
+
+def statistic_rows(individuals, families):
+    """
+    The (kind, key, value) of every statistic, counting the given querysets
+    of individuals and families.
+    """
+    rows = [
+        (Statistic.TOTAL, Statistic.INDIVIDUALS, individuals.count()),
+        (Statistic.TOTAL, Statistic.FAMILIES, families.count()),
+    ]
+    lifespans = individuals.filter(
+        birth_year__isnull=False, death_year__gte=models.F('birth_year')).aggregate(
+            years=models.Sum(models.F('death_year') - models.F('birth_year')),
+            count=models.Count('id'))
+    rows.append((Statistic.TOTAL, Statistic.LIFESPAN_YEARS, lifespans['years'] or 0))
+    rows.append((Statistic.TOTAL, Statistic.LIFESPANS, lifespans['count']))
+    rows += [
+        (Statistic.SURNAME, last_name, count)
+        for last_name, count in individuals.exclude(last_name='').values(
+            'last_name').annotate(count=models.Count('id')).values_list('last_name', 'count')
+    ]
+    rows += [
+        (Statistic.BIRTH_DECADE, str(decade), count)
+        for decade, count in individuals.filter(birth_year__isnull=False).annotate(
+            decade=models.F('birth_year') / 10 * 10).values('decade').annotate(
+                count=models.Count('id')).values_list('decade', 'count')
+    ]
+    return rows
+
 def random_token(N):
     return ''.join(random.choices(string.ascii_letters + string.digits, k=N))
 
 class PasswordResetRequest(models.Model):
     user = models.ForeignKey('auth.User', related_name='password_reset_token', null=True, on_delete=models.CASCADE)
     token = models.CharField(max_length=50, db_index=True)
-    expires = models.DateTimeField()
+    expires = models.DateTimeField(db_index=True)
+
+    # How many expired requests create() deletes on the way, to keep the table
+    # small without a separate sweep.
+    CLEANUP_BATCH_SIZE = 100
 
     @classmethod
     def create(cls, user):
         utc_now = pytz.utc.localize(datetime.utcnow())
+        cls.purge_expired(batch_size=cls.CLEANUP_BATCH_SIZE, max_batches=1)
         return PasswordResetRequest.objects.create(
             user=user,
             token=random_token(50),
@@ -197,15 +765,47 @@ class PasswordResetRequest(models.Model):
     @classmethod
     def find(cls, token):
         utc_now = pytz.utc.localize(datetime.utcnow())
-        reset_requests = list(PasswordResetRequest.objects.filter(token=token))
-        result = None
-        for reset_request in reset_requests:
-            if reset_request.expires < utc_now:
-                reset_request.delete()
-            else:
-                result = reset_request
+        return PasswordResetRequest.objects.filter(
+            token=token, expires__gt=utc_now).order_by('-expires').first()
 
-        return result
+    @classmethod
+    def purge_expired(cls, batch_size=1000, max_batches=None):
+        """
+        Deletes expired requests, batch_size at a time so as not to hold a
+        long write lock. Returns the number deleted.
+        """
+        utc_now = pytz.utc.localize(datetime.utcnow())
+        deleted = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            ids = list(PasswordResetRequest.objects.filter(
+                expires__lte=utc_now).values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            count, _ = PasswordResetRequest.objects.filter(id__in=ids).delete()
+            deleted += count
+            batches += 1
+        return deleted
+
+class OutgoingEmail(models.Model):
+    """
+    An email waiting to be sent. Requests queue emails here, in their
+    transaction, and api.mail sends them in the background. See api.mail.
+    """
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    # Newline separated.
+    recipients = models.TextField()
+    created = models.DateTimeField(auto_now_add=True)
+    # When to next try sending it; null once it's sent or we've given up.
+    next_attempt = models.DateTimeField(null=True, db_index=True)
+    attempts = models.IntegerField(default=0)
+    sent = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    def recipient_list(self):
+        return self.recipients.split('\n')
 
 def search_terms(name):
     delchars = str.maketrans({ ch : ch if str.isalpha(ch) else None for ch in map(chr, range(256))})
@@ -216,19 +816,45 @@ class FamilyNameList(models.Model):
     name = models.CharField(max_length=100, db_index=True, unique=True)
     matching_families = models.ManyToManyField(Family, related_name='word_matches')
 
-    @classmethod
-    def ensure_indexed(cls, family):
+    @staticmethod
+    def index_words(partners):
         words = set()
-        for partner in family.partners.all():
+        for partner in partners:
             for name in search_terms(partner.first_names):
                 words.add(name.lower())
             for name in search_terms(partner.last_name):
                 words.add(name.lower())
-        for word in words:
+        return words
+
+    @classmethod
+    def ensure_indexed(cls, family):
+        for word in cls.index_words(family.partners.all()):
             name_list, _created = FamilyNameList.objects.get_or_create(name=word)
             name_list.matching_families.add(family)
             name_list.save()
 
+    @classmethod
+    def ensure_indexed_many(cls, families):
+        """
+        Bulk equivalent of ensure_indexed(); families should have their
+        partners prefetched.
+        """
+        words_by_family = {
+            family.id: cls.index_words(family.partners.all()) for family in families
+        }
+        all_words = set().union(*words_by_family.values())
+        cls.objects.bulk_create(
+            [cls(name=word) for word in all_words], ignore_conflicts=True, batch_size=500)
+        word_ids = {}
+        for words in chunked(all_words):
+            word_ids.update(cls.objects.filter(name__in=words).values_list('name', 'id'))
+        Through = cls.matching_families.through
+        Through.objects.bulk_create([
+            Through(familynamelist_id=word_ids[word], family_id=family_id)
+            for family_id, words in words_by_family.items()
+            for word in words
+        ], ignore_conflicts=True, batch_size=500)
+
     @classmethod
     def search(cls, query):
         words = [word for word in search_terms(query)]
@@ -0,0 +1,144 @@
+import unicodedata
+
+# Phonetic keys and edit distance for fuzzy name search, so that e.g. "Smyth"
+# finds "Smith" and "Macdonald" finds "McDonald". See Individual's soundex
+# columns and the phonetic mode of the search-individuals endpoint.
+
+SOUNDEX_CODES = {}
+for letters, code in [('BFPV', '1'), ('CGJKQSXZ', '2'), ('DT', '3'),
+        ('L', '4'), ('MN', '5'), ('R', '6')]:
+    for letter in letters:
+        SOUNDEX_CODES[letter] = code
+
+def letters_only(name):
+    """ name, upper case, with accents removed and anything else dropped. """
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    return ''.join(ch for ch in decomposed.upper() if 'A' <= ch <= 'Z')
+
+def soundex(name):
+    """
+    The American Soundex code of a name, e.g. 'R163' for "Robert"; '' if it
+    has no letters. Spaces and punctuation are ignored, so "Mac Donald" and
+    "MacDonald" have the same code.
+    """
+    letters = letters_only(name)
+    if not letters:
+        return ''
+    code = letters[0]
+    previous = SOUNDEX_CODES.get(letters[0], '')
+    for letter in letters[1:]:
+        digit = SOUNDEX_CODES.get(letter, '')
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # H and W don't separate letters with the same code; vowels do.
+        if letter not in 'HW':
+            previous = digit
+    return code.ljust(4, '0')
+
+def first_word(name):
+    words = (name or '').split()
+    return words[0] if words else ''
+
+def levenshtein(a, b):
+    """ The edit distance between strings a and b. """
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        previous = current
+    return previous[-1]
+
+def name_distance(pattern, first_names, last_name):
+    """
+    How far the name is from the searched-for pattern; for each word in the
+    pattern, the edit distance to the closest word of the name, summed.
+    """
+    name_words = (first_names + ' ' + last_name).lower().split()
+    if not name_words:
+        name_words = ['']
+    return sum(
+        min(levenshtein(word, name_word) for name_word in name_words)
+        for word in pattern.lower().split()
+    )
+
+# Scoring how likely two individuals are to be the same person, for the
+# duplicate finder in api.duplicates. Rows are dicts of the fields below;
+# this module doesn't touch the database, so it can be run in worker
+# processes.
+
+# Relative weight of each field in a match score.
+MATCH_WEIGHTS = {
+    'first_names': 3,
+    'last_name': 2,
+    'birth_date': 2,
+    'birth_location': 1,
+    'death_date': 1,
+    'death_location': 1,
+}
+
+# Score over at least this much weight, as if fields were unknown rather
+# than blank, so that pairs which only share e.g. a first name don't count as
+# a full match; the weight of the names and birth date.
+MIN_KNOWN_WEIGHT = 7
+
+def text_similarity(a, b):
+    """ 1 for the same text, down to 0; None if either is unknown. """
+    a = ' '.join(a.lower().split()) if a else ''
+    b = ' '.join(b.lower().split()) if b else ''
+    if not a or not b:
+        return None
+    return 1 - levenshtein(a, b) / max(len(a), len(b))
+
+def date_similarity(a, b, year_a, year_b):
+    """ 1 for the same date, less for nearby years; None if either is unknown. """
+    if not a or not b:
+        return None
+    if ' '.join(a.upper().split()) == ' '.join(b.upper().split()):
+        return 1.0
+    if year_a is None or year_b is None:
+        return 0.0
+    return {0: 0.8, 1: 0.5}.get(abs(year_a - year_b), 0.0)
+
+def match_score(a, b):
+    """
+    How alike two individuals are, from 0 to 1, over the fields known for
+    both of them; fewer than MIN_KNOWN_WEIGHT of them counts for less.
+    """
+    similarities = {
+        'first_names': text_similarity(a['first_names'], b['first_names']),
+        'last_name': text_similarity(a['last_name'], b['last_name']),
+        'birth_date': date_similarity(
+            a['birth_date'], b['birth_date'], a['birth_year'], b['birth_year']),
+        'birth_location': text_similarity(a['birth_location'], b['birth_location']),
+        'death_date': date_similarity(
+            a['death_date'], b['death_date'], a['death_year'], b['death_year']),
+        'death_location': text_similarity(a['death_location'], b['death_location']),
+    }
+    total = weights = 0
+    for field, similarity in similarities.items():
+        if similarity is not None:
+            total += MATCH_WEIGHTS[field] * similarity
+            weights += MATCH_WEIGHTS[field]
+    return total / max(weights, MIN_KNOWN_WEIGHT)
+
+def score_block(block, min_score):
+    """
+    Compares every pair in a block of rows; returns (score, id, id) for those
+    scoring at least min_score.
+    """
+    matches = []
+    for i, a in enumerate(block):
+        for b in block[i + 1:]:
+            score = match_score(a, b)
+            if score >= min_score:
+                matches.append((score, min(a['id'], b['id']), max(a['id'], b['id'])))
+    return matches
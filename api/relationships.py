@@ -0,0 +1,189 @@
+from api.graph import new_graph
+
+# Working out how two individuals are related, by searching up both of their
+# ancestries at once, a generation at a time, until they meet at their nearest
+# common ancestors.
+
+# Give up if either side of the search needs to expand more than this many
+# individuals in one generation, or climbs more than this many generations.
+MAX_FRONTIER = 2000
+MAX_GENERATIONS = 50
+
+ORDINALS = [
+    'first', 'second', 'third', 'fourth', 'fifth',
+    'sixth', 'seventh', 'eighth', 'ninth', 'tenth',
+]
+
+TIMES = ['once', 'twice']
+
+def ordinal(n):
+    if n <= len(ORDINALS):
+        return ORDINALS[n - 1]
+    return '{}th'.format(n)
+
+def gendered(sex, male, female, neutral):
+    if sex == 'M':
+        return male
+    if sex == 'F':
+        return female
+    return neutral
+
+def greats(n, term):
+    """ term, prefixed with n "great-"s; e.g. great-great-grandfather. """
+    if n <= 2:
+        return 'great-' * n + term
+    return '{}x great-{}'.format(n, term)
+
+def relationship_name(up, down, sex, half=False):
+    """
+    The name of the relationship of A to B, where A's nearest common ancestor
+    with B is `up` generations above A and `down` generations above B, and
+    `sex` is A's sex.
+    """
+    prefix = 'half-' if half else ''
+    if up == 0 and down == 0:
+        return 'self'
+    if up == 0:
+        term = gendered(sex, 'father', 'mother', 'parent')
+        if down == 1:
+            return term
+        return greats(down - 2, 'grand' + term)
+    if down == 0:
+        term = gendered(sex, 'son', 'daughter', 'child')
+        if up == 1:
+            return term
+        return greats(up - 2, 'grand' + term)
+    if up == 1 and down == 1:
+        return prefix + gendered(sex, 'brother', 'sister', 'sibling')
+    if up == 1:
+        return prefix + greats(down - 2, gendered(sex, 'uncle', 'aunt', 'uncle or aunt'))
+    if down == 1:
+        return prefix + greats(up - 2, gendered(sex, 'nephew', 'niece', 'nephew or niece'))
+    name = '{}{} cousin'.format(prefix, ordinal(min(up, down) - 1))
+    removed = abs(up - down)
+    if removed:
+        times = TIMES[removed - 1] if removed <= len(TIMES) else '{} times'.format(removed)
+        name += ' {} removed'.format(times)
+    return name
+
+class RelationshipSearch:
+    """
+    Bidirectional search for the nearest common ancestors of two individuals.
+    Each step expands the smaller of the two frontiers by one generation,
+    loading the parents of the whole frontier in bulk.
+    """
+    def __init__(self, a, b, graph=None):
+        self.graph = graph or new_graph()
+        self.ends = (a, b)
+        # For each side, maps each ancestor reached to (child it was reached
+        # from, generations above the starting individual).
+        self.seen = ({a: (None, 0)}, {b: (None, 0)})
+        self.frontiers = ([a], [b])
+        self.depths = [0, 0]
+        self.truncated = False
+
+    def parents_of(self, ids):
+        graph = self.graph
+        rows = [graph.individuals[i] for i in ids]
+        graph.load_families(row['child_in_family'] for row in rows)
+        parents = {row['id']: graph.parents(row) for row in rows}
+        graph.load_individuals(p for ps in parents.values() for p in ps)
+        return parents
+
+    def expand(self, side):
+        seen = self.seen[side]
+        depth = self.depths[side] + 1
+        frontier = []
+        for child, parents in self.parents_of(self.frontiers[side]).items():
+            for parent in parents:
+                if parent not in seen:
+                    seen[parent] = (child, depth)
+                    frontier.append(parent)
+        self.frontiers[side][:] = frontier
+        self.depths[side] = depth
+
+    def best_meetings(self):
+        """ The common ancestors with the smallest combined distance. """
+        meetings = self.seen[0].keys() & self.seen[1].keys()
+        if not meetings:
+            return None, []
+        def key(m):
+            up, down = self.seen[0][m][1], self.seen[1][m][1]
+            return (up + down, max(up, down))
+        best = min(key(m) for m in meetings)
+        return best[0], sorted(m for m in meetings if key(m) == best)
+
+    def run(self):
+        """ Returns the nearest common ancestors, or [] if there are none. """
+        self.graph.load_individuals(self.ends)
+        while True:
+            total, meetings = self.best_meetings()
+            # Any common ancestor not yet found must be further up one of the
+            # sides which can still grow.
+            bound = min([self.depths[side] + 1 for side in (0, 1) if self.frontiers[side]],
+                default=None)
+            if meetings and (bound is None or total <= bound):
+                return meetings
+            if bound is None:
+                return []
+            sides = [side for side in (0, 1) if self.frontiers[side]]
+            side = min(sides, key=lambda s: len(self.frontiers[s]))
+            if len(self.frontiers[side]) > MAX_FRONTIER or self.depths[side] >= MAX_GENERATIONS:
+                self.truncated = True
+                return meetings
+            self.expand(side)
+
+    def path_to(self, side, ancestor):
+        """ The ids from the side's starting individual up to ancestor. """
+        path = []
+        node = ancestor
+        while node is not None:
+            path.append(node)
+            node = self.seen[side][node][0]
+        return list(reversed(path))
+
+def find_relationship(a, b):
+    """
+    Returns a description of how individual `a` is related to individual `b`,
+    or None if either doesn't exist.
+    """
+    search = RelationshipSearch(a, b)
+    graph = search.graph
+    graph.load_individuals([a, b])
+    if a not in graph.individuals or b not in graph.individuals:
+        return None
+
+    meetings = search.run()
+    result = {
+        'relationship': None,
+        'generations': None,
+        'common_ancestors': meetings,
+        'path': [],
+        'truncated': search.truncated,
+    }
+    if meetings:
+        ancestor = meetings[0]
+        up_path = search.path_to(0, ancestor)
+        down_path = search.path_to(1, ancestor)
+        up, down = len(up_path) - 1, len(down_path) - 1
+        # Related through only one common ancestor, via two of their families.
+        half = (len(meetings) == 1 and up > 0 and down > 0 and
+            graph.individuals[up_path[-2]]['child_in_family'] !=
+            graph.individuals[down_path[-2]]['child_in_family'])
+        result['relationship'] = relationship_name(
+            up, down, graph.individuals[a]['sex'], half)
+        result['generations'] = [up, down]
+        result['path'] = up_path + list(reversed(down_path[:-1]))
+    else:
+        # Not related by blood; check whether they're partners.
+        family_ids = graph.individuals[a]['partner_in_families']
+        graph.load_families(family_ids)
+        families = [graph.families[f] for f in family_ids]
+        if any(b in family['partners'] for family in families):
+            result['relationship'] = gendered(
+                graph.individuals[a]['sex'], 'husband', 'wife', 'spouse')
+            result['path'] = [a, b]
+
+    ids = set(result['path']) | set(meetings) | {a, b}
+    result['individuals'] = {i: graph.individuals[i] for i in ids}
+    return result
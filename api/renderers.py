@@ -0,0 +1,95 @@
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import JSONRenderer
+
+from django.utils.cache import patch_vary_headers
+
+import gzip
+
+# Optional faster encoders/compressors; we fall back to the stdlib when
+# they're not installed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this aren't worth compressing.
+MIN_COMPRESS_SIZE = 1024
+
+def encode_json(data):
+    """
+    Encodes data to compact JSON bytes, matching the output of DRF's
+    JSONRenderer, using orjson if it's available.
+    """
+    if orjson is None:
+        return JSONRenderer().render(data)
+    ret = orjson.dumps(
+        data,
+        default=JSONEncoder().default,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+    )
+    # Like DRF, escape \u2028 and \u2029 so the output is a strict javascript
+    # subset.
+    return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+def accepted_encodings(request):
+    """ The content codings the client accepts, from its Accept-Encoding header. """
+    encodings = set()
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = item.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            encodings.add(name.strip().lower())
+    return encodings
+
+def compress(content, request):
+    """
+    Compresses content with the best coding the client accepts. Returns a
+    tuple of (content, coding), where coding is None if not compressed.
+    """
+    encodings = accepted_encodings(request)
+    if brotli is not None and 'br' in encodings:
+        return brotli.compress(content, quality=4), 'br'
+    if 'gzip' in encodings:
+        return gzip.compress(content, compresslevel=6), 'gzip'
+    return content, None
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    A drop-in replacement for DRF's JSONRenderer which encodes with orjson
+    when available, and compresses large responses when the client accepts
+    it.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context) is not None:
+            content = super().render(data, accepted_media_type, renderer_context)
+        else:
+            content = encode_json(data)
+
+        # Only compress when we're rendering the response itself; other
+        # renderers (e.g. the browsable API) may embed our output.
+        response = renderer_context.get('response')
+        request = renderer_context.get('request')
+        if (response is None or request is None or
+                getattr(response, 'accepted_renderer', None) is not self or
+                len(content) < MIN_COMPRESS_SIZE or response.has_header('Content-Encoding')):
+            return content
+        patch_vary_headers(response, ['Accept-Encoding'])
+        content, coding = compress(content, request)
+        if coding:
+            response['Content-Encoding'] = coding
+        return content
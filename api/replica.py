@@ -0,0 +1,125 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from contextvars import ContextVar
+import os
+import sqlite3
+import time
+
+# Sending the API's reads to a read-only copy of the database (the `replica`
+# alias), so that long reads, like the tree endpoints', don't contend with
+# editors' writes on the primary SQLite file. The copy is made with SQLite's
+# online backup API by refresh_replica(), every so often; see the
+# refresh-replica command.
+#
+# ReplicaMiddleware remembers the request being handled, and ReplicaRouter
+# sends the reads of GET/HEAD/OPTIONS requests to the API to the replica.
+# Everything else uses the primary: writes, other requests, and the auth,
+# token and session tables, so that new logins work straight away. After a
+# user writes, their reads use the primary until the replica has been
+# refreshed since, so they see their own changes. Enabled with
+# settings.USE_READ_REPLICA.
+
+REPLICA = 'replica'
+
+# Apps whose tables are always read from the primary.
+PRIMARY_APPS = {'admin', 'auth', 'authtoken', 'contenttypes', 'sessions', 'django_cache'}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# How long to remember that a user wrote; longer than the replica goes
+# between refreshes.
+WRITE_TIMEOUT = 60 * 60
+
+current_request = ContextVar('current_request', default=None)
+
+def write_key(user_id):
+    return 'replica-last-write-{}'.format(user_id)
+
+def refreshed_at(path):
+    """ When the copy at path was taken, or None if there isn't one. """
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+def refresh_replica(primary, replica):
+    """
+    Copies the primary database file to the replica file, with SQLite's
+    online backup API so the primary can be written meanwhile. The copy is
+    made beside the replica and then moved over it, so that open replica
+    connections keep reading the old copy. The replica file's modification
+    time is set to when the copy began; it has every write committed before.
+    """
+    started = time.time()
+    temp_path = '{}.{}.tmp'.format(replica, os.getpid())
+    source = sqlite3.connect(primary)
+    try:
+        target = sqlite3.connect(temp_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+    finally:
+        source.close()
+    os.utime(temp_path, (started, started))
+    os.replace(temp_path, replica)
+    return started
+
+def reads_from_replica(request):
+    """ Whether the request's reads should go to the replica. """
+    decision = getattr(request, '_reads_from_replica', None)
+    if decision is not None:
+        return decision
+    if not (getattr(settings, 'USE_READ_REPLICA', False) and
+            request.method in SAFE_METHODS and request.path.startswith('/api/')):
+        request._reads_from_replica = False
+        return False
+    refreshed = refreshed_at(settings.DATABASES[REPLICA]['NAME'])
+    if refreshed is None:
+        return False
+    # DRF authenticates tokens in the view, so the user may not be known yet.
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return True
+    written = cache.get(write_key(user.id))
+    request._reads_from_replica = written is None or written < refreshed
+    return request._reads_from_replica
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return None
+        request = current_request.get()
+        if request is not None and reads_from_replica(request):
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Even for instances read from the replica.
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica is a copy of the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is copied from the primary, tables and all.
+        return db != REPLICA
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_request.set(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        if getattr(settings, 'USE_READ_REPLICA', False) and \
+                request.method not in SAFE_METHODS and response.status_code < 400:
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                cache.set(write_key(user.id), time.time(), WRITE_TIMEOUT)
+        return response
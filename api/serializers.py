@@ -1,6 +1,7 @@
 from rest_framework import serializers
-from api.models import Individual, Family, birth_date_or_min_year, married_date_or_min_year
+from api.models import Individual, Family, Place, birth_date_or_min_year, married_date_or_min_year, chunked
 from django.contrib.auth.models import User, Group
+from collections import defaultdict
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -70,6 +71,17 @@ class FamilySerializer(serializers.ModelSerializer):
         )
         return queryset
 
+class PlaceSerializer(serializers.ModelSerializer):
+    class Meta:
+        fields = (
+            'id',
+            'name',
+            'town',
+            'region',
+            'country',
+        )
+        model = Place
+
 class VerboseFamily:
     def __init__(self, individual, family):
         others = [p for p in family.partners.all() if p.id != individual.id]
@@ -179,3 +191,122 @@ class BasicIndividualWithParents:
         self.birth_date = individual.birth_date
         self.death_date = individual.death_date
         self.parents = [p.id for p in individual.parents()]
+
+# Fast-path, read-only equivalents of the serializers above, for endpoints
+# which return thousands of rows. These build dicts directly from `.values()`
+# rows, bypassing DRF's per-field machinery, and must produce exactly the same
+# JSON as the serializers they stand in for.
+
+INDIVIDUAL_VALUES = (
+    'id',
+    'first_names',
+    'last_name',
+    'sex',
+    'birth_date',
+    'birth_location',
+    'death_date',
+    'death_location',
+    'buried_date',
+    'buried_location',
+    'baptism_date',
+    'baptism_location',
+    'occupation',
+    'child_in_family',
+    'note',
+    'owner__username',
+)
+
+def partner_rows(ids):
+    """ (individual_id, family_id) for the partnerships of the individuals. """
+    return Family.partners.through.objects.filter(
+        individual_id__in=ids).order_by('family_id').values_list(
+        'individual_id', 'family_id')
+
+def fast_individuals(queryset):
+    """
+    Equivalent to IndividualSerializer(queryset, many=True).data, in the same
+    order as the queryset.
+    """
+    rows = list(queryset.values_list(*INDIVIDUAL_VALUES))
+    partner_in_families = defaultdict(list)
+    for ids in chunked([row[0] for row in rows]):
+        for individual_id, family_id in partner_rows(ids):
+            partner_in_families[individual_id].append(family_id)
+    return individual_values_data(rows, partner_in_families)
+
+async def afast_individuals(queryset):
+    """ Async version of fast_individuals(), using the async ORM. """
+    rows = [row async for row in queryset.values_list(*INDIVIDUAL_VALUES)]
+    partner_in_families = defaultdict(list)
+    for ids in chunked([row[0] for row in rows]):
+        async for individual_id, family_id in partner_rows(ids):
+            partner_in_families[individual_id].append(family_id)
+    return individual_values_data(rows, partner_in_families)
+
+def individual_values_data(rows, partner_in_families):
+    result = []
+    for (id, first_names, last_name, sex, birth_date, birth_location,
+            death_date, death_location, buried_date, buried_location,
+            baptism_date, baptism_location, occupation, child_in_family,
+            note, owner) in rows:
+        data = {
+            'id': id,
+            'first_names': first_names,
+            'last_name': last_name,
+            'sex': sex,
+            'birth_date': birth_date,
+            'birth_location': birth_location,
+            'death_date': death_date,
+            'death_location': death_location,
+            'buried_date': buried_date,
+            'buried_location': buried_location,
+            'baptism_date': baptism_date,
+            'baptism_location': baptism_location,
+            'occupation': occupation,
+            'partner_in_families': partner_in_families.get(id, []),
+            'child_in_family': child_in_family,
+            'note': note,
+        }
+        # IndividualSerializer omits the owner entirely when it's unset.
+        if owner is not None:
+            data['owner'] = owner
+        result.append(data)
+    return result
+
+def fast_basic_individual(row):
+    """
+    Equivalent to BasicIndividualSerializer, given an api.graph row. Note the
+    DateFields there serialize blank dates as null.
+    """
+    return {
+        'id': row['id'],
+        'first_names': row['first_names'],
+        'last_name': row['last_name'],
+        'birth_date': row['birth_date'] or None,
+        'death_date': row['death_date'] or None,
+    }
+
+def fast_individual_with_parents(row, parents):
+    """ Equivalent to BasicIndividualWithParentsSerializer. """
+    data = fast_basic_individual(row)
+    data['parents'] = parents
+    return data
+
+def fast_individual_and_families(graph, row):
+    """
+    Equivalent to BasicIndividualAndFamiliesSerializer, for an individual
+    whose families and spouses are loaded in `graph`.
+    """
+    families = []
+    for family_id in row['partner_in_families']:
+        family = graph.families[family_id]
+        spouses = [p for p in family['partners'] if p != row['id']]
+        families.append({
+            'id': family_id,
+            'spouse': fast_basic_individual(graph.individuals[spouses[0]]) if spouses else None,
+            'children': family['children'],
+        })
+    return {
+        'individual': fast_basic_individual(row),
+        'families': families,
+    }
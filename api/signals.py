@@ -0,0 +1,144 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from api.models import Individual, Family, AncestryClosure, Change, PlaceEvent, Statistic
+
+# Keeps tables derived from the family tree up to date as individuals and
+# families change; the ancestry closure table, the change log, the place
+# events and the statistics. Note that bulk writes (bulk_create(), update(),
+# etc) don't send these signals; code doing those must update derived tables
+# itself.
+
+# Set while deleting individuals whose derived rows the caller updates
+# itself; see deletes_handled().
+handling_deletes = ContextVar('handling_deletes', default=False)
+
+@contextmanager
+def deletes_handled():
+    """
+    Individuals deleted in this block don't update the derived tables, so
+    that code deleting many at once can do so in bulk instead, e.g. api.merge.
+    The rows which refer to them are still deleted.
+    """
+    token = handling_deletes.set(True)
+    try:
+        yield
+    finally:
+        handling_deletes.reset(token)
+
+def locations_changed(instance):
+    saved = getattr(instance, '_saved_locations', None)
+    instance._saved_locations = instance.locations()
+    return saved != instance._saved_locations
+
+def counted_as(individual):
+    return Individual.objects.filter(
+        pk=individual.pk).values_list(*Statistic.INDIVIDUAL_FIELDS).first()
+
+def children_of(family_ids):
+    return list(Individual.objects.filter(
+        child_in_family_id__in=family_ids).values_list('id', flat=True))
+
+@receiver(pre_save, sender=Individual)
+def individual_saving(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Find what an existing individual is counted as in the statistics; the
+    # instance may have been loaded without those fields, or be out of date.
+    if not instance._state.adding:
+        instance._saved_statistics = counted_as(instance)
+
+@receiver(post_save, sender=Individual)
+def individual_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_saved_child_in_family_id', None)
+    parents_changed = created or previous != instance.child_in_family_id or \
+        not hasattr(instance, '_saved_child_in_family_id')
+    if parents_changed:
+        AncestryClosure.rebuild([instance.id])
+        # The families' lists of children changed.
+        Change.record(Change.FAMILY, [previous, instance.child_in_family_id])
+    Change.record(Change.INDIVIDUAL, [instance.id])
+    instance._saved_child_in_family_id = instance.child_in_family_id
+    if locations_changed(instance):
+        PlaceEvent.update_individuals([instance.id])
+    Statistic.individuals_changed([instance])
+
+@receiver(post_save, sender=Family)
+def family_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    Change.record(Change.FAMILY, [instance.id])
+    if created:
+        Statistic.families_added(1)
+    if locations_changed(instance):
+        PlaceEvent.update_families([instance.id])
+
+@receiver(pre_delete, sender=Individual)
+def individual_deleting(sender, instance, **kwargs):
+    if handling_deletes.get():
+        return
+    # Their children lose a parent; remember who they are before the
+    # partnerships are deleted.
+    instance._family_ids = list(
+        instance.partner_in_families.values_list('id', flat=True))
+    instance._children_ids = children_of(instance._family_ids)
+    instance._saved_statistics = counted_as(instance)
+
+@receiver(post_delete, sender=Individual)
+def individual_deleted(sender, instance, **kwargs):
+    if handling_deletes.get():
+        return
+    children = getattr(instance, '_children_ids', [])
+    if children:
+        AncestryClosure.rebuild(children)
+    Change.record(Change.INDIVIDUAL, [instance.id], Change.DELETE)
+    Statistic.individuals_deleted([instance])
+    Change.record(Change.FAMILY,
+        getattr(instance, '_family_ids', []) + [instance.child_in_family_id])
+
+@receiver(pre_delete, sender=Family)
+def family_deleting(sender, instance, **kwargs):
+    instance._partner_ids = list(instance.partners.values_list('id', flat=True))
+
+@receiver(post_delete, sender=Family)
+def family_deleted(sender, instance, **kwargs):
+    Change.record(Change.FAMILY, [instance.id], Change.DELETE)
+    Statistic.families_added(-1)
+    # The partners' lists of families changed. Children are deleted with the
+    # family, and record their own deletion.
+    Change.record(Change.INDIVIDUAL, getattr(instance, '_partner_ids', []))
+
+@receiver(m2m_changed, sender=Family.partners.through)
+def partners_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        if reverse:
+            instance._cleared_ids = list(
+                instance.partner_in_families.values_list('id', flat=True))
+        else:
+            instance._cleared_ids = list(
+                instance.partners.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action == 'post_clear':
+        changed_ids = getattr(instance, '_cleared_ids', [])
+    else:
+        changed_ids = list(pk_set or [])
+
+    if reverse:
+        # instance is an Individual; the changed ids are families.
+        family_ids = changed_ids
+        individual_ids = [instance.id]
+    else:
+        family_ids = [instance.id]
+        individual_ids = changed_ids
+    children = children_of(family_ids)
+    if children:
+        AncestryClosure.rebuild(children)
+    Change.record(Change.FAMILY, family_ids)
+    Change.record(Change.INDIVIDUAL, individual_ids)
@@ -0,0 +1,324 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, transaction
+
+from array import array
+from bisect import bisect_left
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+from api.models import Individual, Family, Change
+
+# A compact, read-only copy of the family tree's structure in a file, which
+# every web worker memory-maps, so that the traversal endpoints (see
+# api.graph) can walk the tree without querying the database, and the workers
+# share one copy of it in the page cache instead of each holding their own.
+#
+# The file holds sorted arrays of individual and family ids, with parallel
+# arrays of each individual's parents' family and of offsets into the arrays
+# of their families, of each family's partners and of its children (as in
+# CSR sparse matrices), and the text fields of the graph payloads as offsets
+# into a UTF-8 blob. Integers are native byte order; the file is only read
+# on the machine which wrote it.
+#
+# The snapshot records the id of the last change (see Change) it includes,
+# and the database file it was read from, and is only used while that is
+# still the database's last change; not, e.g., after the database is restored
+# from a backup. When it's out of date, requests read the database as
+# before, and wake a thread which rewrites the file; a lock file makes sure
+# only one process does so.
+# Enable with settings.GRAPH_SNAPSHOT_FILE, or write it once with
+# `./manage.py write-graph-snapshot`.
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'FAMGRAPH'
+VERSION = 2
+
+# Magic, version, database id, last change id, number of sections.
+HEADER = struct.Struct('<8sIqqI')
+
+# Offset and length in bytes of each section.
+SECTION = struct.Struct('<QQ')
+
+SECTIONS = (
+    'individual_ids',
+    'individual_child_in_family',
+    'individual_family_offsets',
+    'individual_families',
+    'individual_text_offsets',
+    'individual_text',
+    'family_ids',
+    'family_partner_offsets',
+    'family_partners',
+    'family_child_offsets',
+    'family_children',
+    'family_text_offsets',
+    'family_text',
+)
+
+# The text fields of api.graph's INDIVIDUAL_FIELDS and FAMILY_FIELDS, in the
+# same order.
+INDIVIDUAL_TEXT_FIELDS = ('first_names', 'last_name', 'sex', 'birth_date', 'death_date')
+FAMILY_TEXT_FIELDS = ('name', 'married_date', 'married_location')
+
+# Wait at least this many seconds between rewriting the file, so a burst of
+# edits causes one rewrite rather than one each.
+REWRITE_DELAY = 5
+
+def latest_change_id(using=None):
+    return Change.objects.using(using).order_by('-id').values_list('id', flat=True).first() or 0
+
+def database_id():
+    """
+    The inode of the database file, which tells it from another database
+    with as many changes, e.g. one restored or loaded after the snapshot was
+    written; 0 if it isn't a file.
+    """
+    try:
+        return os.stat(settings.DATABASES[DEFAULT_DB_ALIAS]['NAME']).st_ino
+    except (OSError, TypeError, ValueError):
+        return 0
+
+def adjacency(ids, rows):
+    """
+    Returns (offsets, values) arrays, listing the values of the (id, value)
+    rows for each of ids. Both must be sorted by id.
+    """
+    offsets = array('i', [0])
+    values = array('i')
+    rows = iter(rows)
+    row = next(rows, None)
+    for pk in ids:
+        while row is not None and row[0] < pk:
+            row = next(rows, None)
+        while row is not None and row[0] == pk:
+            values.append(row[1])
+            row = next(rows, None)
+        offsets.append(len(values))
+    return offsets, values
+
+def text_table(rows):
+    """ Returns (offsets, UTF-8 text) of the values of each row in turn. """
+    offsets = array('i', [0])
+    text = bytearray()
+    for row in rows:
+        for value in row:
+            text += (value or '').encode('utf-8')
+            offsets.append(len(text))
+    return offsets, bytes(text)
+
+def snapshot_sections():
+    """ Reads the tree from the database; returns (change id, sections). """
+    Through = Family.partners.through
+    with transaction.atomic():
+        change_id = latest_change_id()
+        individuals = list(Individual.objects.order_by('id').values_list(
+            'id', 'child_in_family_id', *INDIVIDUAL_TEXT_FIELDS))
+        families = list(Family.objects.order_by('id').values_list('id', *FAMILY_TEXT_FIELDS))
+        partner_rows = list(Through.objects.order_by(
+            'individual_id', 'family_id').values_list('individual_id', 'family_id'))
+        child_rows = list(Individual.objects.exclude(child_in_family=None).order_by(
+            'child_in_family_id', 'id').values_list('child_in_family_id', 'id'))
+
+    sections = {}
+    individual_ids = [row[0] for row in individuals]
+    sections['individual_ids'] = array('i', individual_ids)
+    sections['individual_child_in_family'] = array('i', (row[1] or 0 for row in individuals))
+    sections['individual_family_offsets'], sections['individual_families'] = adjacency(
+        individual_ids, partner_rows)
+    sections['individual_text_offsets'], sections['individual_text'] = text_table(
+        row[2:] for row in individuals)
+
+    family_ids = [row[0] for row in families]
+    sections['family_ids'] = array('i', family_ids)
+    sections['family_partner_offsets'], sections['family_partners'] = adjacency(
+        family_ids, sorted((f, i) for i, f in partner_rows))
+    sections['family_child_offsets'], sections['family_children'] = adjacency(
+        family_ids, child_rows)
+    sections['family_text_offsets'], sections['family_text'] = text_table(
+        row[1:] for row in families)
+    return change_id, sections
+
+def write_snapshot(path):
+    """ Writes a snapshot of the tree to path; returns its last change id. """
+    database = database_id()
+    change_id, sections = snapshot_sections()
+    data = [bytes(sections[name]) for name in SECTIONS]
+    offset = HEADER.size + SECTION.size * len(SECTIONS)
+    table = []
+    for section in data:
+        # Keep the arrays aligned.
+        offset += -offset % 8
+        table.append(SECTION.pack(offset, len(section)))
+        offset += len(section)
+
+    # Readers may have the old file mapped; replace it rather than writing
+    # over it.
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, database, change_id, len(SECTIONS)))
+            f.write(b''.join(table))
+            for section in data:
+                f.write(b'\0' * (-f.tell() % 8))
+                f.write(section)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return change_id
+
+class GraphSnapshot:
+    """ A snapshot file, memory-mapped. """
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        magic, version, self.database_id, self.change_id, count = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION or count != len(SECTIONS):
+            raise ValueError("Not a graph snapshot")
+        self.sections = {}
+        for i, name in enumerate(SECTIONS):
+            offset, length = SECTION.unpack_from(view, HEADER.size + i * SECTION.size)
+            section = view[offset:offset + length]
+            self.sections[name] = section if name.endswith('_text') else section.cast('i')
+
+    @classmethod
+    def open(cls, path):
+        """ Maps the snapshot at path; None if there isn't a valid one. """
+        try:
+            with open(path, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return cls(buffer)
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def is_current(self):
+        """ Whether the snapshot has the database's last change. """
+        if self.database_id != database_id():
+            return False
+        latest = latest_change_id()
+        if self.change_id > latest:
+            # The change log read may be a read replica's (see api.replica),
+            # which lags the primary the snapshot was written from.
+            latest = latest_change_id(using=DEFAULT_DB_ALIAS)
+        return self.change_id == latest
+
+    def index(self, ids, pk):
+        i = bisect_left(ids, pk)
+        return i if i < len(ids) and ids[i] == pk else None
+
+    def text(self, name, i, count):
+        offsets = self.sections[name + '_text_offsets']
+        text = self.sections[name + '_text']
+        start = i * count
+        return [
+            str(text[offsets[j]:offsets[j + 1]], 'utf-8') for j in range(start, start + count)
+        ]
+
+    def individual(self, pk):
+        """ An individual's row as api.graph loads it, or None. """
+        s = self.sections
+        i = self.index(s['individual_ids'], pk)
+        if i is None:
+            return None
+        row = {'id': pk}
+        row.update(zip(INDIVIDUAL_TEXT_FIELDS,
+            self.text('individual', i, len(INDIVIDUAL_TEXT_FIELDS))))
+        row['child_in_family'] = s['individual_child_in_family'][i] or None
+        offsets = s['individual_family_offsets']
+        row['partner_in_families'] = s['individual_families'][offsets[i]:offsets[i + 1]].tolist()
+        return row
+
+    def family(self, pk):
+        """ A family's row as api.graph loads it, or None. """
+        s = self.sections
+        i = self.index(s['family_ids'], pk)
+        if i is None:
+            return None
+        row = {'id': pk}
+        row.update(zip(FAMILY_TEXT_FIELDS, self.text('family', i, len(FAMILY_TEXT_FIELDS))))
+        offsets = s['family_partner_offsets']
+        row['partners'] = s['family_partners'][offsets[i]:offsets[i + 1]].tolist()
+        offsets = s['family_child_offsets']
+        row['children'] = s['family_children'][offsets[i]:offsets[i + 1]].tolist()
+        return row
+
+def update_snapshot(path):
+    """
+    Rewrites the snapshot at path if it's out of date, unless another process
+    is already doing so. Returns whether it was written.
+    """
+    with open(path + '.lock', 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        snapshot = GraphSnapshot.open(path)
+        if snapshot is not None and snapshot.is_current():
+            return False
+        write_snapshot(path)
+        return True
+
+class SnapshotWriter:
+    """
+    Rewrites the snapshot from a daemon thread, started the first time it's
+    woken; wakes while it's writing are handled by one more rewrite.
+    """
+    def __init__(self, delay=REWRITE_DELAY):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.thread = None
+
+    def wake(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name='snapshot-writer', daemon=True)
+                self.thread.start()
+        self.event.set()
+
+    def run(self):
+        while True:
+            self.event.wait()
+            self.event.clear()
+            try:
+                update_snapshot(settings.GRAPH_SNAPSHOT_FILE)
+            except Exception:
+                logger.exception("Error writing graph snapshot")
+            finally:
+                close_old_connections()
+            time.sleep(self.delay)
+
+writer = SnapshotWriter()
+
+# The mapped snapshot, and the (inode, modification time) of the file it
+# was mapped from.
+mapped = (None, None)
+
+def current():
+    """
+    The mapped snapshot, if snapshots are enabled and it's up to date;
+    otherwise None, and the snapshot is rewritten in the background.
+    """
+    global mapped
+    path = getattr(settings, 'GRAPH_SNAPSHOT_FILE', None)
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+        key = (stat.st_ino, stat.st_mtime_ns)
+    except OSError:
+        key = None
+    snapshot, mapped_key = mapped
+    if key != mapped_key:
+        snapshot = GraphSnapshot.open(path) if key else None
+        mapped = (snapshot, key)
+    if snapshot is None or not snapshot.is_current():
+        writer.wake()
+        return None
+    return snapshot
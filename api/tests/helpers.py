@@ -0,0 +1,11 @@
+from api.models import Family
+
+def create_family(partners, children, **fields):
+    family = Family.objects.create(**fields)
+    for partner in partners:
+        family.partners.add(partner)
+    for child in children:
+        child.child_in_family = family
+        child.save()
+    family.save()
+    return family
@@ -0,0 +1,79 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from api.models import Individual, Statistic
+from api.tests.helpers import create_family
+
+class AdminTests(TestCase):
+
+    def setUp(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'test-password')
+        self.client.force_login(admin)
+        self.dad = Individual.objects.create(first_names='John', last_name='Smith')
+        self.mum = Individual.objects.create(first_names='Jane', last_name='Brown')
+        self.me = Individual.objects.create(first_names='Mary Jo', last_name='Smith')
+        self.other = Individual.objects.create(first_names='Smithers', last_name='Jones')
+        self.family = create_family([self.dad, self.mum], [self.me])
+
+    def changelist(self, model, search=''):
+        url = '/admin/api/{}/'.format(model)
+        response = self.client.get(url, {'q': search} if search else {})
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def test_search_individuals(self):
+        results = lambda search: sorted(
+            i.id for i in self.changelist('individual', search).result_list)
+        self.assertEqual(results('smith'), sorted([self.dad.id, self.me.id, self.other.id]))
+        # Words match the start of the first or last names.
+        self.assertEqual(results('SMI jo'), sorted([self.dad.id, self.other.id]))
+        self.assertEqual(results('smith mary'), [self.me.id])
+        self.assertEqual(results('mith'), [])
+        otaki = Individual.objects.create(first_names='Hēmi', last_name='Ōtaki')
+        self.assertEqual(results('Ōtaki'), [otaki.id])
+        # Other letters only match in the same case, as in SQLite.
+        self.assertEqual(results('ōta HĒ'), [])
+        self.assertEqual(results('Ōta hē'), [otaki.id])
+        otaki.delete()
+        self.assertEqual(len(results('')), 4)
+
+    def test_search_families(self):
+        other = create_family([self.other], [])
+        results = lambda search: [f.id for f in self.changelist('family', search).result_list]
+        self.assertEqual(results('smi bro'), [self.family.id])
+        self.assertEqual(results('jon'), [other.id])
+        self.assertEqual(results('brown jones'), [])
+
+    def test_autocomplete(self):
+        response = self.client.get('/admin/autocomplete/', {
+            'app_label': 'api', 'model_name': 'family', 'field_name': 'partners', 'term': 'jan',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result['id'] for result in response.json()['results']], [str(self.mum.id)])
+        response = self.client.get('/admin/autocomplete/', {
+            'app_label': 'api', 'model_name': 'individual', 'field_name': 'child_in_family',
+            'term': 'smith',
+        })
+        self.assertEqual(response.json()['results'],
+            [{'id': str(self.family.id), 'text': self.family.name}])
+
+    def test_change_forms(self):
+        for url in [
+            '/admin/api/individual/{}/change/'.format(self.me.id),
+            '/admin/api/family/{}/change/'.format(self.family.id),
+        ]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            # No <option> for every individual or family.
+            self.assertNotContains(response, '<option value="{}"'.format(self.other.id))
+
+    def test_count_from_statistics(self):
+        Statistic.objects.update_or_create(
+            kind=Statistic.TOTAL, key=Statistic.INDIVIDUALS, defaults={'value': 1000})
+        cl = self.changelist('individual')
+        self.assertEqual(cl.paginator.count, 1000)
+        self.assertEqual(cl.paginator.num_pages, 20)
+        # Searches are counted.
+        self.assertEqual(self.changelist('individual', 'smith').paginator.count, 3)
+        Statistic.objects.all().delete()
+        self.assertEqual(self.changelist('individual').paginator.count, 4)
@@ -0,0 +1,136 @@
+from django.apps import apps
+from django.test import TestCase
+from django.contrib.auth.models import User, Group
+from rest_framework.test import APIClient
+from api.models import Individual, Family, AncestryClosure
+import importlib
+
+def closure_rows():
+    return set(AncestryClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+class AncestryClosureTests(TestCase):
+
+    def assertClosureConsistent(self):
+        # Incremental maintenance should match a rebuild from scratch.
+        incremental = closure_rows()
+        AncestryClosure.rebuild()
+        self.assertSetEqual(incremental, closure_rows())
+
+    def create_family(self, partners, children):
+        family = Family.objects.create()
+        for partner in partners:
+            family.partners.add(partner)
+        for child in children:
+            child.child_in_family = family
+            child.save()
+        family.save()
+        return family
+
+    def setUp(self):
+        self.people = {}
+        for name in ['grandad', 'grandma', 'dad', 'mum', 'me', 'son', 'stranger']:
+            self.people[name] = Individual.objects.create(first_names=name)
+        p = self.people
+        self.grandparents = self.create_family([p['grandad'], p['grandma']], [p['dad']])
+        self.parents = self.create_family([p['dad'], p['mum']], [p['me']])
+        self.create_family([p['me']], [p['son']])
+
+    def test_lookups(self):
+        p = self.people
+        self.assertTrue(AncestryClosure.is_ancestor(p['grandad'].id, p['son'].id))
+        self.assertFalse(AncestryClosure.is_ancestor(p['son'].id, p['grandad'].id))
+        self.assertFalse(AncestryClosure.is_ancestor(p['me'].id, p['me'].id))
+        self.assertSetEqual({p['dad'].id, p['me'].id, p['son'].id},
+            set(AncestryClosure.descendant_ids(p['grandma'].id)))
+        self.assertSetEqual({p['dad'].id},
+            set(AncestryClosure.descendant_ids(p['grandma'].id, max_depth=1)))
+        self.assertSetEqual({p['me'].id, p['dad'].id, p['mum'].id},
+            set(AncestryClosure.ancestor_ids(p['son'].id, max_depth=2)))
+        self.assertEqual(AncestryClosure.objects.get(
+            ancestor=p['grandad'], descendant=p['son']).depth, 3)
+        self.assertClosureConsistent()
+
+    def test_change_parents(self):
+        p = self.people
+        # Move dad out of the grandparents' family.
+        dad = Individual.objects.get(pk=p['dad'].id)
+        dad.child_in_family = None
+        dad.save()
+        self.assertFalse(AncestryClosure.is_ancestor(p['grandad'].id, p['son'].id))
+        self.assertClosureConsistent()
+
+        # And adopt him into a family with a stranger.
+        family = self.create_family([p['stranger']], [dad])
+        self.assertTrue(AncestryClosure.is_ancestor(p['stranger'].id, p['son'].id))
+        self.assertClosureConsistent()
+
+    def test_change_partners(self):
+        p = self.people
+        self.grandparents.partners.remove(p['grandma'])
+        self.assertFalse(AncestryClosure.is_ancestor(p['grandma'].id, p['me'].id))
+        self.assertTrue(AncestryClosure.is_ancestor(p['grandad'].id, p['me'].id))
+        self.assertClosureConsistent()
+
+        p['stranger'].partner_in_families.add(self.grandparents)
+        self.assertTrue(AncestryClosure.is_ancestor(p['stranger'].id, p['son'].id))
+        self.assertClosureConsistent()
+
+        p['stranger'].partner_in_families.clear()
+        self.assertFalse(AncestryClosure.is_ancestor(p['stranger'].id, p['son'].id))
+        self.assertClosureConsistent()
+
+    def test_delete(self):
+        p = self.people
+        p['dad'].delete()
+        self.assertFalse(AncestryClosure.is_ancestor(p['grandad'].id, p['son'].id))
+        self.assertTrue(AncestryClosure.is_ancestor(p['mum'].id, p['son'].id))
+        self.assertClosureConsistent()
+
+    def test_pedigree_collapse(self):
+        p = self.people
+        # Grandad is also mum's father, so he's son's ancestor via two lines.
+        mum = Individual.objects.get(pk=p['mum'].id)
+        mum.child_in_family = self.grandparents
+        mum.save()
+        self.assertEqual(AncestryClosure.objects.get(
+            ancestor=p['grandad'], descendant=p['son']).depth, 3)
+        self.assertClosureConsistent()
+
+    def test_cycle(self):
+        p = self.people
+        # Bad data; son is his own grandad's parent. Where the cycle is
+        # broken depends on the order of updates, but nobody should end up
+        # as their own ancestor.
+        grandad = Individual.objects.get(pk=p['grandad'].id)
+        self.create_family([p['son']], [grandad])
+        for rebuild in [lambda: None, AncestryClosure.rebuild]:
+            rebuild()
+            self.assertFalse(AncestryClosure.objects.filter(
+                ancestor=p['son'], descendant=p['son'], depth__gt=0).exists())
+
+    def test_migration_fills_table(self):
+        expected = closure_rows()
+        AncestryClosure.objects.all().delete()
+        migration = importlib.import_module('api.migrations.0021_ancestryclosure')
+        migration.build_closure(apps, None)
+        self.assertSetEqual(closure_rows(), expected)
+
+    def test_bulk_endpoint(self):
+        alice = User.objects.create_user('alice', password='test-password')
+        alice.groups.add(Group.objects.get(name='editors'))
+        client = APIClient()
+        client.force_authenticate(user=alice)
+        self.people['son'].owner = alice
+        self.people['son'].save()
+        response = client.post('/api/v1/bulk/', {
+            'individuals': [
+                {'temp_id': 'grandson', 'child_in_family': 'family'},
+            ],
+            'families': [
+                {'temp_id': 'family', 'partners': [self.people['son'].id]},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        grandson = response.data['individuals']['grandson']
+        self.assertTrue(AncestryClosure.is_ancestor(self.people['grandad'].id, grandson))
+        self.assertClosureConsistent()
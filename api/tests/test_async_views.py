@@ -0,0 +1,94 @@
+import gzip
+import json
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User, Group
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from api.models import Individual
+from api.tests.helpers import create_family
+
+@override_settings(ROOT_URLCONF='familyapi.asgi_urls')
+class AsyncViewTests(TestCase):
+    """
+    The async views must return the same responses as the sync ones.
+    """
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='test-password',
+            first_name='Alice', email='alice@example.com')
+        self.alice.groups.add(Group.objects.get(name='editors'))
+        self.token = Token.objects.create(user=self.alice)
+        self.sync_client = APIClient()
+        self.sync_client.force_authenticate(user=self.alice)
+
+        self.people = {}
+        for name in ['grandad', 'grandma', 'dad', 'mum', 'me', 'sister']:
+            self.people[name] = Individual.objects.create(
+                first_names=name, last_name='Smith', birth_date='1950-01-02')
+        p = self.people
+        create_family([p['grandad'], p['grandma']], [p['dad']])
+        create_family([p['dad'], p['mum']], [p['me'], p['sister']])
+
+    async def get(self, url, **headers):
+        return await self.async_client.get(url,
+            headers={'Authorization': 'Token ' + self.token.key, **headers})
+
+    def sync_get(self, url):
+        with override_settings(ROOT_URLCONF='familyapi.urls'):
+            return self.sync_client.get(url)
+
+    async def assert_same(self, url):
+        response = await self.get(url)
+        self.assertTrue(response.resolver_match.func.__module__.endswith('async_views'))
+        expected = await sync_to_async(self.sync_get)(url)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+
+    async def test_same_as_sync(self):
+        me = self.people['me'].id
+        for url in [
+                '/api/v1/account/',
+                '/api/v1/search-individuals/smi',
+                '/api/v1/search-individuals/smyth?mode=phonetic',
+                '/api/v1/individuals/{}/verbose'.format(me),
+                '/api/v1/individuals/{}/ancestors'.format(me),
+                '/api/v1/individuals/{}/ancestors?layout=normalized'.format(me),
+                '/api/v1/individuals/{}/descendants'.format(self.people['grandad'].id),
+                '/api/v1/individuals/{}/tree?generations=2'.format(me),
+                '/api/v1/individuals/{}/tree?generations=bad'.format(me),
+                '/api/v1/individuals/1234/ancestors',
+                '/api/v1/individuals/1234/verbose']:
+            with self.subTest(url=url):
+                await self.assert_same(url)
+
+    async def test_authentication(self):
+        response = await self.async_client.get('/api/v1/account/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+        response = await self.async_client.get('/api/v1/account/',
+            headers={'Authorization': 'Token not-a-token'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(json.loads(response.content), {'detail': 'Invalid token.'})
+
+        response = await self.async_client.get('/api/v1/ping/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {'pong': True})
+
+    async def test_method_not_allowed(self):
+        response = await self.async_client.post('/api/v1/ping/')
+        self.assertEqual(response.status_code, 405)
+
+    async def test_compression(self):
+        for i in range(50):
+            await Individual.objects.acreate(first_names='Person {}'.format(i), last_name='Jones')
+        response = await self.get('/api/v1/search-individuals/jones',
+            **{'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 50)
+
+    def test_other_endpoints_still_sync(self):
+        response = self.sync_client.get('/api/v1/individuals/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.resolver_match.func.__module__, 'api.views')
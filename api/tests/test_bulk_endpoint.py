@@ -0,0 +1,133 @@
+from django.test import TestCase
+from django.contrib.auth.models import User, Group
+from rest_framework.test import APIClient
+from api.models import Individual, Family, FamilyNameList
+
+class BulkEndpointTests(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='test-password')
+        self.alice.groups.add(Group.objects.get(name='editors'))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.alice)
+
+    def test_create_family(self):
+        grandma = Individual.objects.create(first_names='Grandma', last_name='Smith', sex='F',
+            owner=self.alice)
+        response = self.client.post('/api/v1/bulk/', {
+            'individuals': [
+                {'temp_id': 'dad', 'first_names': 'Bob', 'last_name': 'Baker', 'sex': 'M',
+                 'birth_date': '1 JAN 1950', 'child_in_family': 'grandparents'},
+                {'temp_id': 'mum', 'first_names': 'Alice', 'last_name': 'Aitken', 'sex': 'F'},
+                {'temp_id': 'kid1', 'first_names': 'Carl', 'last_name': 'Baker', 'sex': 'M'},
+                {'temp_id': 'kid2', 'first_names': 'Dora', 'last_name': 'Baker', 'sex': 'F',
+                 'child_in_family': 'family'},
+            ],
+            'families': [
+                {'temp_id': 'family', 'partners': ['dad', 'mum'], 'children': ['kid1'],
+                 'married_location': 'Dunedin'},
+                {'temp_id': 'grandparents', 'partners': [grandma.id]},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.data['ok'])
+
+        ids = response.data['individuals']
+        dad = Individual.objects.get(pk=ids['dad'])
+        self.assertEqual(dad.owner, self.alice)
+        family = Family.objects.get(pk=response.data['families']['family'])
+        self.assertEqual(family.owner, self.alice)
+        self.assertEqual(family.married_location, 'Dunedin')
+        self.assertEqual(family.name, 'Baker, Bob (1950-?) & Aitken, Alice')
+        self.assertSetEqual({ids['kid1'], ids['kid2']},
+            {c.id for c in family.children.all()})
+        self.assertSetEqual({grandma}, set(dad.parents()))
+        self.assertSetEqual({family}, set(FamilyNameList.search('Bob Baker')))
+
+    def test_update(self):
+        bob = Individual.objects.create(first_names='Bob', last_name='Baker', sex='M', owner=self.alice)
+        alice = Individual.objects.create(first_names='Alice', last_name='Aitken', sex='F', owner=self.alice)
+        family = Family.objects.create(owner=self.alice)
+        family.partners.add(bob)
+        family.save()
+
+        response = self.client.post('/api/v1/bulk/', {
+            'individuals': [
+                {'id': bob.id, 'last_name': 'Barker'},
+            ],
+            'families': [
+                {'id': family.id, 'partners': [bob.id, alice.id]},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        family.refresh_from_db()
+        self.assertEqual(family.name, 'Barker, Bob & Aitken, Alice')
+        self.assertSetEqual({family}, set(FamilyNameList.search('Bob Barker')))
+
+    def test_invalid_references(self):
+        response = self.client.post('/api/v1/bulk/', {
+            'individuals': [
+                {'temp_id': 'a', 'child_in_family': 'missing'},
+                {'temp_id': 'a'},
+                {'first_names': 'No id'},
+            ],
+            'families': [
+                {'temp_id': 'f', 'partners': [12345]},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['errors']
+        self.assertIn('child_in_family', errors['individuals'][0])
+        self.assertIn('temp_id', errors['individuals'][1])
+        self.assertIn('non_field_errors', errors['individuals'][2])
+        self.assertIn('partners', errors['families'][0])
+        # Nothing should have been written.
+        self.assertEqual(Individual.objects.count(), 0)
+        self.assertEqual(Family.objects.count(), 0)
+
+    def test_permissions(self):
+        susan = Individual.objects.create(first_names='Susan')
+        response = self.client.post('/api/v1/bulk/', {
+            'individuals': [{'id': susan.id, 'last_name': 'tester'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 403)
+        susan.refresh_from_db()
+        self.assertEqual(susan.last_name, '')
+
+        bob = User.objects.create_user('bob', password='test-password')
+        self.client.force_authenticate(user=bob)
+        response = self.client.post('/api/v1/bulk/', {
+            'individuals': [{'temp_id': 'a'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_permissions_of_linked_objects(self):
+        bob = User.objects.create_user('bob', password='test-password')
+        mine = Individual.objects.create(first_names='Mine', owner=self.alice)
+        theirs = Individual.objects.create(first_names='Theirs', owner=bob)
+        their_family = Family.objects.create(owner=bob)
+        my_family = Family.objects.create(owner=self.alice)
+        theirs.child_in_family = my_family
+        theirs.save()
+        requests = [
+            # Existing individuals in a new family.
+            {'families': [{'temp_id': 'f', 'partners': [mine.id], 'children': [theirs.id]}]},
+            {'families': [{'temp_id': 'f', 'partners': [theirs.id]}]},
+            # An existing family, as a new individual's parents.
+            {'individuals': [{'temp_id': 'a', 'child_in_family': their_family.id}]},
+            # Children unlinked from an edited family.
+            {'families': [{'id': my_family.id, 'children': [mine.id]}]},
+        ]
+        for data in requests:
+            response = self.client.post('/api/v1/bulk/', data, format='json')
+            self.assertEqual(response.status_code, 403, data)
+        theirs.refresh_from_db()
+        self.assertEqual(theirs.child_in_family, my_family)
+        self.assertEqual(Family.objects.count(), 2)
+        self.assertEqual(Individual.objects.count(), 2)
+
+        response = self.client.post('/api/v1/bulk/', {
+            'families': [{'temp_id': 'f', 'partners': [mine.id], 'children': ['a']}],
+            'individuals': [{'temp_id': 'a'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
@@ -0,0 +1,118 @@
+from django.test import TestCase
+from django.contrib.auth.models import User, Group
+from rest_framework.test import APIClient
+from api.models import Individual, Family, Change
+from api import views
+
+class ChangesEndpointTests(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='test-password')
+        self.alice.groups.add(Group.objects.get(name='editors'))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.alice)
+
+    def changes(self, since):
+        response = self.client.get('/api/v1/changes/?since={}'.format(since))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def latest(self):
+        return self.changes(0)['seq']
+
+    def test_changes(self):
+        dad = Individual.objects.create(first_names='Dad', sex='M', owner=self.alice)
+        mum = Individual.objects.create(first_names='Mum', sex='F')
+        kid = Individual.objects.create(first_names='Kid')
+        seq = self.latest()
+        self.assertEqual(self.changes(seq), {
+            'seq': seq,
+            'more': False,
+            'individuals': [],
+            'families': [],
+            'deleted_individuals': [],
+            'deleted_families': [],
+        })
+
+        # An edit through the API, sent in the same form as the list.
+        response = self.client.patch('/api/v1/individuals/{}/'.format(dad.id),
+            {'occupation': 'Baker'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        data = self.changes(seq)
+        self.assertGreater(data['seq'], seq)
+        self.assertEqual(len(data['individuals']), 1)
+        listed = self.client.get('/api/v1/individuals/').data
+        self.assertIn(data['individuals'][0], listed)
+        seq = data['seq']
+
+        # Linking a family changes the family and its members, but each is
+        # sent once.
+        family = Family.objects.create()
+        family.partners.add(dad, mum)
+        kid.child_in_family = family
+        kid.save()
+        data = self.changes(seq)
+        self.assertListEqual([i['id'] for i in data['individuals']], [dad.id, mum.id, kid.id])
+        self.assertListEqual([f['id'] for f in data['families']], [family.id])
+        self.assertListEqual(data['families'][0]['children'], [kid.id])
+        seq = data['seq']
+
+        # Deleting the family deletes its children, and unlinks its partners.
+        family_id = family.id
+        family.delete()
+        data = self.changes(seq)
+        self.assertListEqual(data['deleted_families'], [family_id])
+        self.assertListEqual(data['deleted_individuals'], [kid.id])
+        self.assertListEqual([i['id'] for i in data['individuals']], [dad.id, mum.id])
+        self.assertListEqual(data['individuals'][0]['partner_in_families'], [])
+
+    def test_deleted_after_save(self):
+        seq = self.latest()
+        bob = Individual.objects.create(first_names='Bob')
+        bob_id = bob.id
+        bob.delete()
+        data = self.changes(seq)
+        self.assertListEqual(data['individuals'], [])
+        self.assertListEqual(data['deleted_individuals'], [bob_id])
+
+    def test_pages(self):
+        seq = self.latest()
+        old_size = views.CHANGES_PAGE_SIZE
+        views.CHANGES_PAGE_SIZE = 2
+        try:
+            people = [Individual.objects.create(first_names=str(i)) for i in range(3)]
+            data = self.changes(seq)
+            self.assertTrue(data['more'])
+            self.assertListEqual([i['id'] for i in data['individuals']], [people[0].id, people[1].id])
+            data = self.changes(data['seq'])
+            self.assertFalse(data['more'])
+            self.assertListEqual([i['id'] for i in data['individuals']], [people[2].id])
+        finally:
+            views.CHANGES_PAGE_SIZE = old_size
+
+    def test_bulk_changes_recorded(self):
+        bob = Individual.objects.create(first_names='Bob', sex='M', owner=self.alice)
+        old_family = Family.objects.create(owner=self.alice)
+        old_family.partners.add(bob)
+        old_kid = Individual.objects.create(first_names='Old kid', child_in_family=old_family,
+            owner=self.alice)
+        seq = self.latest()
+
+        response = self.client.post('/api/v1/bulk/', {
+            'individuals': [
+                {'temp_id': 'kid', 'first_names': 'Kid'},
+            ],
+            'families': [
+                {'id': old_family.id, 'children': ['kid']},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        kid = response.data['individuals']['kid']
+        data = self.changes(seq)
+        self.assertListEqual([i['id'] for i in data['individuals']], sorted([old_kid.id, kid]))
+        self.assertListEqual([f['id'] for f in data['families']], [old_family.id])
+        self.assertListEqual(data['families'][0]['children'], [kid])
+
+    def test_bad_since(self):
+        response = self.client.get('/api/v1/changes/?since=yesterday')
+        self.assertEqual(response.status_code, 400)
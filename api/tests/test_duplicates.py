@@ -0,0 +1,84 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from api.models import Individual
+from api.duplicates import blocks, find_duplicates, load_rows
+from api import duplicates
+
+
+class DuplicatesTests(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='test-password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.alice)
+
+        def person(first_names, last_name, sex, birth_date, birth_location=''):
+            return Individual.objects.create(first_names=first_names,
+                last_name=last_name, sex=sex, birth_date=birth_date,
+                birth_location=birth_location)
+
+        self.john = person('John William', 'Smith', 'M', '3 MAR 1852', 'Bristol')
+        self.jon = person('Jon William', 'Smyth', 'M', '3 MAR 1852', 'Bristol, England')
+        self.johnny = person('John', 'Smith', 'M', 'ABT 1853')
+        # Different sex, decade or surname; never compared with John.
+        self.joan = person('Joan', 'Smith', 'F', '1852')
+        self.old_john = person('John William', 'Smith', 'M', '1832')
+        self.john_jones = person('John William', 'Jones', 'M', '3 MAR 1852', 'Bristol')
+
+    def test_blocks(self):
+        block_ids = sorted(sorted(row['id'] for row in block) for block in blocks(load_rows()))
+        self.assertListEqual(block_ids, [[self.john.id, self.jon.id, self.johnny.id]])
+
+    def test_large_blocks_split_by_first_name(self):
+        Individual.objects.create(first_names='William', last_name='Smith',
+            sex='M', birth_date='1855')
+        old_size = duplicates.MAX_BLOCK_SIZE
+        duplicates.MAX_BLOCK_SIZE = 3
+        try:
+            block_ids = sorted(sorted(row['id'] for row in block) for block in blocks(load_rows()))
+        finally:
+            duplicates.MAX_BLOCK_SIZE = old_size
+        self.assertListEqual(block_ids, [[self.john.id, self.jon.id, self.johnny.id]])
+
+    def test_ranked(self):
+        matches = find_duplicates(min_score=0.5)
+        pairs = [(a, b) for _, a, b in matches]
+        self.assertEqual(pairs[0], (self.john.id, self.jon.id))
+        self.assertIn((self.john.id, self.johnny.id), pairs)
+        scores = [score for score, _, _ in matches]
+        self.assertListEqual(scores, sorted(scores, reverse=True))
+        self.assertListEqual(find_duplicates(min_score=0.5, limit=1), matches[:1])
+
+    def test_little_known(self):
+        # Nothing known but the same first name, or blank fields.
+        mary = Individual.objects.create(first_names='Mary')
+        other_mary = Individual.objects.create(first_names='Mary')
+        blank = Individual.objects.create()
+        other_blank = Individual.objects.create()
+        pairs = [(a, b) for _, a, b in find_duplicates()]
+        self.assertNotIn((mary.id, other_mary.id), pairs)
+        self.assertNotIn((blank.id, other_blank.id), pairs)
+        scores = {(a, b): score for score, a, b in find_duplicates(min_score=0)}
+        self.assertAlmostEqual(scores[(mary.id, other_mary.id)], 3 / 7)
+        self.assertEqual(scores[(blank.id, other_blank.id)], 0)
+
+    def test_process_pool(self):
+        Individual.objects.create(first_names='Mary', last_name='Brown', sex='F', birth_date='1900')
+        Individual.objects.create(first_names='Mary', last_name='Browne', sex='F', birth_date='1901')
+        self.assertListEqual(find_duplicates(min_score=0.5, jobs=2),
+            find_duplicates(min_score=0.5))
+
+    def test_endpoint(self):
+        response = self.client.get('/api/v1/duplicates/?min_score=0.8')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['duplicates']), 1)
+        match = response.data['duplicates'][0]
+        self.assertGreaterEqual(match['score'], 0.8)
+        self.assertListEqual([i['id'] for i in match['individuals']], [self.john.id, self.jon.id])
+        self.assertEqual(match['individuals'][1]['last_name'], 'Smyth')
+
+    def test_endpoint_bad_arguments(self):
+        response = self.client.get('/api/v1/duplicates/?min_score=high&limit=0')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data['errors']), 2)
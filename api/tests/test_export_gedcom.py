@@ -0,0 +1,103 @@
+import os
+import tempfile
+
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from api.models import Individual, Family
+from api.export import MAX_VALUE_LENGTH, gedcom_export
+from api.tests.helpers import create_family
+
+def snapshot():
+    """ Everything the GEDCOM export should preserve, independent of ids. """
+    def individual(i):
+        return (i.first_names, i.last_name, i.sex, i.birth_date, i.birth_location,
+            i.death_date, i.death_location, i.buried_date, i.buried_location,
+            i.baptism_date, i.baptism_location, i.occupation, i.note or '')
+    individuals = {individual(i) for i in Individual.objects.all()}
+    families = set()
+    for family in Family.objects.all():
+        families.add((
+            family.married_date,
+            family.married_location,
+            family.note or '',
+            frozenset(individual(p) for p in family.partners.all()),
+            frozenset(individual(c) for c in family.children.all()),
+        ))
+    return individuals, families
+
+class ExportGedcomTest(TestCase):
+
+    def round_trip(self):
+        before = snapshot()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.ged')
+            call_command('exportgedcom', path, stdout=StringIO())
+            Individual.objects.all().delete()
+            Family.objects.all().delete()
+            call_command('importgedcom', path, stdout=StringIO())
+        self.assertEqual(snapshot(), before)
+
+    def test_round_trip(self):
+        call_command('importgedcom', 'api/tests/family.ged', stdout=StringIO())
+        self.round_trip()
+
+    def test_round_trip_long_values(self):
+        note = ' '.join('word{}'.format(i) for i in range(200))
+        self.assertGreater(len(note), 3 * MAX_VALUE_LENGTH)
+        dad = Individual.objects.create(first_names='John Paul', last_name='Smith', sex='M',
+            birth_date='1 JAN 1900', birth_location='London, England',
+            death_date='2 FEB 1980', death_location='Paris',
+            buried_date='5 FEB 1980', buried_location='Cemetery',
+            baptism_date='3 JAN 1900', baptism_location='Church',
+            occupation='Baker', note=note)
+        mum = Individual.objects.create(first_names='Jane', last_name='Doe', sex='F')
+        child = Individual.objects.create(first_names='Kid', sex='M')
+        family = create_family([dad, mum], [child])
+        family.married_date = 'ABT 1930'
+        family.married_location = 'Town hall'
+        family.note = 'Eloped'
+        family.save()
+
+        text = ''.join(gedcom_export())
+        self.assertTrue(all(len(line) < MAX_VALUE_LENGTH + 10 for line in text.split('\n')))
+        self.assertIn('2 CONC ', text)
+        self.round_trip()
+
+    def test_endpoint(self):
+        alice = User.objects.create_user('alice', password='test-password')
+        client = APIClient()
+        client.force_authenticate(user=alice)
+
+        grandad = Individual.objects.create(first_names='Grandad', sex='M')
+        dad = Individual.objects.create(first_names='Dad', sex='M')
+        mum = Individual.objects.create(first_names='Mum', sex='F')
+        me = Individual.objects.create(first_names='Me', sex='F')
+        uncle = Individual.objects.create(first_names='Uncle', sex='M')
+        grandparents = create_family([grandad], [dad, uncle])
+        parents = create_family([dad, mum], [me])
+
+        response = client.get('/api/v1/export/gedcom/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        text = b''.join(response.streaming_content).decode()
+        self.assertTrue(text.startswith('0 HEAD\n'))
+        self.assertTrue(text.endswith('0 TRLR\n'))
+        self.assertEqual(text.count(' INDI\n'), 5)
+
+        # Dad's subtree; his descendants and their spouses, but not his
+        # parents' family.
+        response = client.get('/api/v1/export/gedcom/?root={}'.format(dad.id))
+        text = b''.join(response.streaming_content).decode()
+        for individual in [dad, mum, me]:
+            self.assertIn('0 @I{}@ INDI'.format(individual.id), text)
+        for individual in [grandad, uncle]:
+            self.assertNotIn('@I{}@'.format(individual.id), text)
+        self.assertIn('0 @F{}@ FAM'.format(parents.id), text)
+        self.assertNotIn('@F{}@'.format(grandparents.id), text)
+
+        self.assertEqual(client.get('/api/v1/export/gedcom/?root=1234').status_code, 404)
+        self.assertEqual(client.get('/api/v1/export/gedcom/?root=bob').status_code, 400)
+        self.assertEqual(APIClient().get('/api/v1/export/gedcom/').status_code, 401)
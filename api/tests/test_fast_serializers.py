@@ -0,0 +1,62 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from api.models import Individual, Family
+from api.serializers import IndividualSerializer
+from api.serializers import BasicIndividualAndFamilies, BasicIndividualAndFamiliesSerializer
+from api.serializers import BasicIndividualWithParents, BasicIndividualWithParentsSerializer
+
+def render(data):
+    return JSONRenderer().render(data)
+
+class FastSerializerTests(TestCase):
+    """
+    The fast-path serializers must produce exactly the same JSON as the DRF
+    serializers they stand in for.
+    """
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='test-password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.alice)
+
+        self.grandad = Individual.objects.create(first_names='Grandad', last_name='Foo',
+            sex='M', birth_date='1 JAN 1900', death_date='1970', note=None)
+        self.grandma = Individual.objects.create(first_names='Grandma', last_name='Bar',
+            sex='F', birth_location='Dunedin', owner=self.alice, note='A note')
+        family = Family.objects.create()
+        family.partners.add(self.grandad, self.grandma)
+        family.save()
+        self.children = []
+        for name in ['Alice', 'Bob']:
+            child = Individual.objects.create(first_names=name, last_name='Foo',
+                child_in_family=family, occupation='Farmer')
+            self.children.append(child)
+        second_family = Family.objects.create()
+        second_family.partners.add(self.grandad)
+        second_family.save()
+        Individual.objects.create(first_names='Carl', child_in_family=second_family)
+
+    def test_individual_list(self):
+        expected = IndividualSerializer(
+            IndividualSerializer.init_queryset(Individual.objects.all()), many=True).data
+        response = self.client.get('/api/v1/individuals/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(render(expected), response.content)
+
+    def test_ancestors(self):
+        individuals = [BasicIndividualWithParents(i)
+            for i in [self.children[0], self.grandad, self.grandma]]
+        expected = BasicIndividualWithParentsSerializer(individuals, many=True).data
+        response = self.client.get('/api/v1/individuals/{}/ancestors'.format(self.children[0].id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(render(expected), response.content)
+
+    def test_descendants(self):
+        individuals = [BasicIndividualAndFamilies(i)
+            for i in [self.grandad] + self.children + list(Individual.objects.filter(first_names='Carl'))]
+        expected = BasicIndividualAndFamiliesSerializer(individuals, many=True).data
+        response = self.client.get('/api/v1/individuals/{}/descendants'.format(self.grandad.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(render(expected), response.content)
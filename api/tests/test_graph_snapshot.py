@@ -0,0 +1,121 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from api.models import Individual, Family, Change
+from api.graph import FamilyGraph, SnapshotGraph, new_graph
+from api import snapshot
+from api.tests.helpers import create_family
+from unittest import mock
+import os
+import tempfile
+
+class GraphSnapshotTests(TestCase):
+
+    def setUp(self):
+        alice = User.objects.create_user('alice', password='test-password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=alice)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'graph.snapshot')
+        self.addCleanup(setattr, snapshot, 'mapped', (None, None))
+
+    def create_tree(self):
+        people = {}
+        for name in ['grandad', 'grandma', 'dad', 'mum', 'me', 'wife', 'sister', 'son']:
+            people[name] = Individual.objects.create(
+                first_names=name, last_name='Ōtaki', birth_date='1 Jan 1900')
+        create_family([people['grandad'], people['grandma']], [people['dad']])
+        create_family([people['dad'], people['mum']], [people['me'], people['sister']])
+        create_family([people['me'], people['wife']], [people['son']])
+        # Married twice.
+        create_family([people['dad']], [])
+        return people
+
+    def test_rows_match_database(self):
+        self.create_tree()
+        snapshot.write_snapshot(self.path)
+        graph = FamilyGraph()
+        graph.load_individuals(Individual.objects.values_list('id', flat=True))
+        graph.load_families(Family.objects.values_list('id', flat=True))
+        mapped = snapshot.GraphSnapshot.open(self.path)
+        for pk, row in graph.individuals.items():
+            self.assertEqual(mapped.individual(pk), row)
+            self.assertEqual(list(mapped.individual(pk)), list(row))
+        for pk, row in graph.families.items():
+            self.assertEqual(mapped.family(pk), row)
+        self.assertIsNone(mapped.individual(0))
+        self.assertIsNone(mapped.family(max(graph.families) + 1))
+
+    def test_empty_and_invalid_files(self):
+        snapshot.write_snapshot(self.path)
+        mapped = snapshot.GraphSnapshot.open(self.path)
+        self.assertIsNone(mapped.individual(1))
+        with open(self.path, 'wb') as f:
+            f.write(b'not a snapshot')
+        self.assertIsNone(snapshot.GraphSnapshot.open(self.path))
+        self.assertIsNone(snapshot.GraphSnapshot.open(self.path + '.missing'))
+
+    def test_endpoints_use_snapshot_while_up_to_date(self):
+        people = self.create_tree()
+        me = people['me']
+        url = '/api/v1/individuals/{}/tree?generations=2'.format(me.id)
+        expected = self.client.get(url).data
+        snapshot.write_snapshot(self.path)
+
+        with override_settings(GRAPH_SNAPSHOT_FILE=self.path), \
+                mock.patch.object(snapshot.writer, 'wake') as wake:
+            self.assertIsInstance(new_graph(), SnapshotGraph)
+            with self.assertNumQueries(1):
+                # Only the check for changes.
+                self.assertEqual(self.client.get(url).data, expected)
+            for path in ['ancestors', 'descendants', 'relationship/{}'.format(people['son'].id)]:
+                url = '/api/v1/individuals/{}/{}'.format(me.id, path)
+                response = self.client.get(url)
+                with override_settings(GRAPH_SNAPSHOT_FILE=None):
+                    self.assertEqual(response.data, self.client.get(url).data)
+            wake.assert_not_called()
+
+            # After a change, the database is read until it's rewritten.
+            me.first_names = 'Me'
+            me.save()
+            self.assertIsInstance(new_graph(), FamilyGraph)
+            self.assertNotIsInstance(new_graph(), SnapshotGraph)
+            wake.assert_called()
+            self.assertTrue(snapshot.update_snapshot(self.path))
+            self.assertFalse(snapshot.update_snapshot(self.path))
+            self.assertIsInstance(new_graph(), SnapshotGraph)
+            response = self.client.get('/api/v1/individuals/{}/tree'.format(me.id))
+            self.assertEqual(response.data['individuals'][me.id]['first_names'], 'Me')
+
+    def test_not_used_with_another_database(self):
+        self.create_tree()
+        snapshot.write_snapshot(self.path)
+        with override_settings(GRAPH_SNAPSHOT_FILE=self.path), \
+                mock.patch.object(snapshot.writer, 'wake') as wake:
+            self.assertIsInstance(new_graph(), SnapshotGraph)
+            # A read replica which is behind the primary is fine.
+            latest_change_id = snapshot.latest_change_id
+            lagging = lambda using=None: latest_change_id(using) - (using is None)
+            with mock.patch.object(snapshot, 'latest_change_id', lagging):
+                self.assertIsInstance(new_graph(), SnapshotGraph)
+            # E.g. a restored database, with another file or fewer changes.
+            with mock.patch.object(snapshot, 'database_id', return_value=12345):
+                self.assertNotIsInstance(new_graph(), SnapshotGraph)
+            Change.objects.filter(id=snapshot.latest_change_id()).delete()
+            self.assertNotIsInstance(new_graph(), SnapshotGraph)
+            wake.assert_called()
+            self.assertTrue(snapshot.update_snapshot(self.path))
+            self.assertIsInstance(new_graph(), SnapshotGraph)
+
+    def test_failed_write_leaves_no_temp_file(self):
+        with mock.patch.object(snapshot.os, 'replace', side_effect=OSError):
+            with self.assertRaises(OSError):
+                snapshot.write_snapshot(self.path)
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), [])
+
+    def test_disabled(self):
+        self.create_tree()
+        with mock.patch.object(snapshot.writer, 'wake') as wake:
+            self.assertNotIsInstance(new_graph(), SnapshotGraph)
+            wake.assert_not_called()
@@ -1,6 +1,9 @@
 from django.test import TestCase
-from api.models import Individual
+from api.models import Individual, Family, Change
+from api.gedcom_import import parse_file, split_records
 from io import StringIO
+import os
+import tempfile
 from django.core.management import call_command
 from django.test import TestCase
 
@@ -38,3 +41,76 @@ class ImportGedcomTest(TestCase):
         mothers_children = mother.children()
         self.assertEquals(len(mothers_spouses), 1)
         self.assertTrue(all(map(lambda c: c in mothers_children, [son1, son2, daughter])))
+
+    def test_parallel_parse(self):
+        path = 'api/tests/family.ged'
+        chunks = list(split_records(path, 100))
+        self.assertGreater(len(chunks), 2)
+        self.assertTrue(all(chunk.startswith(b'0 ') for chunk in chunks))
+        with open(path, 'rb') as f:
+            self.assertEqual(b''.join(chunks), f.read())
+        self.assertEqual(parse_file(path, jobs=2), parse_file(path))
+
+    def test_import_parallel(self):
+        out = StringIO()
+        call_command('importgedcom', 'api/tests/family.ged', '--jobs', '2', stdout=out)
+        self.assertIn('Successfully parsed', out.getvalue())
+        father = Individual.objects.get(last_name = "FamilyName", first_names = "Father Figure")
+        self.assertEqual(len(father.children()), 3)
+
+    def import_text(self, text, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.ged', delete=False) as f:
+            f.write(text)
+        try:
+            out = StringIO()
+            call_command('importgedcom', f.name, '--source', 'family.ged', *args, stdout=out)
+            return out.getvalue()
+        finally:
+            os.remove(f.name)
+
+    def test_update(self):
+        with open('api/tests/family.ged') as f:
+            original = f.read()
+        self.import_text(original)
+        self.assertEqual(Individual.objects.get(gedcom_xref='@I1@').first_names, 'Father Figure')
+        ids = dict(Individual.objects.values_list('gedcom_xref', 'id'))
+
+        # Re-importing the same file changes nothing.
+        seq = Change.objects.latest('id').id
+        out = self.import_text(original, '--update')
+        self.assertIn('Individuals: 0 created, 0 updated, 0 deleted, 7 unchanged', out)
+        self.assertIn('Families: 0 created, 0 updated, 0 deleted, 2 unchanged', out)
+        self.assertFalse(Change.objects.filter(id__gt=seq).exists())
+
+        # A renamed individual, a new child and a deleted child.
+        updated = original.replace('Eldest son', 'Eldest Son').replace(
+            '1 CHIL @I5@\n', '1 CHIL @I8@\n').replace(
+            '0 @I5@ INDI\n1 NAME Daughter', '0 @I8@ INDI\n1 NAME Youngest')
+        out = self.import_text(updated, '--update')
+        self.assertIn('Individuals: 1 created, 1 updated, 1 deleted, 5 unchanged', out)
+        self.assertIn('Families: 0 created, 1 updated, 0 deleted, 1 unchanged', out)
+        son = Individual.objects.get(pk=ids['@I3@'])
+        self.assertEqual(son.first_names, 'Eldest Son')
+        self.assertFalse(Individual.objects.filter(pk=ids['@I5@']).exists())
+        youngest = Individual.objects.get(gedcom_xref='@I8@')
+        self.assertEqual(youngest.first_names, 'Youngest')
+        father = Individual.objects.get(pk=ids['@I1@'])
+        self.assertSetEqual({c.id for c in father.children()}, {ids['@I3@'], ids['@I4@'], youngest.id})
+
+        # Removing the grandparents' family unlinks, rather than deletes, the
+        # father, and a child added since the import.
+        uncle = Individual.objects.create(
+            first_names='Uncle', child_in_family=father.child_in_family)
+        without_family = updated[:updated.index('0 @F2@ FAM')]
+        out = self.import_text(without_family, '--update')
+        self.assertIn('Individuals: 0 created, 1 updated, 0 deleted, 6 unchanged', out)
+        self.assertIn('Families: 0 created, 0 updated, 1 deleted, 1 unchanged', out)
+        father.refresh_from_db()
+        self.assertIsNone(father.child_in_family)
+        uncle.refresh_from_db()
+        self.assertIsNone(uncle.child_in_family)
+        self.assertEqual(Family.objects.count(), 1)
+
+        # Running it again is a no-op.
+        out = self.import_text(without_family, '--update')
+        self.assertIn('Individuals: 0 created, 0 updated, 0 deleted, 7 unchanged', out)
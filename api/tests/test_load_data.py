@@ -0,0 +1,93 @@
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from api.models import Individual, Family, FamilyNameList, Statistic
+from io import StringIO
+import importlib
+import json
+import os
+import tempfile
+
+class LoadDataTest(TestCase):
+    def setUp(self):
+        call_command('importgedcom', 'api/tests/family.ged', stdout=StringIO())
+        self.alice = User.objects.create_user('alice', password='test-password')
+        Individual.objects.filter(first_names='Father Figure').update(owner=self.alice)
+        Family.objects.filter(pk=Family.objects.order_by('id').first().pk).update(owner=self.alice)
+        self.individuals = self.individual_rows()
+        self.families = self.family_rows()
+
+    def individual_rows(self):
+        return {
+            i.id: (i.first_names, i.last_name, i.birth_date, i.death_date, i.child_in_family_id,
+                sorted(f.id for f in i.partner_in_families.all()), i.owner_id)
+            for i in Individual.objects.all()
+        }
+
+    def family_rows(self):
+        return {f[0]: f[1:] for f in Family.objects.values_list('id', 'name', 'owner_id')}
+
+    def round_trip(self, *args):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dump.json')
+            call_command('dump-data', path, *args, stdout=StringIO())
+            Family.objects.all().delete()
+            Individual.objects.all().delete()
+            FamilyNameList.objects.all().delete()
+            out = StringIO()
+            call_command('load-data', path, stdout=out)
+        self.assertIn('Loaded {} individuals'.format(len(self.individuals)), out.getvalue())
+
+        self.assertEqual(self.individual_rows(), self.individuals)
+        self.assertEqual(self.family_rows(), self.families)
+        self.assertEqual(Individual.objects.filter(owner=self.alice).count(), 1)
+        self.assertEqual(Family.objects.filter(owner=self.alice).count(), 1)
+
+        father = Individual.objects.get(last_name="FamilyName", first_names="Father Figure")
+        self.assertEqual(len(father.children()), 3)
+        self.assertIn(father, Individual.phonetic_matches('familyname'))
+        self.assertTrue(FamilyNameList.search('FamilyName'))
+        self.assertEqual(Statistic.objects.get(kind=Statistic.TOTAL, key=Statistic.INDIVIDUALS).value,
+            len(self.individuals))
+
+        # New records get ids after the loaded ones.
+        individual = Individual.objects.create(first_names='New')
+        self.assertGreater(individual.id, max(self.individuals))
+
+    def test_load_json(self):
+        self.round_trip()
+
+    def test_load_ndjson(self):
+        self.round_trip('--ndjson')
+
+    def test_unknown_owners_dropped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dump.json')
+            call_command('dump-data', path, stdout=StringIO())
+            Family.objects.all().delete()
+            Individual.objects.all().delete()
+            self.alice.delete()
+            out = StringIO()
+            call_command('load-data', path, stdout=out)
+        self.assertIn('Dropped 2 owners', out.getvalue())
+        self.assertFalse(Individual.objects.exclude(owner=None).exists())
+        self.assertFalse(Family.objects.exclude(owner=None).exists())
+
+    def test_refuses_non_empty_database(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dump.json')
+            call_command('dump-data', path, stdout=StringIO())
+            with self.assertRaises(CommandError):
+                call_command('load-data', path, stdout=StringIO())
+
+    def test_reader_small_chunks(self):
+        load_data = importlib.import_module('api.management.commands.load-data')
+        data = {'individuals': {'1': {'note': 'x' * 50, 'spouse_in_family': ['12345']}},
+            'families': {'12345': {'married': {'date': None}}}}
+        reader = load_data.JSONReader(StringIO(json.dumps(data, indent=2)), chunk_size=7)
+        self.assertEqual(list(load_data.json_records(StringIO(json.dumps(data)))), [
+            ('individual', 1, data['individuals']['1']),
+            ('family', 12345, data['families']['12345']),
+        ])
+        self.assertEqual([(key, reader.value()) for key in reader.members()], list(data.items()))
@@ -0,0 +1,118 @@
+from datetime import timedelta
+from smtplib import SMTPException
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.signals import request_started
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User, Group
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api.models import OutgoingEmail
+from api.mail import (
+    MAX_ATTEMPTS, queue_mail, send_queued_mail, start_worker_on_first_request, worker
+)
+from unittest import mock
+
+class CountingBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise SMTPException('Mail server is down')
+
+class OutboxTests(TestCase):
+
+    def test_create_account_queues_mail(self):
+        alice = User.objects.create_user('alice', password='test-password')
+        alice.groups.add(Group.objects.get(name='editors'))
+        client = APIClient()
+        client.force_authenticate(user=alice)
+        response = client.post('/api/v1/create-account/', data={
+            'username': 'bob',
+            'email': 'bob@example.com',
+            'first_name': 'Bob',
+            'last_name': 'Brown',
+        })
+        self.assertEqual(response.status_code, 201)
+
+        # Nothing is sent during the request.
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutgoingEmail.objects.count(), 2)
+
+        self.assertEqual(send_queued_mail(), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertListEqual(mail.outbox[0].to, ['bob@example.com'])
+        self.assertIn('confirm-account', mail.outbox[0].body)
+        self.assertFalse(OutgoingEmail.objects.filter(sent__isnull=True).exists())
+
+        # Sent mail isn't sent again.
+        self.assertEqual(send_queued_mail(), (0, 0))
+
+    @override_settings(EMAIL_BACKEND='api.tests.test_mail.CountingBackend')
+    def test_one_connection_per_batch(self):
+        for i in range(5):
+            queue_mail('Subject {}'.format(i), 'Body', ['user{}@example.com'.format(i)])
+        CountingBackend.opened = 0
+        self.assertEqual(send_queued_mail(), (5, 0))
+        self.assertEqual(CountingBackend.opened, 1)
+
+    def test_retries_with_backoff(self):
+        email = queue_mail('Subject', 'Body', ['bob@example.com'])
+        with override_settings(EMAIL_BACKEND='api.tests.test_mail.FailingBackend'):
+            self.assertEqual(send_queued_mail(), (0, 1))
+            email.refresh_from_db()
+            self.assertEqual(email.attempts, 1)
+            self.assertEqual(email.last_error, 'Mail server is down')
+            self.assertGreater(email.next_attempt, timezone.now())
+            first_delay = email.next_attempt - timezone.now()
+
+            # Not due yet.
+            self.assertEqual(send_queued_mail(), (0, 0))
+
+            OutgoingEmail.objects.update(next_attempt=timezone.now())
+            self.assertEqual(send_queued_mail(), (0, 1))
+            email.refresh_from_db()
+            self.assertGreater(email.next_attempt - timezone.now(), first_delay)
+
+            # Give up after too many attempts.
+            with self.assertLogs('api.mail', level='ERROR'):
+                for _ in range(MAX_ATTEMPTS - 2):
+                    OutgoingEmail.objects.update(next_attempt=timezone.now())
+                    send_queued_mail()
+            email.refresh_from_db()
+            self.assertEqual(email.attempts, MAX_ATTEMPTS)
+            self.assertIsNone(email.next_attempt)
+            self.assertIsNone(email.sent)
+
+        # The server came back; a retry which is due is sent.
+        email = queue_mail('Subject 2', 'Body', ['bob@example.com'])
+        self.assertEqual(send_queued_mail(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    @override_settings(EMAIL_OUTBOX_WORKER=True)
+    def test_wakes_worker_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            queue_mail('Subject', 'Body', ['bob@example.com'])
+        self.assertListEqual(callbacks, [worker.wake])
+
+    @override_settings(EMAIL_OUTBOX_WORKER=True)
+    def test_wakes_worker_on_first_request(self):
+        self.addCleanup(request_started.disconnect, dispatch_uid='outbox-first-request')
+        start_worker_on_first_request()
+        with mock.patch.object(worker, 'wake') as wake:
+            self.client.get('/api/v1/ping/')
+            self.client.get('/api/v1/ping/')
+        wake.assert_called_once_with()
+
+    def test_claimed_mail_not_sent_twice(self):
+        email = queue_mail('Subject', 'Body', ['bob@example.com'])
+        # Another sender has claimed it.
+        OutgoingEmail.objects.filter(pk=email.pk).update(
+            next_attempt=timezone.now() + timedelta(minutes=10))
+        self.assertEqual(send_queued_mail(), (0, 0))
+        self.assertEqual(len(mail.outbox), 0)
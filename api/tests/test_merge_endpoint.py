@@ -0,0 +1,109 @@
+from django.test import TestCase
+from django.contrib.auth.models import User, Group
+from rest_framework.test import APIClient
+from api.models import Individual, AncestryClosure, Change, FamilyNameList
+from api.tests.helpers import create_family
+
+class MergeEndpointTests(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='test-password')
+        self.alice.groups.add(Group.objects.get(name='editors'))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.alice)
+
+    def person(self, first_names, last_name='Baker', **kwargs):
+        return Individual.objects.create(first_names=first_names,
+            last_name=last_name, owner=self.alice, **kwargs)
+
+    def merge(self, *pairs):
+        return self.client.post('/api/v1/individuals/merge/', {
+            'merges': [{'keep': keep.id, 'duplicate': duplicate.id} for keep, duplicate in pairs],
+        }, format='json')
+
+    def test_merge(self):
+        # The same Bob, from two imports; one has his parents, the other
+        # his birth date.
+        bob = self.person('Bob', sex='M')
+        mary = self.person('Mary', 'Aitken', sex='F')
+        kid = self.person('Carl')
+        first_family = create_family([bob, mary], [kid])
+
+        grandpa = self.person('Grandpa')
+        bob2 = self.person('Bob', sex='M', birth_date='1950', occupation='Baker')
+        jane = self.person('Jane', 'Jones', sex='F')
+        kid2 = self.person('Dora')
+        create_family([grandpa], [bob2])
+        second_family = create_family([bob2, jane], [kid2])
+        seq = Change.objects.latest('id').id
+
+        response = self.merge((bob, bob2))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['merged'], 1)
+
+        self.assertFalse(Individual.objects.filter(pk=bob2.id).exists())
+        bob.refresh_from_db()
+        self.assertEqual(bob.birth_date, '1950')
+        self.assertEqual(bob.occupation, 'Baker')
+        self.assertEqual(bob.child_in_family, bob2.child_in_family)
+        self.assertSetEqual({first_family, second_family}, set(bob.partner_in_families.all()))
+        second_family.refresh_from_db()
+        self.assertEqual(second_family.name, 'Baker, Bob (1950-?) & Jones, Jane')
+        self.assertSetEqual({second_family}, set(FamilyNameList.search('Bob Jones')))
+
+        # Both sets of children now descend from Bob's father.
+        self.assertSetEqual({bob.id, kid.id, kid2.id},
+            set(AncestryClosure.descendant_ids(grandpa.id)))
+        self.assertFalse(AncestryClosure.objects.filter(descendant_id=bob2.id).exists())
+
+        changes = Change.objects.filter(id__gt=seq)
+        self.assertIn(bob.id, changes.filter(
+            entity=Change.INDIVIDUAL, op=Change.SAVE).values_list('entity_id', flat=True))
+        self.assertIn(bob2.id, changes.filter(
+            entity=Change.INDIVIDUAL, op=Change.DELETE).values_list('entity_id', flat=True))
+        self.assertIn(second_family.id, changes.filter(
+            entity=Change.FAMILY).values_list('entity_id', flat=True))
+
+    def test_many_merges_and_shared_family(self):
+        bob = self.person('Bob', sex='M')
+        bob2 = self.person('Bob', sex='M')
+        mary = self.person('Mary', sex='F')
+        mary2 = self.person('Mary', sex='F', death_date='2001')
+        # An import which linked both copies of Bob to the same family.
+        family = create_family([bob, bob2, mary2], [])
+
+        response = self.merge((bob, bob2), (mary, mary2))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['merged'], 2)
+        self.assertListEqual(sorted(family.partners.values_list('id', flat=True)),
+            [bob.id, mary.id])
+        family.refresh_from_db()
+        self.assertEqual(family.name, 'Baker, Bob & Baker, Mary (?-2001)')
+        self.assertEqual(Individual.objects.count(), 2)
+
+    def test_invalid(self):
+        dad = self.person('Dad')
+        kid = self.person('Kid')
+        create_family([dad], [kid])
+        other = self.person('Other')
+        for pairs in [
+            [(dad, dad)],
+            [(dad, kid)],
+            [(dad, other), (other, kid)],
+            [(dad, other), (kid, other)],
+        ]:
+            response = self.merge(*pairs)
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(response.data['ok'])
+        response = self.client.post('/api/v1/individuals/merge/', {
+            'merges': [{'keep': dad.id, 'duplicate': 12345}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Individual.objects.count(), 3)
+
+    def test_not_owner(self):
+        bob = self.person('Bob')
+        bob2 = Individual.objects.create(first_names='Bob', last_name='Baker')
+        response = self.merge((bob, bob2))
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(Individual.objects.filter(pk=bob2.id).exists())
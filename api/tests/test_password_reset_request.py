@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.utils import timezone
+from io import StringIO
+from api.models import PasswordResetRequest
+
+def create_expired(user, count):
+    PasswordResetRequest.objects.bulk_create([
+        PasswordResetRequest(user=user, token='expired{}'.format(i),
+            expires=timezone.now() - timedelta(days=1))
+        for i in range(count)
+    ])
+
+class PasswordResetRequestTests(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='test-password')
+
+    def test_find(self):
+        reset_request = PasswordResetRequest.create(self.alice)
+        create_expired(self.alice, 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(PasswordResetRequest.find(reset_request.token), reset_request)
+        self.assertEqual(len(queries), 1)
+        self.assertIsNone(PasswordResetRequest.find('expired0'))
+        self.assertIsNone(PasswordResetRequest.find('not-a-token'))
+
+    def test_purge_expired(self):
+        reset_request = PasswordResetRequest.create(self.alice)
+        create_expired(self.alice, 25)
+        self.assertEqual(PasswordResetRequest.purge_expired(batch_size=10, max_batches=2), 20)
+        self.assertEqual(PasswordResetRequest.purge_expired(batch_size=10), 5)
+        self.assertListEqual(list(PasswordResetRequest.objects.all()), [reset_request])
+
+    def test_create_cleans_up(self):
+        create_expired(self.alice, PasswordResetRequest.CLEANUP_BATCH_SIZE + 10)
+        PasswordResetRequest.create(self.alice)
+        self.assertEqual(PasswordResetRequest.objects.filter(
+            expires__lte=timezone.now()).count(), 10)
+
+    def test_command(self):
+        create_expired(self.alice, 3)
+        out = StringIO()
+        call_command('purge-password-resets', stdout=out)
+        self.assertIn('Deleted 3 expired requests', out.getvalue())
+        self.assertFalse(PasswordResetRequest.objects.exists())
@@ -0,0 +1,75 @@
+from django.test import TestCase
+from django.contrib.auth.models import User, Group
+from rest_framework.test import APIClient
+from api.models import Individual
+from api.phonetic import levenshtein, soundex
+
+class PhoneticTests(TestCase):
+    def test_soundex(self):
+        self.assertEqual(soundex('Robert'), 'R163')
+        self.assertEqual(soundex('Rupert'), 'R163')
+        self.assertEqual(soundex('Rubin'), 'R150')
+        self.assertEqual(soundex('Ashcraft'), 'A261')
+        self.assertEqual(soundex('Tymczak'), 'T522')
+        self.assertEqual(soundex('Pfister'), 'P236')
+        self.assertEqual(soundex('Macdonald'), soundex('McDonald'))
+        self.assertEqual(soundex('Mac Donald'), soundex('McDonald'))
+        self.assertEqual(soundex('Smyth'), soundex('Smith'))
+        self.assertEqual(soundex('Zoë'), 'Z000')
+        self.assertEqual(soundex(''), '')
+
+    def test_levenshtein(self):
+        self.assertEqual(levenshtein('kitten', 'sitting'), 3)
+        self.assertEqual(levenshtein('', 'abc'), 3)
+        self.assertEqual(levenshtein('smith', 'smith'), 0)
+
+class PhoneticSearchTests(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='test-password')
+        self.alice.groups.add(Group.objects.get(name='editors'))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.alice)
+
+    def search(self, pattern):
+        response = self.client.get(
+            '/api/v1/search-individuals/{}?mode=phonetic'.format(pattern))
+        self.assertEqual(response.status_code, 200)
+        return [(i['first_names'], i['last_name']) for i in response.data]
+
+    def test_search(self):
+        Individual.objects.create(first_names='John Paul', last_name='Smith')
+        Individual.objects.create(first_names='Jon', last_name='Smyth')
+        Individual.objects.create(first_names='Mary', last_name='McDonald')
+        Individual.objects.create(first_names='Jane', last_name='Jones')
+
+        self.assertListEqual(self.search('Macdonald'), [('Mary', 'McDonald')])
+        self.assertListEqual(self.search('smyth'), [('Jon', 'Smyth'), ('John Paul', 'Smith')])
+        self.assertListEqual(self.search('jon smith'), [('John Paul', 'Smith'), ('Jon', 'Smyth')])
+        self.assertListEqual(self.search('mary smith'), [])
+        self.assertListEqual(self.search('42'), [])
+
+        # The default mode is unchanged.
+        response = self.client.get('/api/v1/search-individuals/Macdonald')
+        self.assertListEqual(response.data, [])
+
+    def test_keys_maintained(self):
+        bob = Individual.objects.create(first_names='Robert James', last_name='Ashcraft',
+            owner=self.alice)
+        self.assertEqual((bob.first_name_soundex, bob.last_name_soundex), ('R163', 'A261'))
+        bob.last_name = 'Tymczak'
+        bob.save(update_fields=['last_name'])
+        bob.refresh_from_db()
+        self.assertEqual(bob.last_name_soundex, 'T522')
+
+        response = self.client.post('/api/v1/bulk/', {
+            'individuals': [
+                {'temp_id': 'new', 'first_names': 'Mary', 'last_name': 'McDonald'},
+                {'id': bob.id, 'last_name': 'Smyth'},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        bob.refresh_from_db()
+        self.assertEqual(bob.last_name_soundex, soundex('Smith'))
+        mary = Individual.objects.get(pk=response.data['individuals']['new'])
+        self.assertEqual(mary.last_name_soundex, soundex('Macdonald'))
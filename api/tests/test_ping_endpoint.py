@@ -1,7 +1,9 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User, Group
 from rest_framework.test import APIClient
 from api.models import Individual, Family
+from api import warmup
+from unittest import mock
 
 class PingTest(TestCase):
 
@@ -13,3 +15,23 @@ class PingTest(TestCase):
         response = client.get('/api/v1/ping/')
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data.get('pong'), True)
+
+    def test_ping_warms_up(self):
+        client = APIClient()
+        with mock.patch.object(warmup.worker, 'start') as start:
+            client.get('/api/v1/ping/')
+            start.assert_not_called()
+            with override_settings(WARM_UP_ON_PING=True):
+                response = client.get('/api/v1/ping/')
+            self.assertEqual(response.status_code, 200)
+            start.assert_called_once_with()
+
+    def test_warm_up(self):
+        # Runs on an empty database, and on one with a family in it.
+        warmup.warm_up()
+        father = Individual.objects.create(first_names='John', last_name='Smith')
+        mother = Individual.objects.create(first_names='Jane', last_name='Smith')
+        family = Family.objects.create()
+        family.partners.add(father, mother)
+        Individual.objects.create(first_names='Sam', last_name='Smith', child_in_family=family)
+        warmup.warm_up()
@@ -0,0 +1,129 @@
+from django.apps import apps
+from django.test import TestCase
+from django.contrib.auth.models import User, Group
+from rest_framework.test import APIClient
+from api.models import Individual, Family, Place, PlaceEvent, normalize_location
+import importlib
+
+class PlaceTests(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='test-password')
+        self.alice.groups.add(Group.objects.get(name='editors'))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.alice)
+
+    def events(self, **kwargs):
+        return sorted(PlaceEvent.objects.filter(**kwargs).values_list('event', 'place__name'))
+
+    def test_normalize_location(self):
+        self.assertEqual(normalize_location(' Dunedin ,Otago,,  New   Zealand '),
+            'Dunedin, Otago, New Zealand')
+        self.assertEqual(normalize_location(' , '), '')
+
+    def test_components(self):
+        bob = Individual.objects.create(first_names='Bob',
+            birth_location='Dunedin, Otago, New Zealand', death_location='Bristol, England',
+            buried_location='Bristol')
+        self.assertListEqual(self.events(individual=bob), [
+            ('birth', 'Dunedin, Otago, New Zealand'),
+            ('buried', 'Bristol'),
+            ('death', 'Bristol, England'),
+        ])
+        dunedin = Place.objects.get(name='Dunedin, Otago, New Zealand')
+        self.assertListEqual([dunedin.town, dunedin.region, dunedin.country],
+            ['Dunedin', 'Otago', 'New Zealand'])
+        bristol = Place.objects.get(name='Bristol, England')
+        self.assertListEqual([bristol.town, bristol.region, bristol.country],
+            ['Bristol', '', 'England'])
+
+    def test_deduplicated(self):
+        Individual.objects.create(birth_location='Dunedin, New Zealand')
+        Individual.objects.create(birth_location='dunedin,new zealand ')
+        family = Family.objects.create(married_location='Dunedin,  New Zealand')
+        self.assertEqual(Place.objects.count(), 1)
+        self.assertListEqual(self.events(family=family), [('married', 'Dunedin, New Zealand')])
+
+    def test_updated_on_save(self):
+        bob = Individual.objects.create(first_names='Bob', birth_location='Dunedin')
+        bob.birth_location = 'Mosgiel'
+        bob.death_location = 'Dunedin'
+        bob.save()
+        self.assertListEqual(self.events(individual=bob),
+            [('birth', 'Mosgiel'), ('death', 'Dunedin')])
+        bob = Individual.objects.get(pk=bob.id)
+        bob.death_location = ''
+        bob.save()
+        self.assertListEqual(self.events(individual=bob), [('birth', 'Mosgiel')])
+        bob.delete()
+        self.assertFalse(PlaceEvent.objects.exists())
+
+    def test_bulk(self):
+        response = self.client.post('/api/v1/bulk/', {
+            'individuals': [
+                {'temp_id': 'bob', 'first_names': 'Bob', 'birth_location': 'Dunedin'},
+            ],
+            'families': [
+                {'temp_id': 'family', 'partners': ['bob'], 'married_location': 'Mosgiel'},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertListEqual(self.events(individual=response.data['individuals']['bob']),
+            [('birth', 'Dunedin')])
+        self.assertListEqual(self.events(family=response.data['families']['family']),
+            [('married', 'Mosgiel')])
+
+    def test_rebuild(self):
+        bob = Individual.objects.create(first_names='Bob', birth_location='Dunedin')
+        Individual.objects.filter(pk=bob.id).update(birth_location='Mosgiel')
+        PlaceEvent.rebuild()
+        self.assertListEqual(self.events(individual=bob), [('birth', 'Mosgiel')])
+        self.assertListEqual(list(Place.objects.values_list('name', flat=True)), ['Mosgiel'])
+
+    def test_migration_fills_tables(self):
+        Individual.objects.create(birth_location='Dunedin, Otago, New Zealand',
+            death_location='Bristol, England')
+        Family.objects.create(married_location='dunedin, otago,new zealand')
+        places = set(Place.objects.values_list('name', 'key', 'town', 'region', 'country'))
+        events = self.events()
+        self.assertEqual(len(events), 3)
+        PlaceEvent.objects.all().delete()
+        Place.objects.all().delete()
+        migration = importlib.import_module('api.migrations.0026_place')
+        migration.build_places(apps, None)
+        self.assertSetEqual(
+            set(Place.objects.values_list('name', 'key', 'town', 'region', 'country')), places)
+        self.assertListEqual(self.events(), events)
+
+    def test_search_and_events(self):
+        bob = Individual.objects.create(first_names='Bob', birth_location='Dunedin, Otago, New Zealand')
+        jane = Individual.objects.create(first_names='Jane', birth_location='Mosgiel, Otago, New Zealand',
+            death_location='Dunedin, Otago, New Zealand')
+        Individual.objects.create(first_names='Tom', birth_location='Otago Peninsula')
+
+        response = self.client.get('/api/v1/places/search/otago')
+        self.assertEqual(response.status_code, 200)
+        self.assertListEqual([p['name'] for p in response.data], [
+            'Dunedin, Otago, New Zealand',
+            'Mosgiel, Otago, New Zealand',
+            'Otago Peninsula',
+        ])
+
+        dunedin = Place.objects.get(town='Dunedin')
+        response = self.client.get('/api/v1/places/{}/events?event=birth'.format(dunedin.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['place']['name'], 'Dunedin, Otago, New Zealand')
+        self.assertListEqual([i['id'] for i in response.data['individuals']], [bob.id])
+
+        # Places within a region include its towns.
+        otago = Place.objects.create(name='Otago, New Zealand', key='otago, new zealand',
+            town='Otago', country='New Zealand')
+        response = self.client.get('/api/v1/places/{}/events'.format(otago.id))
+        self.assertListEqual(sorted(e['event'] for e in response.data['events']),
+            ['birth', 'birth', 'death'])
+        self.assertListEqual([i['id'] for i in response.data['individuals']], [bob.id, jane.id])
+
+        response = self.client.get('/api/v1/places/{}/events?event=party'.format(otago.id))
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/v1/places/12345/events')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,91 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from api.models import Individual
+from api.relationships import relationship_name
+from api import relationships
+from api.tests.helpers import create_family
+
+class RelationshipNameTests(TestCase):
+    def test_names(self):
+        self.assertEqual(relationship_name(0, 0, 'M'), 'self')
+        self.assertEqual(relationship_name(0, 1, 'F'), 'mother')
+        self.assertEqual(relationship_name(0, 2, 'M'), 'grandfather')
+        self.assertEqual(relationship_name(0, 4, '?'), 'great-great-grandparent')
+        self.assertEqual(relationship_name(0, 6, 'M'), '4x great-grandfather')
+        self.assertEqual(relationship_name(1, 0, 'M'), 'son')
+        self.assertEqual(relationship_name(3, 0, 'F'), 'great-granddaughter')
+        self.assertEqual(relationship_name(1, 1, 'F'), 'sister')
+        self.assertEqual(relationship_name(1, 1, 'M', half=True), 'half-brother')
+        self.assertEqual(relationship_name(1, 2, 'F'), 'aunt')
+        self.assertEqual(relationship_name(1, 3, 'M'), 'great-uncle')
+        self.assertEqual(relationship_name(2, 1, 'F'), 'niece')
+        self.assertEqual(relationship_name(2, 2, 'M'), 'first cousin')
+        self.assertEqual(relationship_name(3, 4, 'M'), 'second cousin once removed')
+        self.assertEqual(relationship_name(5, 3, 'M'), 'second cousin twice removed')
+        self.assertEqual(relationship_name(2, 6, 'M'), 'first cousin 4 times removed')
+
+class RelationshipEndpointTests(TestCase):
+
+    def setUp(self):
+        alice = User.objects.create_user('alice', password='test-password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=alice)
+
+        self.people = {}
+        for name, sex in [('grandad', 'M'), ('grandma', 'F'), ('dad', 'M'), ('mum', 'F'),
+                ('uncle', 'M'), ('aunt', 'F'), ('me', 'F'), ('brother', 'M'),
+                ('cousin', 'M'), ('cousins_son', 'M'), ('stepmum', 'F'),
+                ('half_sister', 'F'), ('stranger', '?')]:
+            self.people[name] = Individual.objects.create(first_names=name, sex=sex)
+        p = self.people
+        create_family([p['grandad'], p['grandma']], [p['dad'], p['uncle']])
+        create_family([p['dad'], p['mum']], [p['me'], p['brother']])
+        create_family([p['uncle'], p['aunt']], [p['cousin']])
+        create_family([p['cousin']], [p['cousins_son']])
+        create_family([p['dad'], p['stepmum']], [p['half_sister']])
+
+    def relationship(self, a, b):
+        url = '/api/v1/individuals/{}/relationship/{}'.format(
+            self.people[a].id, self.people[b].id)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_relationships(self):
+        self.assertEqual(self.relationship('me', 'brother')['relationship'], 'sister')
+        self.assertEqual(self.relationship('me', 'half_sister')['relationship'], 'half-sister')
+        self.assertEqual(self.relationship('grandma', 'me')['relationship'], 'grandmother')
+        self.assertEqual(self.relationship('me', 'grandad')['relationship'], 'granddaughter')
+        self.assertEqual(self.relationship('uncle', 'brother')['relationship'], 'uncle')
+        self.assertEqual(self.relationship('me', 'cousin')['relationship'], 'first cousin')
+        self.assertEqual(self.relationship('cousins_son', 'me')['relationship'],
+            'first cousin once removed')
+        self.assertEqual(self.relationship('dad', 'mum')['relationship'], 'husband')
+        self.assertIsNone(self.relationship('me', 'stranger')['relationship'])
+
+    def test_path(self):
+        p = self.people
+        data = self.relationship('me', 'cousins_son')
+        self.assertListEqual(data['generations'], [2, 3])
+        self.assertListEqual(data['common_ancestors'], sorted([p['grandad'].id, p['grandma'].id]))
+        ancestor = data['common_ancestors'][0]
+        self.assertListEqual(data['path'], [p['me'].id, p['dad'].id, ancestor,
+            p['uncle'].id, p['cousin'].id, p['cousins_son'].id])
+        self.assertSetEqual(set(data['individuals'].keys()),
+            set(data['path']) | set(data['common_ancestors']))
+        self.assertFalse(data['truncated'])
+
+    def test_frontier_cap(self):
+        old_cap = relationships.MAX_GENERATIONS
+        relationships.MAX_GENERATIONS = 1
+        try:
+            data = self.relationship('me', 'cousin')
+        finally:
+            relationships.MAX_GENERATIONS = old_cap
+        self.assertIsNone(data['relationship'])
+        self.assertTrue(data['truncated'])
+
+    def test_missing(self):
+        url = '/api/v1/individuals/{}/relationship/1234'.format(self.people['me'].id)
+        self.assertEqual(self.client.get(url).status_code, 404)
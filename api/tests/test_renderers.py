@@ -0,0 +1,73 @@
+import datetime
+import decimal
+import gzip
+import json
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from api.models import Individual
+from api import renderers
+
+class EncodeJsonTests(TestCase):
+
+    def test_matches_drf(self):
+        data = {
+            'id': 1,
+            'name': 'Zoë   O\'Keefe "quoted"',
+            'float': 1.5,
+            'none': None,
+            'list': [1, 'two', {'three': [True, False]}],
+            'date': datetime.date(2019, 10, 5),
+            'datetime': datetime.datetime(2019, 10, 5, 1, 2, 3, tzinfo=datetime.timezone.utc),
+            'decimal': decimal.Decimal('1.25'),
+        }
+        self.assertEqual(JSONRenderer().render(data), renderers.encode_json(data))
+
+    def test_integer_keys(self):
+        # The graph payloads are keyed by integer ids.
+        data = {'individuals': {1: {'id': 1}, 2: {'id': 2}}}
+        self.assertEqual(JSONRenderer().render(data), renderers.encode_json(data))
+
+class CompressionTests(TestCase):
+
+    def setUp(self):
+        alice = User.objects.create_user('alice', password='test-password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=alice)
+        for i in range(50):
+            Individual.objects.create(first_names='Person {}'.format(i), last_name='Smith')
+
+    def test_accepted_encodings(self):
+        request = type('Request', (), {'META': {
+            'HTTP_ACCEPT_ENCODING': 'gzip;q=1.0, br;q=0, deflate, identity;q=0.5'
+        }})
+        self.assertSetEqual({'gzip', 'deflate', 'identity'},
+            renderers.accepted_encodings(request))
+
+    def test_gzip(self):
+        response = self.client.get('/api/v1/individuals/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        uncompressed = response.content
+
+        response = self.client.get('/api/v1/individuals/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), uncompressed)
+        self.assertEqual(len(json.loads(uncompressed)), 50)
+
+    def test_brotli(self):
+        if renderers.brotli is None:
+            self.skipTest('brotli not installed')
+        response = self.client.get('/api/v1/individuals/')
+        uncompressed = response.content
+        response = self.client.get('/api/v1/individuals/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(renderers.brotli.decompress(response.content), uncompressed)
+
+    def test_small_responses_uncompressed(self):
+        response = self.client.get('/api/v1/ping/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
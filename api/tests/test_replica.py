@@ -0,0 +1,142 @@
+from django.db import connections, router
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.contrib.auth.models import User, Group
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from api.models import Individual
+from api import replica
+from unittest import mock
+import os
+import sqlite3
+import tempfile
+import time
+
+class RefreshReplicaTest(TestCase):
+    def test_refresh_copies_database(self):
+        with tempfile.TemporaryDirectory() as directory:
+            primary = os.path.join(directory, 'primary.sqlite3')
+            copy = os.path.join(directory, 'replica.sqlite3')
+            db = sqlite3.connect(primary)
+            db.execute('create table t (x integer)')
+            db.execute('insert into t values (1)')
+            db.commit()
+            self.assertIsNone(replica.refreshed_at(copy))
+
+            started = replica.refresh_replica(primary, copy)
+            self.assertEqual(replica.refreshed_at(copy), started)
+            db.execute('insert into t values (2)')
+            db.commit()
+            # A reader of the copy doesn't see later writes until a refresh,
+            # and keeps its copy while it's replaced.
+            reader = sqlite3.connect(copy)
+            self.assertEqual(reader.execute('select count(*) from t').fetchone(), (1,))
+            replica.refresh_replica(primary, copy)
+            self.assertEqual(reader.execute('select count(*) from t').fetchone(), (1,))
+            reader.close()
+            reader = sqlite3.connect(copy)
+            self.assertEqual(reader.execute('select count(*) from t').fetchone(), (2,))
+            reader.close()
+            db.close()
+            self.assertEqual(sorted(os.listdir(directory)), ['primary.sqlite3', 'replica.sqlite3'])
+
+@override_settings(USE_READ_REPLICA=True)
+class ReplicaRouterTest(TestCase):
+
+    def setUp(self):
+        # In tests the replica is the test database; use the same connection,
+        # so it sees the test's uncommitted data.
+        self.addCleanup(connections.__setitem__, 'replica', connections['replica'])
+        connections['replica'] = connections['default']
+        self.alice = User.objects.create_user('alice', password='test-password')
+        self.alice.groups.add(Group.objects.get(name='editors'))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.alice)
+        self.individual = Individual.objects.create(first_names='Me', owner=self.alice)
+        refreshed = mock.patch.object(replica, 'refreshed_at', return_value=time.time())
+        self.refreshed_at = refreshed.start()
+        self.addCleanup(refreshed.stop)
+
+    def db_for_read(self, method, path, user=None):
+        request = RequestFactory().generic(method, path)
+        if user:
+            request.user = user
+        token = replica.current_request.set(request)
+        try:
+            return router.db_for_read(Individual), router.db_for_read(User)
+        finally:
+            replica.current_request.reset(token)
+
+    def test_routing(self):
+        self.assertEqual(self.db_for_read('GET', '/api/v1/individuals/'), ('replica', 'default'))
+        self.assertEqual(self.db_for_read('HEAD', '/api/v1/individuals/'), ('replica', 'default'))
+        self.assertEqual(self.db_for_read('POST', '/api/v1/individuals/'), ('default', 'default'))
+        self.assertEqual(self.db_for_read('GET', '/admin/'), ('default', 'default'))
+        # Outside requests, e.g. management commands.
+        self.assertEqual(router.db_for_read(Individual), 'default')
+        self.assertEqual(router.db_for_write(Individual,
+            instance=Individual.objects.using('replica').get(pk=self.individual.pk)), 'default')
+        with override_settings(USE_READ_REPLICA=False):
+            self.assertEqual(self.db_for_read('GET', '/api/v1/individuals/'), ('default', 'default'))
+        # There's no replica yet.
+        self.refreshed_at.return_value = None
+        self.assertEqual(self.db_for_read('GET', '/api/v1/individuals/'), ('default', 'default'))
+
+    def routed_reads(self, client, url, **extra):
+        """ The response to a GET, and the (model, alias) of its reads. """
+        routed = []
+        db_for_read = replica.ReplicaRouter.db_for_read
+        def recording_db_for_read(self, model, **hints):
+            alias = db_for_read(self, model, **hints)
+            routed.append((model, alias))
+            return alias
+        with mock.patch.object(replica.ReplicaRouter, 'db_for_read', recording_db_for_read):
+            response = client.get(url, **extra)
+        return response, routed
+
+    def test_reads_use_replica(self):
+        url = '/api/v1/individuals/{}/'.format(self.individual.id)
+        response, routed = self.routed_reads(self.client, url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['first_names'], 'Me')
+        self.assertIn((Individual, 'replica'), routed)
+
+        # The request is over.
+        self.assertIsNone(replica.current_request.get())
+        self.assertEqual(Individual.objects.get(pk=self.individual.pk)._state.db, 'default')
+
+    def test_reads_own_writes(self):
+        bob = User.objects.create_user('bob', password='test-password')
+        self.assertEqual(self.db_for_read('GET', '/api/v1/', self.alice)[0], 'replica')
+
+        url = '/api/v1/individuals/{}/'.format(self.individual.id)
+        response = self.client.patch(url, {'first_names': 'Changed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        # Until the replica is refreshed, alice reads from the primary.
+        self.assertEqual(self.db_for_read('GET', '/api/v1/', self.alice)[0], 'default')
+        self.assertEqual(self.db_for_read('GET', '/api/v1/', bob)[0], 'replica')
+        self.refreshed_at.return_value = time.time() + 1
+        self.assertEqual(self.db_for_read('GET', '/api/v1/', self.alice)[0], 'replica')
+
+        # Failed writes don't count.
+        self.client.force_authenticate(user=bob)
+        response = self.client.patch(url, {'first_names': 'Changed'}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.db_for_read('GET', '/api/v1/', bob)[0], 'replica')
+
+    @override_settings(ROOT_URLCONF='familyapi.asgi_urls')
+    def test_async_views_read_own_writes(self):
+        token = Token.objects.create(user=self.alice)
+        client = Client(HTTP_AUTHORIZATION='Token ' + token.key)
+        url = '/api/v1/individuals/{}/tree'.format(self.individual.id)
+        response, routed = self.routed_reads(client, url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn((Individual, 'replica'), routed)
+
+        response = self.client.patch('/api/v1/individuals/{}/'.format(self.individual.id),
+            {'first_names': 'Changed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response, routed = self.routed_reads(client, url)
+        self.assertEqual(response.status_code, 200)
+        # The primary.
+        self.assertIn((Individual, None), routed)
+        self.assertNotIn((Individual, 'replica'), routed)
@@ -0,0 +1,111 @@
+from django.apps import apps
+from django.test import TestCase
+from django.contrib.auth.models import User, Group
+from rest_framework.test import APIClient
+from api.models import Individual, Family, Statistic
+import importlib
+
+class StatisticsTests(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='test-password')
+        self.alice.groups.add(Group.objects.get(name='editors'))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.alice)
+
+    def counts(self):
+        return {(kind, key): value for kind, key, value in
+            Statistic.objects.exclude(value=0).values_list('kind', 'key', 'value')}
+
+    def assertMatchesRebuild(self):
+        incremental = self.counts()
+        Statistic.rebuild()
+        self.assertDictEqual(incremental, self.counts())
+
+    def test_incremental(self):
+        bob = Individual.objects.create(first_names='Bob', last_name='Smith',
+            birth_date='3 MAR 1852', death_date='1920', owner=self.alice)
+        jane = Individual.objects.create(first_names='Jane', last_name='Smith', birth_date='ABT 1858')
+        family = Family.objects.create()
+        family.partners.add(bob, jane)
+        Individual.objects.create(first_names='Kid', last_name='Smith',
+            birth_date='1880', child_in_family=family)
+        self.assertEqual(Individual.objects.get(pk=bob.id).birth_year, 1852)
+        self.assertMatchesRebuild()
+
+        jane.last_name = 'Jones'
+        jane.death_date = '1930'
+        jane.save()
+        self.assertMatchesRebuild()
+
+        # Saved without having been loaded with the counted fields.
+        partial = Individual.objects.only('id', 'birth_date').get(pk=jane.id)
+        partial.birth_date = '1860'
+        partial.save(update_fields=['birth_date'])
+        self.assertEqual(Individual.objects.get(pk=jane.id).birth_year, 1860)
+        self.assertMatchesRebuild()
+
+        response = self.client.post('/api/v1/bulk/', {
+            'individuals': [
+                {'id': bob.id, 'birth_date': '1850'},
+                {'temp_id': 'tom', 'last_name': 'Brown', 'birth_date': '1901'},
+            ],
+            'families': [
+                {'temp_id': 'family', 'partners': ['tom']},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertMatchesRebuild()
+
+        tom = Individual.objects.create(last_name='Brown', birth_date='1901', owner=self.alice)
+        response = self.client.post('/api/v1/individuals/merge/', {
+            'merges': [{'keep': bob.id, 'duplicate': tom.id}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertMatchesRebuild()
+
+        # Deleting a family deletes its children too.
+        family.delete()
+        jane.delete()
+        self.assertMatchesRebuild()
+
+    def test_migration_fills_table(self):
+        Individual.objects.create(last_name='Smith', birth_date='1852', death_date='1920')
+        Individual.objects.create(last_name='Jones', birth_date='ABT 1858')
+        Family.objects.create()
+        Statistic.rebuild()
+        expected = self.counts()
+        Statistic.objects.all().delete()
+        migration = importlib.import_module('api.migrations.0027_statistics')
+        migration.build_statistics(apps, None)
+        self.assertDictEqual(self.counts(), expected)
+        self.assertEqual(expected[(Statistic.TOTAL, Statistic.INDIVIDUALS)], 2)
+
+    def test_endpoints(self):
+        for last_name, birth_date, death_date in [
+            ('Smith', '1852', '1920'),
+            ('Smith', '1858', '1900'),
+            ('Jones', '1861', ''),
+            ('', '', ''),
+        ]:
+            Individual.objects.create(last_name=last_name,
+                birth_date=birth_date, death_date=death_date)
+        Family.objects.create()
+
+        response = self.client.get('/api/v1/statistics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertDictEqual(response.data, {
+            'individuals': 4,
+            'families': 1,
+            'average_lifespan': 55.0,
+            'births_per_decade': [
+                {'decade': 1850, 'count': 2},
+                {'decade': 1860, 'count': 1},
+            ],
+        })
+
+        response = self.client.get('/api/v1/statistics/surnames/?limit=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertListEqual(response.data, [{'last_name': 'Smith', 'count': 2}])
+        response = self.client.get('/api/v1/statistics/surnames/?limit=none')
+        self.assertEqual(response.status_code, 400)
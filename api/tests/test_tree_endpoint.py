@@ -0,0 +1,143 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from api.models import Individual
+from api.tests.helpers import create_family
+
+class TreeEndpointTests(TestCase):
+
+    def setUp(self):
+        alice = User.objects.create_user('alice', password='test-password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=alice)
+
+    def create_tree(self):
+        people = {}
+        for name in ['grandad', 'grandma', 'dad', 'mum', 'aunt', 'me', 'wife',
+                'sister', 'son', 'grandson']:
+            people[name] = Individual.objects.create(first_names=name)
+        create_family([people['grandad'], people['grandma']], [people['dad'], people['aunt']])
+        create_family([people['dad'], people['mum']], [people['me'], people['sister']])
+        create_family([people['me'], people['wife']], [people['son']])
+        create_family([people['son']], [people['grandson']])
+        return people
+
+    def test_hourglass(self):
+        people = self.create_tree()
+        me = people['me']
+        response = self.client.get('/api/v1/individuals/{}/tree?generations=1'.format(me.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['root'], me.id)
+
+        individuals = response.data['individuals']
+        expected = {people[name].id for name in ['dad', 'mum', 'me', 'wife', 'sister', 'son']}
+        self.assertSetEqual(expected, set(individuals.keys()))
+        self.assertEqual(individuals[me.id]['first_names'], 'me')
+
+        families = response.data['families']
+        self.assertEqual(len(families), 2)
+        parents_family = families[me.child_in_family_id]
+        self.assertListEqual(sorted([people['dad'].id, people['mum'].id]), parents_family['partners'])
+        self.assertListEqual(sorted([me.id, people['sister'].id]), parents_family['children'])
+        self.assertListEqual(individuals[me.id]['partner_in_families'],
+            [f.id for f in me.partner_in_families.all()])
+
+        # The aunt is a child of the grandparents' family, but isn't loaded as
+        # she's neither an ancestor nor a sibling.
+        response = self.client.get('/api/v1/individuals/{}/tree?generations=2'.format(me.id))
+        self.assertEqual(len(response.data['individuals']), 9)
+        self.assertNotIn(people['aunt'].id, response.data['individuals'])
+        self.assertEqual(len(response.data['families']), 4)
+
+    def test_no_generations(self):
+        people = self.create_tree()
+        me = people['me']
+        response = self.client.get('/api/v1/individuals/{}/tree?generations=0'.format(me.id))
+        self.assertEqual(response.status_code, 200)
+        individuals = response.data['individuals']
+        expected = {people[name].id for name in ['me', 'wife', 'sister']}
+        self.assertSetEqual(expected, set(individuals.keys()))
+        # Every family the root refers to is in the payload.
+        families = response.data['families']
+        root_families = [individuals[me.id]['child_in_family']]
+        root_families += individuals[me.id]['partner_in_families']
+        self.assertSetEqual(set(root_families), set(families.keys()))
+        own_family = families[individuals[me.id]['partner_in_families'][0]]
+        self.assertListEqual(sorted([me.id, people['wife'].id]), own_family['partners'])
+
+    def test_bounded_queries(self):
+        people = self.create_tree()
+        # Adding more people per generation shouldn't add more queries.
+        for i in range(10):
+            child = Individual.objects.create(first_names='cousin{}'.format(i))
+            child.child_in_family = people['aunt'].child_in_family
+            child.save()
+        url = '/api/v1/individuals/{}/tree?generations=2'.format(people['me'].id)
+        # A fixed number of queries per generation.
+        with self.assertNumQueries(21):
+            self.client.get(url)
+
+    def test_errors(self):
+        response = self.client.get('/api/v1/individuals/1234/tree')
+        self.assertEqual(response.status_code, 404)
+        me = Individual.objects.create(first_names='me')
+        response = self.client.get('/api/v1/individuals/{}/tree?generations=x'.format(me.id))
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/v1/individuals/{}/tree?generations=100'.format(me.id))
+        self.assertEqual(response.status_code, 400)
+
+class NormalizedLayoutTests(TestCase):
+
+    def setUp(self):
+        alice = User.objects.create_user('alice', password='test-password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=alice)
+
+    def create_cousin_marriage(self):
+        # Two cousins marry, so their child has the same great-grandparents
+        # on both sides.
+        people = {}
+        for name in ['ggdad', 'ggmum', 'granny1', 'granny2', 'grandad1',
+                'grandad2', 'cousin1', 'cousin2', 'child']:
+            people[name] = Individual.objects.create(first_names=name)
+        create_family([people['ggdad'], people['ggmum']], [people['granny1'], people['granny2']])
+        create_family([people['granny1'], people['grandad1']], [people['cousin1']])
+        create_family([people['granny2'], people['grandad2']], [people['cousin2']])
+        create_family([people['cousin1'], people['cousin2']], [people['child']])
+        return people
+
+    def test_ancestors(self):
+        people = self.create_cousin_marriage()
+        url = '/api/v1/individuals/{}/ancestors'.format(people['child'].id)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # The nested layout lists the great-grandparents once, marked as
+        # collapsed.
+        ids = [i['id'] for i in response.data]
+        self.assertEqual(ids.count(people['ggdad'].id), 1)
+
+        response = self.client.get(url + '?layout=normalized')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['root'], people['child'].id)
+        self.assertSetEqual({i.id for i in people.values()},
+            set(response.data['individuals'].keys()))
+        self.assertEqual(len(response.data['families']), 4)
+
+    def test_descendants(self):
+        people = self.create_cousin_marriage()
+        url = '/api/v1/individuals/{}/descendants'.format(people['ggdad'].id)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        ids = [i['individual']['id'] for i in response.data]
+        self.assertEqual(ids.count(people['child'].id), 1)
+
+        response = self.client.get(url + '?layout=normalized')
+        self.assertEqual(response.status_code, 200)
+        self.assertSetEqual({i.id for i in people.values()},
+            set(response.data['individuals'].keys()))
+        child_family = response.data['families'][people['child'].child_in_family_id]
+        self.assertListEqual(child_family['children'], [people['child'].id])
+
+    def test_missing(self):
+        response = self.client.get('/api/v1/individuals/1234/ancestors?layout=normalized')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,88 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from api.models import Individual, Family
+
+GENERATIONS = 30
+
+class TreeTraversalTests(TestCase):
+    """
+    The ancestors and descendants endpoints on trees which would take
+    exponential time, or never finish, if expanded naively.
+    """
+
+    def setUp(self):
+        alice = User.objects.create_user('alice', password='test-password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=alice)
+
+    def create_ladder(self):
+        # In every generation a brother and sister marry, so everyone has
+        # 2^n lines of descent from the couple n generations above them.
+        couples = []
+        parents_family = None
+        for generation in range(GENERATIONS):
+            husband = Individual.objects.create(
+                first_names='husband{}'.format(generation), child_in_family=parents_family)
+            wife = Individual.objects.create(
+                first_names='wife{}'.format(generation), child_in_family=parents_family)
+            parents_family = Family.objects.create()
+            parents_family.partners.add(husband, wife)
+            couples.append((husband, wife))
+        child = Individual.objects.create(first_names='child', child_in_family=parents_family)
+        return couples, child
+
+    def test_ancestors_pedigree_collapse(self):
+        couples, child = self.create_ladder()
+        response = self.client.get('/api/v1/individuals/{}/ancestors'.format(child.id))
+        self.assertEqual(response.status_code, 200)
+        ids = [i['id'] for i in response.data]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(len(ids), 2 * GENERATIONS + 1)
+        entries = {i['id']: i for i in response.data}
+        # Everyone but the child and the last couple is reached via both of
+        # their children.
+        self.assertNotIn('collapsed', entries[child.id])
+        self.assertTrue(entries[couples[0][0].id]['collapsed'])
+        self.assertNotIn('collapsed', entries[couples[-1][0].id])
+        self.assertNotIn('cycle', entries[couples[0][0].id])
+
+    def test_descendants_pedigree_collapse(self):
+        couples, child = self.create_ladder()
+        response = self.client.get('/api/v1/individuals/{}/descendants'.format(couples[0][0].id))
+        self.assertEqual(response.status_code, 200)
+        ids = [i['individual']['id'] for i in response.data]
+        self.assertEqual(len(ids), len(set(ids)))
+        # Everyone but the first wife, who's only listed as a spouse.
+        self.assertEqual(len(ids), 2 * GENERATIONS)
+        entries = {i['individual']['id']: i for i in response.data}
+        # From the second couple down, children are reached via both of
+        # their parents.
+        self.assertNotIn('collapsed', entries[couples[1][0].id])
+        self.assertTrue(entries[couples[2][0].id]['collapsed'])
+        self.assertTrue(entries[child.id]['collapsed'])
+
+    def test_cycle(self):
+        # Bad data; a man who is his own grandfather.
+        grandad = Individual.objects.create(first_names='grandad')
+        dad = Individual.objects.create(first_names='dad')
+        family = Family.objects.create()
+        family.partners.add(grandad)
+        dad.child_in_family = family
+        dad.save()
+        family = Family.objects.create()
+        family.partners.add(dad)
+        grandad.child_in_family = family
+        grandad.save()
+
+        with self.assertLogs('api.graph', level='WARNING'):
+            response = self.client.get('/api/v1/individuals/{}/ancestors'.format(dad.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertListEqual([i['id'] for i in response.data], [dad.id, grandad.id])
+        self.assertTrue(response.data[0]['cycle'])
+
+        with self.assertLogs('api.graph', level='WARNING'):
+            response = self.client.get('/api/v1/individuals/{}/descendants'.format(dad.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertListEqual([i['individual']['id'] for i in response.data], [dad.id, grandad.id])
+        self.assertTrue(response.data[0]['cycle'])
@@ -6,20 +6,31 @@ from api import views
 
 urlpatterns = [
     path('account/', views.account_details),
+    path('bulk/', views.bulk_update),
+    path('changes/', views.changes),
     path('create-account/', views.create_account),
+    path('duplicates/', views.duplicates),
     path('recover-account/', views.recover_account),
     path('reset-password/', views.reset_password),
+    path('export/gedcom/', views.export_gedcom),
     path('families/', views.ListFamily.as_view()),
     path('families/<int:pk>/', views.DetailFamily.as_view()),
     path('families/of-individual/<int:pk>/', views.list_family_of_individual),
     path('families/search/<str:pattern>/', views.search_families),
     path('ping/', views.ping),
+    path('places/<int:pk>/events', views.place_events),
+    path('places/search/<str:pattern>', views.search_places),
     path('individuals/', views.ListIndividual.as_view()),
     path('individuals/<int:pk>/', views.DetailIndividual.as_view()),
     path('individuals/<int:pk>/verbose', views.verbose_individual_detail),
     path('individuals/<int:pk>/ancestors', views.individual_ancestors),
     path('individuals/<int:pk>/descendants', views.individual_desendants),
+    path('individuals/<int:pk>/tree', views.individual_tree),
+    path('individuals/<int:pk>/relationship/<int:other>', views.individual_relationship),
+    path('individuals/merge/', views.merge_individuals),
     path('login/', obtain_auth_token),
     path('logout/', views.logout),
     path('search-individuals/<str:pattern>', views.search_individuals),
+    path('statistics/', views.statistics),
+    path('statistics/surnames/', views.surname_statistics),
 ]
@@ -7,25 +7,30 @@ from rest_framework.response import Response
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from django.conf import settings
 from django.contrib.auth.models import User, Group
-from django.core.mail import send_mail
+from django.db import transaction
 from django.db.models import CharField, Value
 from django.db.models.functions import Concat
-from django.http import Http404
+from django.http import Http404, StreamingHttpResponse
 
 import pytz
 
 from familyapi.settings import SITE_HOST, EMAIL_FROM_ADDRESS
-from api.models import Individual, Family, PasswordResetRequest, FamilyNameList
+from api.models import Individual, Family, PasswordResetRequest, FamilyNameList, Change, chunked
+from api.models import Place, PlaceEvent, Statistic
+from api import warmup
+from api.mail import queue_mail
+from api.graph import FamilyGraph, depth_first, hourglass, new_graph
+from api.relationships import find_relationship
 from api.permissions import IsReadOnlyOrCanEdit, in_editors_group
+from api.phonetic import name_distance
 from api.serializers import IndividualSerializer
 from api.serializers import FamilySerializer
+from api.serializers import PlaceSerializer
 from api.serializers import VerboseIndividual, VerboseIndividualSerializer
 from api.serializers import AccountDetail, AccountDetailSerializer
-from api.serializers import BasicIndividualAndFamilies, BasicIndividualAndFamiliesSerializer
-from api.serializers import BasicIndividualWithParents, BasicIndividualWithParentsSerializer
-
-from smtplib import SMTPException
+from api.serializers import fast_individuals, fast_individual_and_families, fast_individual_with_parents
 
 # Individual
 class ListIndividual(generics.ListCreateAPIView):
@@ -33,6 +38,9 @@ class ListIndividual(generics.ListCreateAPIView):
     serializer_class = IndividualSerializer
     permission_classes = [permissions.IsAuthenticated, IsReadOnlyOrCanEdit]
 
+    def list(self, request, *args, **kwargs):
+        return Response(fast_individuals(self.filter_queryset(Individual.objects.all())))
+
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
@@ -55,6 +63,109 @@ class DetailFamily(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = FamilySerializer
     permission_classes = [permissions.IsAuthenticated, IsReadOnlyOrCanEdit]
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, IsReadOnlyOrCanEdit])
+def bulk_update(request):
+    """
+    Creates and updates many individuals and families in one transaction.
+    See api.bulk for the format of the request.
+    """
+    # Imported when first used, so that starting a process doesn't import
+    # the modules of rarely used endpoints; likewise below.
+    from api.bulk import BulkChanges
+    changes = BulkChanges(request.data)
+    if not changes.is_valid():
+        return Response(status=400, data={
+            'ok': False,
+            'errors': changes.errors,
+        })
+    permission = IsReadOnlyOrCanEdit()
+    for obj in changes.existing_objects():
+        if not permission.has_object_permission(request, None, obj):
+            return Response(status=403, data={
+                'ok': False,
+                'errors': ["Can't edit {} {}".format(type(obj).__name__.lower(), obj.id)],
+            })
+    created = changes.save(owner=request.user)
+    return Response(status=201, data={
+        'ok': True,
+        'individuals': created['individuals'],
+        'families': created['families'],
+    })
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, IsReadOnlyOrCanEdit])
+def merge_individuals(request):
+    """
+    Merges duplicate individuals into the individuals to keep, in one
+    transaction. See api.merge for the format of the request.
+    """
+    from api.merge import Merges
+    merges = Merges(request.data)
+    if not merges.is_valid():
+        return Response(status=400, data={
+            'ok': False,
+            'errors': merges.errors,
+        })
+    permission = IsReadOnlyOrCanEdit()
+    for obj in merges.existing_objects():
+        if not permission.has_object_permission(request, None, obj):
+            return Response(status=403, data={
+                'ok': False,
+                'errors': ["Can't edit individual {}".format(obj.id)],
+            })
+    merges.save()
+    return Response({
+        'ok': True,
+        'merged': len(merges.merges),
+    })
+
+# Maximum number of change log entries the changes endpoint reads per request.
+CHANGES_PAGE_SIZE = 1000
+
+@api_view(['GET'])
+def changes(request):
+    """
+    The individuals and families which changed after sequence number
+    `since`, in the same form as the individuals/ and families/ lists, and
+    the ids of those deleted. Pass the returned `seq` as `since` next time;
+    if `more` is true, there are further changes to fetch straight away.
+    """
+    try:
+        since = int(request.query_params.get('since', 0))
+    except ValueError:
+        return Response(status=400, data={
+            'errors': ['since must be an integer.'],
+        })
+    rows = list(Change.objects.filter(id__gt=since).order_by('id').values_list(
+        'id', 'entity', 'entity_id')[:CHANGES_PAGE_SIZE + 1])
+    more = len(rows) > CHANGES_PAGE_SIZE
+    rows = rows[:CHANGES_PAGE_SIZE]
+
+    # Send each changed entity's current state once, however many times it
+    # changed; if it no longer exists, it's been deleted.
+    changed = {Change.INDIVIDUAL: set(), Change.FAMILY: set()}
+    for _, entity, entity_id in rows:
+        changed[entity].add(entity_id)
+    individuals = []
+    for ids in chunked(sorted(changed[Change.INDIVIDUAL])):
+        individuals += fast_individuals(Individual.objects.filter(pk__in=ids).order_by('id'))
+    families = []
+    for ids in chunked(sorted(changed[Change.FAMILY])):
+        families += FamilySerializer(FamilySerializer.init_queryset(
+            Family.objects.filter(pk__in=ids).order_by('id')), many=True).data
+
+    return Response({
+        'seq': rows[-1][0] if rows else since,
+        'more': more,
+        'individuals': individuals,
+        'families': families,
+        'deleted_individuals': sorted(
+            changed[Change.INDIVIDUAL] - {i['id'] for i in individuals}),
+        'deleted_families': sorted(
+            changed[Change.FAMILY] - {f['id'] for f in families}),
+    })
+
 @api_view(['GET'])
 def account_details(request):
     if request.method != 'GET':
@@ -77,20 +188,23 @@ def list_family_of_individual(request, pk):
     return Response(serializer.data)
 
 
-@api_view(['GET'])
-def verbose_individual_detail(request, pk):
-    if request.method != 'GET':
-        # TODO: Verify whether this is actually needed.
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+def verbose_individual(pk):
     try:
         individual = Individual.objects.get(pk=pk)
-    except Snippet.DoesNotExist:
-        return Response(status=status.HTTP_404_NOT_FOUND)
+    except Individual.DoesNotExist:
+        raise Http404("Individual does not exist")
     families = individual.partner_in_families.all()
     parents = individual.parents()
     serializer = VerboseIndividualSerializer(
         VerboseIndividual(individual, families, parents))
-    return Response(serializer.data)
+    return serializer.data
+
+@api_view(['GET'])
+def verbose_individual_detail(request, pk):
+    if request.method != 'GET':
+        # TODO: Verify whether this is actually needed.
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+    return Response(verbose_individual(pk))
 
 @api_view(['POST'])
 def logout(request):
@@ -100,18 +214,37 @@ def logout(request):
     request.user.auth_token.delete()
     return Response(status=status.HTTP_200_OK)
 
-@api_view(['GET'])
-def search_individuals(request, pattern):
-    individuals = list(Individual.objects.annotate(
+def individuals_matching(pattern):
+    return Individual.objects.annotate(
         full_name=Concat(
             'first_names', Value(' '), 'last_name',
             output_field=CharField(max_length=100)
         )
-    ).filter(full_name__icontains=pattern))
-    individuals.sort(key=lambda i: i.last_name)
-    individuals.sort(key=lambda i: i.first_names)
-    serializer = IndividualSerializer(instance=individuals, many=True)
-    return Response(serializer.data)
+    ).filter(full_name__icontains=pattern)
+
+def sort_by_name(individuals):
+    individuals.sort(key=lambda i: i['last_name'])
+    individuals.sort(key=lambda i: i['first_names'])
+    return individuals
+
+def wants_phonetic_search(request):
+    """
+    Search matches substrings of names by default; with `?mode=phonetic` it
+    matches names which sound like the words searched for, closest first.
+    """
+    return request.query_params.get('mode') == 'phonetic'
+
+def rank_by_distance(pattern, individuals):
+    individuals = sort_by_name(individuals)
+    individuals.sort(key=lambda i: name_distance(pattern, i['first_names'], i['last_name']))
+    return individuals
+
+@api_view(['GET'])
+def search_individuals(request, pattern):
+    if wants_phonetic_search(request):
+        return Response(rank_by_distance(
+            pattern, fast_individuals(Individual.phonetic_matches(pattern))))
+    return Response(sort_by_name(fast_individuals(individuals_matching(pattern))))
 
 @api_view(['GET'])
 def search_families(request, pattern):
@@ -119,41 +252,257 @@ def search_families(request, pattern):
     serializer = FamilySerializer(instance=families, many=True)
     return Response(serializer.data)
 
-def populate_descendants(individual, individuals):
-    families = individual.partner_in_families.all()
-    individuals.append(BasicIndividualAndFamilies(individual))
-    for family in families:
-        for child in family.children.all():
-            populate_descendants(child, individuals)
+@api_view(['GET'])
+def search_places(request, pattern):
+    places = Place.search(pattern).order_by('name')
+    serializer = PlaceSerializer(instance=places, many=True)
+    return Response(serializer.data)
 
 @api_view(['GET'])
-def individual_desendants(request, pk):
+def place_events(request, pk):
+    """
+    The events at a place and the places within it, optionally only those
+    of one kind (`?event=birth`), with the individuals and families whose
+    events they are.
+    """
     try:
-        individual = Individual.objects.get(pk=pk)
-    except Individual.DoesNotExist:
-        raise Http404("Individual does not exist")
+        place = Place.objects.get(pk=pk)
+    except Place.DoesNotExist:
+        raise Http404("Place does not exist")
+    events = PlaceEvent.objects.filter(place__in=place.within())
+    event = request.query_params.get('event')
+    if event is not None:
+        if event not in PlaceEvent.INDIVIDUAL_FIELDS and event not in PlaceEvent.FAMILY_FIELDS:
+            return Response(status=400, data={
+                'errors': ['event must be one of {}.'.format(
+                    ', '.join(e for e, _ in PlaceEvent.EVENT_CHOICES))],
+            })
+        events = events.filter(event=event)
+    events = list(events.order_by('id').values('event', 'place', 'individual', 'family'))
+
     individuals = []
-    populate_descendants(individual, individuals)
-    serializer = BasicIndividualAndFamiliesSerializer(instance=individuals, many=True)
-    return Response(serializer.data)
+    for ids in chunked(sorted({e['individual'] for e in events} - {None})):
+        individuals += fast_individuals(Individual.objects.filter(pk__in=ids).order_by('id'))
+    families = []
+    for ids in chunked(sorted({e['family'] for e in events} - {None})):
+        families += FamilySerializer(FamilySerializer.init_queryset(
+            Family.objects.filter(pk__in=ids).order_by('id')), many=True).data
+    return Response({
+        'place': PlaceSerializer(place).data,
+        'events': events,
+        'individuals': individuals,
+        'families': families,
+    })
 
-def populate_ancestors(individual, individuals):
-    individuals.append(BasicIndividualWithParents(individual))
-    for parent in individual.parents():
-        populate_ancestors(parent, individuals)
+@api_view(['GET'])
+def statistics(request):
+    """
+    Counts of individuals and families, their average lifespan in years,
+    and the number of births in each decade. See Statistic.
+    """
+    rows = Statistic.objects.filter(kind__in=[Statistic.TOTAL, Statistic.BIRTH_DECADE])
+    totals = {}
+    births = []
+    for kind, key, value in rows.values_list('kind', 'key', 'value'):
+        if kind == Statistic.TOTAL:
+            totals[key] = value
+        elif value > 0:
+            births.append({'decade': int(key), 'count': value})
+    lifespans = totals.get(Statistic.LIFESPANS, 0)
+    return Response({
+        'individuals': totals.get(Statistic.INDIVIDUALS, 0),
+        'families': totals.get(Statistic.FAMILIES, 0),
+        'average_lifespan': round(totals[Statistic.LIFESPAN_YEARS] / lifespans, 1) if lifespans else None,
+        'births_per_decade': sorted(births, key=lambda b: b['decade']),
+    })
+
+# Maximum number of surnames the surnames endpoint returns.
+MAX_SURNAMES = 1000
+
+@api_view(['GET'])
+def surname_statistics(request):
+    """ The `limit` (default 20) most common surnames, with their counts. """
+    try:
+        limit = int(request.query_params.get('limit', 20))
+    except ValueError:
+        limit = None
+    if limit is None or not 0 < limit <= MAX_SURNAMES:
+        return Response(status=400, data={
+            'errors': ['limit must be from 1 to {}.'.format(MAX_SURNAMES)],
+        })
+    rows = Statistic.objects.filter(kind=Statistic.SURNAME, value__gt=0).order_by(
+        '-value', 'key').values_list('key', 'value')[:limit]
+    return Response([{'last_name': key, 'count': value} for key, value in rows])
+
+def wants_normalized_layout(request):
+    """
+    The tree endpoints return nested lists by default; with `?layout=normalized`
+    they return each individual and family once, keyed by id. See api.graph.
+    """
+    return request.query_params.get('layout') == 'normalized'
+
+def normalized_tree(pk, load):
+    graph = new_graph()
+    root = graph.load_individuals([pk])
+    if not root:
+        raise Http404("Individual does not exist")
+    load(graph, root)
+    return graph.payload(pk)
+
+def populate_descendants(graph, root):
+    def children(i):
+        return [c for f in graph.individuals[i]['partner_in_families']
+            for c in graph.families[f]['children']]
+    def entry(i):
+        return fast_individual_and_families(graph, graph.individuals[i])
+    return depth_first(root['id'], children, entry)
+
+def descendants(pk, normalized=False):
+    if normalized:
+        return normalized_tree(pk, FamilyGraph.load_descendants)
+    graph = new_graph()
+    root = graph.load_individuals([pk])
+    if not root:
+        raise Http404("Individual does not exist")
+    graph.load_descendants(root)
+    return populate_descendants(graph, root[0])
+
+@api_view(['GET'])
+def individual_desendants(request, pk):
+    return Response(descendants(pk, wants_normalized_layout(request)))
+
+def populate_ancestors(graph, root):
+    def parents(i):
+        return graph.parents(graph.individuals[i])
+    def entry(i):
+        return fast_individual_with_parents(graph.individuals[i], parents(i))
+    return depth_first(root['id'], parents, entry)
+
+def ancestors(pk, normalized=False):
+    if normalized:
+        return normalized_tree(pk, FamilyGraph.load_ancestors)
+    graph = new_graph()
+    root = graph.load_individuals([pk])
+    if not root:
+        raise Http404("Individual does not exist")
+    graph.load_ancestors(root)
+    return populate_ancestors(graph, root[0])
 
 @api_view(['GET'])
 def individual_ancestors(request, pk):
+    return Response(ancestors(pk, wants_normalized_layout(request)))
+
+# Maximum number of generations the tree endpoint will load in each direction.
+MAX_TREE_GENERATIONS = 10
+
+def parse_generations(value):
+    """ Returns a tuple of (generations, errors) from the query parameter. """
     try:
-        individual = Individual.objects.get(pk=pk)
-    except Individual.DoesNotExist:
+        generations = int(value)
+    except ValueError:
+        return None, ['generations must be an integer.']
+    if generations < 0 or generations > MAX_TREE_GENERATIONS:
+        return None, ['generations must be between 0 and {}.'.format(MAX_TREE_GENERATIONS)]
+    return generations, []
+
+def tree(pk, generations):
+    graph = hourglass(pk, generations)
+    if graph is None:
         raise Http404("Individual does not exist")
-    individuals = []
-    populate_ancestors(individual, individuals)
-    serializer = BasicIndividualWithParentsSerializer(instance=individuals, many=True)
-    return Response(serializer.data)
+    return graph.payload(pk)
+
+@api_view(['GET'])
+def individual_tree(request, pk):
+    """
+    Everything needed to render a tree view around an individual; their
+    ancestors and descendants up to `generations` generations away, and
+    their spouses and siblings. See api.graph for the format.
+    """
+    generations, errors = parse_generations(request.query_params.get('generations', 3))
+    if errors:
+        return Response(status=400, data={
+            'errors': errors,
+        })
+    return Response(tree(pk, generations))
 
 
+@api_view(['GET'])
+def individual_relationship(request, pk, other):
+    """
+    How the individual is related to another; the name of the relationship,
+    their nearest common ancestors, and the path between them.
+    """
+    relationship = find_relationship(pk, other)
+    if relationship is None:
+        raise Http404("Individual does not exist")
+    return Response(relationship)
+
+@api_view(['GET'])
+def export_gedcom(request):
+    """
+    Streams the database as a GEDCOM file; with `?root=<id>`, only that
+    individual's descendants and their spouses. See api.export.
+    """
+    from api.export import gedcom_export
+    root = request.query_params.get('root')
+    if root is not None:
+        try:
+            root = int(root)
+        except ValueError:
+            return Response(status=400, data={
+                'errors': ['root must be an individual id.'],
+            })
+        if not Individual.objects.filter(pk=root).exists():
+            raise Http404("Individual does not exist")
+    response = StreamingHttpResponse(
+        gedcom_export(root), content_type='text/x-gedcom; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="family.ged"'
+    return response
+
+# Maximum number of pairs the duplicates endpoint returns.
+MAX_DUPLICATES = 100
+
+@api_view(['GET'])
+def duplicates(request):
+    """
+    Pairs of individuals who are probably the same person, most alike first,
+    with a score from `min_score` (default 0.8) to 1. See api.duplicates.
+    """
+    from api.duplicates import MIN_SCORE, find_duplicates
+    errors = []
+    try:
+        min_score = float(request.query_params.get('min_score', MIN_SCORE))
+    except ValueError:
+        min_score = None
+    if min_score is None or not 0 <= min_score <= 1:
+        errors.append('min_score must be a number from 0 to 1.')
+    try:
+        limit = int(request.query_params.get('limit', MAX_DUPLICATES))
+    except ValueError:
+        limit = None
+    if limit is None or not 0 < limit <= MAX_DUPLICATES:
+        errors.append('limit must be from 1 to {}.'.format(MAX_DUPLICATES))
+    if errors:
+        return Response(status=400, data={
+            'errors': errors,
+        })
+
+    matches = find_duplicates(min_score, limit=limit)
+    ids = {pk for _, a, b in matches for pk in (a, b)}
+    individuals = {}
+    for chunk in chunked(sorted(ids)):
+        for individual in fast_individuals(Individual.objects.filter(pk__in=chunk)):
+            individuals[individual['id']] = individual
+    return Response({
+        'duplicates': [
+            {
+                'score': round(score, 3),
+                'individuals': [individuals[a], individuals[b]],
+            }
+            for score, a, b in matches
+        ],
+    })
+
 @api_view(['GET'])
 @permission_classes([])
 def ping(request):
@@ -161,6 +510,8 @@ def ping(request):
     A watchdog; use this to kick the server to wake it up from Heroku's
     sleep mode. Frontend blocks on the reponse of this.
     """
+    if getattr(settings, 'WARM_UP_ON_PING', False):
+        warmup.worker.start()
     content = {
         'pong': True
     }
@@ -171,6 +522,7 @@ def account_already_exists(username, email):
             User.objects.filter(email=email).count() > 0)
 
 @api_view(['POST'])
+@transaction.atomic
 def create_account(request):
     errors = []
     for field in ['username', 'email', 'first_name', 'last_name']:
@@ -212,35 +564,23 @@ def create_account(request):
             'To create your account on {},\nopen: https://{}/#confirm-account/{}'.format(
                 SITE_HOST, SITE_HOST, pw_reset.token)
         )
-        try:
-            send_mail(
-                'Please confirm your account on {}'.format(SITE_HOST),
-                message,
-                EMAIL_FROM_ADDRESS,
-                [email],
-                fail_silently=False,
-            )
-        except SMTPException as e:
-            content = {
-                'ok': False,
-                'error': "SMTP error({}): {}".format(e.errno, e.strerror)
-            }
-            return Response(status=500, data=content)
+        queue_mail(
+            'Please confirm your account on {}'.format(SITE_HOST),
+            message,
+            [email],
+            EMAIL_FROM_ADDRESS,
+        )
 
         message = (
             'Account created for {} {}, {} '.format(
                 new_user.first_name, new_user.last_name, new_user.email)
         )
-        try:
-            send_mail(
-                'New user account created on {}'.format(SITE_HOST),
-                message,
-                EMAIL_FROM_ADDRESS,
-                [EMAIL_FROM_ADDRESS],
-                fail_silently=True,
-            )
-        except SMTPException:
-            pass
+        queue_mail(
+            'New user account created on {}'.format(SITE_HOST),
+            message,
+            [EMAIL_FROM_ADDRESS],
+            EMAIL_FROM_ADDRESS,
+        )
 
     content = {
         'ok': True,
@@ -251,6 +591,7 @@ def create_account(request):
 
 @api_view(['POST'])
 @permission_classes([])
+@transaction.atomic
 def reset_password(request):
     token = request.data.get('token')
     password = request.data.get('password')
@@ -280,21 +621,17 @@ def reset_password(request):
 
     send_confirmation_email = request.data.get('send_confirmation_email', True)
     if send_confirmation_email:
-        try:
-            user = pw_reset_request.user
-            message = (
-                'Password reset for {} {}, {} '.format(
-                    user.first_name, user.last_name, user.email)
-            )
-            send_mail(
-                'Password reset for user on {}'.format(SITE_HOST),
-                message,
-                EMAIL_FROM_ADDRESS,
-                [EMAIL_FROM_ADDRESS],
-                fail_silently=True,
-            )
-        except SMTPException:
-            pass
+        user = pw_reset_request.user
+        message = (
+            'Password reset for {} {}, {} '.format(
+                user.first_name, user.last_name, user.email)
+        )
+        queue_mail(
+            'Password reset for user on {}'.format(SITE_HOST),
+            message,
+            [EMAIL_FROM_ADDRESS],
+            EMAIL_FROM_ADDRESS,
+        )
 
     pw_reset_request.delete()
 
@@ -305,6 +642,7 @@ def reset_password(request):
 
 @api_view(['POST'])
 @permission_classes([])
+@transaction.atomic
 def recover_account(request):
     email = request.data.get('email')
     if not email:
@@ -333,17 +671,11 @@ def recover_account(request):
             open:\nhttps://{}/#reset-password/{}
             """.format(SITE_HOST, user.username, SITE_HOST, pw_reset_request.token)
         )
-
-        try:
-            send_mail(
-                'Password reset request for {}'.format(SITE_HOST),
-                message,
-                EMAIL_FROM_ADDRESS,
-                [email],
-                fail_silently=True,
-            )
-        except SMTPException as _:
-            # Fail silently.
-            pass
+        queue_mail(
+            'Password reset request for {}'.format(SITE_HOST),
+            message,
+            [email],
+            EMAIL_FROM_ADDRESS,
+        )
 
     return Response(status=200)
@@ -0,0 +1,91 @@
+from django.db import close_old_connections, connection
+from django.urls import URLResolver, get_resolver
+
+from rest_framework.authtoken.models import Token
+
+import logging
+import os
+import threading
+
+from api.graph import hourglass
+from api.models import Individual, FamilyNameList
+from api.serializers import fast_individuals
+
+# Warming up a web process which has just started, e.g. after the dyno was
+# woken from sleep by the frontend's ping. The first requests a process serves
+# are several times slower than the ones after: the database file isn't in
+# the OS page cache, and Django, DRF and the ORM build much of their state on
+# first use. warm_up() pays for that in advance, by compiling the URL
+# patterns, reading the database file and running the queries of the read
+# endpoints once. With settings.WARM_UP_ON_PING, the ping view does this on a
+# thread the first time it's called. `./manage.py profile-startup --warm-up`
+# shows the effect.
+
+logger = logging.getLogger(__name__)
+
+# Read the database file this many bytes at a time.
+READ_SIZE = 1 << 20
+
+def page_in_database():
+    """
+    Reads the whole SQLite database file, so that queries find its pages in
+    the OS page cache. Returns the number of bytes read.
+    """
+    if connection.vendor != 'sqlite':
+        return 0
+    name = connection.settings_dict['NAME']
+    if not isinstance(name, str) or not os.path.isfile(name):
+        # An in-memory database.
+        return 0
+    size = 0
+    with open(name, 'rb') as f:
+        while True:
+            data = f.read(READ_SIZE)
+            if not data:
+                return size
+            size += len(data)
+
+def compile_urls(resolver=None):
+    """ Compiles the URL patterns, which Django does when they're first matched. """
+    resolver = resolver or get_resolver()
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex
+        if isinstance(pattern, URLResolver):
+            compile_urls(pattern)
+
+def run_queries():
+    """ Runs the queries of the tree, search and login endpoints once. """
+    Token.objects.select_related('user').filter(key='').first()
+    pk = Individual.objects.order_by('id').values_list('id', flat=True).first()
+    if pk is not None:
+        hourglass(pk, 3).payload(pk)
+    fast_individuals(Individual.phonetic_matches('smith')[:10])
+    FamilyNameList.search('smith')
+
+def warm_up():
+    compile_urls()
+    page_in_database()
+    run_queries()
+
+class WarmUp:
+    """ Warms the process up on a daemon thread, the first time it's started. """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, name='warm-up', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        try:
+            warm_up()
+        except Exception:
+            logger.exception("Error warming up")
+        finally:
+            close_old_connections()
+
+worker = WarmUp()
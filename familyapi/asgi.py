@@ -0,0 +1,23 @@
+"""
+ASGI config for familyapi project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Serving this routes the read-heavy endpoints to their async versions; run it
+with e.g. `gunicorn familyapi.asgi -k uvicorn.workers.UvicornWorker`.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'familyapi.settings')
+os.environ.setdefault('FAMILYAPI_ASYNC_VIEWS', '1')
+
+application = get_asgi_application()
+
+# Send retries due since the process last ran; see api.mail.
+from api.mail import start_worker_on_first_request
+start_worker_on_first_request()
@@ -0,0 +1,13 @@
+"""familyapi URL Configuration when served under ASGI
+
+The same as familyapi.urls, except that the read-heavy endpoints with async
+versions in api.async_views are routed to those instead.
+"""
+from django.contrib import admin
+from django.urls import include, path
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('api/v1/', include('api.async_urls')),
+    path('api/v1/', include('api.urls')),
+]
@@ -44,6 +44,18 @@ EMAIL_HOST_USER = secrets['EMAIL_HOST_USER']
 EMAIL_FROM_ADDRESS = secrets['EMAIL_FROM_ADDRESS']
 EMAIL_HOST_PASSWORD = secrets['EMAIL_HOST_PASSWORD']
 
+# Send queued email (see api/mail.py) from a thread in the web process. If
+# this is off, run `./manage.py send-queued-mail --loop` instead.
+EMAIL_OUTBOX_WORKER = secrets.get('EMAIL_OUTBOX_WORKER', True)
+
+# Warm up a new web process the first time it's pinged, so the first real
+# request after the dyno wakes up is fast; see api/warmup.py.
+WARM_UP_ON_PING = secrets.get('WARM_UP_ON_PING', False)
+
+# File for the graph snapshot which the tree endpoints read instead of the
+# database, shared by all workers; see api/snapshot.py. None to disable.
+GRAPH_SNAPSHOT_FILE = secrets.get('GRAPH_SNAPSHOT_FILE')
+
 # Domain of website.
 SITE_HOST = secrets['SITE_HOST']
 
@@ -96,6 +108,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'api.replica.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -105,7 +118,12 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'familyapi.urls'
+# Under ASGI (familyapi/asgi.py), route the read endpoints to their async
+# versions.
+if os.environ.get('FAMILYAPI_ASYNC_VIEWS') == '1':
+    ROOT_URLCONF = 'familyapi.asgi_urls'
+else:
+    ROOT_URLCONF = 'familyapi.urls'
 
 TEMPLATES = [
     {
@@ -124,6 +142,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'familyapi.wsgi.application'
+ASGI_APPLICATION = 'familyapi.asgi.application'
 
 
 # Database
@@ -133,6 +152,29 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': DATABASE_FILE,
+    },
+    # A copy of the primary which API reads use with USE_READ_REPLICA; see
+    # api/replica.py.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': secrets.get('REPLICA_DATABASE_FILE', DATABASE_FILE + '.replica'),
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['api.replica.ReplicaRouter']
+
+USE_READ_REPLICA = secrets.get('USE_READ_REPLICA', False)
+
+# Remembers which users wrote recently, so their reads can go to the primary
+# until the replica has their changes. Create with `./manage.py
+# createcachetable`.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'api_cache',
     }
 }
 
@@ -179,6 +221,10 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 STATIC_URL = "/static/"
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'familyapi.settings')
 
 application = get_wsgi_application()
+
+# Send retries due since the process last ran; see api.mail.
+from api.mail import start_worker_on_first_request
+start_worker_on_first_request()